@@ -0,0 +1,145 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from elevator import ElevatorSystem
+from simulator import generate_call_arrays, to_time_series
+
+Case = namedtuple('Case', ['num_elevators', 'num_floors', 'duration', 'total_calls', 'engine'])
+DEFAULT_CASE = Case(num_elevators=12, num_floors=60, duration=3600, total_calls=3600, engine='tick')
+
+def case_name(case):
+    return f"e{case.num_elevators}-f{case.num_floors}-d{case.duration}-c{case.total_calls}-{case.engine}"
+
+def scaling_cases(engines=('tick', 'event')):
+    """
+    Build the default suite: the default simulation, and curves varying one of its parameters at a time.
+
+    Returns:
+        list: The cases to measure.
+    """
+    cases = []
+    for engine in engines:
+        default = DEFAULT_CASE._replace(engine=engine)
+        cases.append(default)
+        cases += [default._replace(num_floors=floors) for floors in (10, 100, 250, 500)]
+        cases += [default._replace(num_elevators=elevators) for elevators in (1, 4, 32, 64)]
+        cases += [default._replace(total_calls=calls) for calls in (360, 14400)]
+        cases += [default._replace(duration=duration, total_calls=duration) for duration in (600, 14400)]
+    return cases
+
+def measure(case, seed=42, repeat=1):
+    """
+    Time the phases of a simulation as simulate_elevator_calls runs them, keeping the fastest of repeat runs.
+
+    Args:
+        case (Case): The simulation to measure.
+        seed (int): The seed of the calls.
+        repeat (int): The number of runs.
+
+    Returns:
+        dict: The case, the seconds spent generating calls, stepping the system and computing stats,
+            the simulated seconds per wall-clock second of the stepping, and the peak RSS of the process in MB.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        time_series = to_time_series(*generate_call_arrays(case.num_floors, case.duration, case.total_calls, seed))
+        generated = time.perf_counter()
+        elevator_system = ElevatorSystem(num_elevators=case.num_elevators, num_floors=case.num_floors)
+        elevator_system.run(case.duration, time_series, engine=case.engine)
+        stepped = time.perf_counter()
+        elevator_system.stats()
+        done = time.perf_counter()
+        phases = {'generate_seconds': generated - start, 'run_seconds': stepped - generated, 'stats_seconds': done - stepped}
+        if best is None or sum(phases.values()) < sum(best.values()):
+            best = phases
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss_mb = peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return dict(case._asdict(), name=case_name(case), **best,
+                simulated_per_second=case.duration / best['run_seconds'] if best['run_seconds'] else float('inf'),
+                peak_rss_mb=peak_rss_mb)
+
+def run_suite(cases, seed=42, repeat=1, isolate=True):
+    """
+    Measure every case. With isolate, each case runs in a fresh process so its peak RSS is its own.
+
+    Returns:
+        list: The results of measure, in the order of cases.
+    """
+    if not isolate:
+        return [measure(case, seed, repeat) for case in cases]
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(measure, case, seed, repeat).result())
+    return results
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compare the throughput of results with a baseline.
+
+    Args:
+        results (list): Results of run_suite.
+        baseline (list): Earlier results of run_suite.
+        tolerance (float): The fraction of throughput a case may lose before it counts as a regression.
+
+    Returns:
+        list: For each case in both, a dict with its name, baseline and current simulated_per_second,
+            their ratio, and whether it regressed.
+    """
+    baseline = {result['name']: result for result in baseline}
+    comparisons = []
+    for result in results:
+        if result['name'] not in baseline:
+            continue
+        before = baseline[result['name']]['simulated_per_second']
+        after = result['simulated_per_second']
+        ratio = after / before if before else float('inf')
+        comparisons.append({'name': result['name'], 'baseline': before, 'current': after, 'ratio': ratio,
+                            'regressed': ratio < 1 - tolerance})
+    return comparisons
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the elevator simulation.")
+    parser.add_argument('--default-only', action='store_true', help="only measure the default simulation")
+    parser.add_argument('--engine', choices=['tick', 'event'], nargs='+', default=['tick', 'event'])
+    parser.add_argument('--repeat', type=int, default=3, help="runs per case, the fastest is kept")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-isolate', action='store_true', help="run every case in this process")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="compare with the results in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed loss of throughput before failing")
+    args = parser.parse_args(argv)
+
+    if args.default_only:
+        cases = [DEFAULT_CASE._replace(engine=engine) for engine in args.engine]
+    else:
+        cases = scaling_cases(args.engine)
+    results = run_suite(cases, args.seed, args.repeat, isolate=not args.no_isolate)
+    print(f"{'case':<32}{'generate s':>12}{'run s':>10}{'stats s':>10}{'sim s/s':>12}{'RSS MB':>10}")
+    for result in results:
+        print(f"{result['name']:<32}{result['generate_seconds']:>12.3f}{result['run_seconds']:>10.3f}"
+              f"{result['stats_seconds']:>10.4f}{result['simulated_per_second']:>12.0f}{result['peak_rss_mb']:>10.1f}")
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            comparisons = compare(results, json.load(f), args.tolerance)
+        for comparison in comparisons:
+            flag = 'REGRESSED' if comparison['regressed'] else 'ok'
+            print(f"{comparison['name']:<32}{comparison['ratio']:>8.2f}x  {flag}")
+        if any(comparison['regressed'] for comparison in comparisons):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from elevator import ENGINE_VERSION
+from simulator import GENERATOR_VERSION
+from traces import TRACE_DTYPE
+
+def cache_key(config, fast=False, **options):
+    """
+    Hash everything a run's results depend on: its configuration and seed, how its calls are drawn, and
+    the versions of the call generators and the engines. The engine name is left out, as both engines
+    give the same results.
+
+    Args:
+        config (namedtuple): The configuration of the run, such as a sweep.Config.
+        fast (bool): Whether the calls are drawn in batches from a numpy.random.Generator.
+        **options: Anything else the results depend on, as JSON-serializable values.
+
+    Returns:
+        str: The hexadecimal SHA-256 digest of the configuration.
+    """
+    content = {
+        'config': {name: value for name, value in zip(config._fields, config)},
+        'fast': fast,
+        'options': options,
+        'generator_version': GENERATOR_VERSION,
+        'engine_version': ENGINE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=int).encode()).hexdigest()
+
+class ResultCache:
+    """
+    A content-addressed cache of run results, in two tiers: an in-process LRU of recent results, and
+    optionally a directory of files shared between processes and sessions, evicted least recently used
+    first once it grows beyond a size bound. Results written to the directory by other processes are
+    found on lookup, and the size bound covers the whole directory: it is rescanned before evicting.
+
+    On disk each result is a small JSON file named after its key, with the calls of the run, if
+    kept, in a binary trace next to it.
+
+    Attributes:
+        directory (str): The directory of the disk tier, or None for memory only.
+        max_entries (int): The number of results kept in memory.
+        max_bytes (int): The size bound of the disk tier, in bytes.
+        hits, misses (int): The number of lookups that found a result or not.
+    """
+    def __init__(self, directory=None, max_entries=4096, max_bytes=256 << 20):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> result, least recently used first
+        self._files = OrderedDict()  # key -> size on disk, least recently used first
+        self._disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._scan()
+
+    def __contains__(self, key):
+        return (key in self._memory or key in self._files or
+                (self.directory is not None and os.path.exists(self._path(key, '.json'))))
+
+    def get(self, key):
+        """
+        Look up the result stored under a key, in memory first and then on disk.
+
+        Returns:
+            dict: A copy of the result, or None if there is none.
+        """
+        result = self._memory.get(key)
+        if result is not None:
+            self._memory.move_to_end(key)
+        elif self.directory is not None:
+            # The file may have been written, or evicted, by another process since the last scan
+            try:
+                with open(self._path(key, '.json')) as f:
+                    result = json.load(f)
+            except FileNotFoundError:
+                self._forget(key)
+            else:
+                if key not in self._files:
+                    self._files[key] = sum(os.path.getsize(self._path(key, extension))
+                                           for extension in ('.json', '.npy')
+                                           if os.path.exists(self._path(key, extension)))
+                    self._disk_bytes += self._files[key]
+                self._touch(key)
+                self._remember(key, result)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(result)
+
+    def get_trace(self, key):
+        """
+        Load the calls kept with a result.
+
+        Returns:
+            tuple: The call time, start floor and destination floor of each passenger, or None if not kept.
+        """
+        if self.directory is None:
+            return None
+        try:
+            records = np.load(self._path(key, '.npy'))
+        except FileNotFoundError:
+            return None
+        return records['time'], records['start_floor'], records['destination_floor']
+
+    def put(self, key, result, calls=None):
+        """
+        Store a result, and optionally the calls of its run on disk.
+
+        Args:
+            key (str): The key of the run, from cache_key.
+            result (dict): The result, JSON-serializable.
+            calls (tuple): The call times, start floors and destination floors of the run.
+        """
+        self._remember(key, dict(result))
+        if self.directory is None:
+            return
+        size = self._write(key, '.json', json.dumps(result).encode())
+        if calls is not None:
+            records = np.empty(len(calls[0]), dtype=TRACE_DTYPE)
+            records['time'], records['start_floor'], records['destination_floor'] = calls
+            size += self._write(key, '.npy', records)
+        elif os.path.exists(self._path(key, '.npy')):
+            size += os.path.getsize(self._path(key, '.npy'))
+        self._forget(key)
+        self._files[key] = size
+        self._disk_bytes += size
+        if self._disk_bytes <= self.max_bytes:
+            # Other processes may have filled the directory too
+            self._scan()
+        while self._disk_bytes > self.max_bytes and len(self._files) > 1:
+            oldest = next(iter(self._files))
+            for extension in ('.json', '.npy'):
+                try:
+                    os.remove(self._path(oldest, extension))
+                except FileNotFoundError:
+                    pass
+            self._forget(oldest)
+
+    def clear(self):
+        """
+        Empty the memory tier, leaving the disk tier to other processes and later sessions.
+        """
+        self._memory.clear()
+
+    def disk_usage(self):
+        """
+        Returns:
+            int: The bytes used by the disk tier, as of this process's last write or scan.
+        """
+        return self._disk_bytes
+
+    def _scan(self):
+        # Rebuild the size and use order of the files on disk, from their sizes and modification times;
+        # files last used at the same time stay in the order this process knows them in
+        known = {key: i for i, key in enumerate(self._files)}
+        entries = {}  # key -> (last use, size)
+        for entry in os.scandir(self.directory):
+            key, extension = os.path.splitext(entry.name)
+            if extension in ('.json', '.npy'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                used, size = entries.get(key, (0, 0))
+                entries[key] = (max(used, stat.st_mtime), size + stat.st_size)
+        self._files.clear()
+        self._disk_bytes = 0
+        for key, (_, size) in sorted(entries.items(), key=lambda item: (item[1][0], known.get(item[0], -1))):
+            self._files[key] = size
+            self._disk_bytes += size
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        self._disk_bytes -= self._files.pop(key, 0)
+
+    def _touch(self, key):
+        self._files.move_to_end(key)
+        try:
+            os.utime(self._path(key, '.json'))
+        except FileNotFoundError:
+            pass
+
+    def _write(self, key, extension, data):
+        # Write then rename, so other processes never read a partial file
+        path = self._path(key, extension)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        if extension == '.npy':
+            with open(temporary, 'wb') as f:
+                np.save(f, data)
+        else:
+            with open(temporary, 'wb') as f:
+                f.write(data)
+        os.replace(temporary, path)
+        return os.path.getsize(path)
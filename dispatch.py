@@ -0,0 +1,112 @@
+
+class Dispatcher:
+    """
+    Assigns each call to an elevator of an ElevatorSystem. Only the assigned elevator picks the passenger up.
+
+    Subclasses implement assign().
+    """
+    def assign(self, elevator_system, passenger):
+        """
+        Choose the elevator that will pick up a passenger who just called.
+
+        Args:
+            elevator_system (ElevatorSystem): The elevator system.
+            passenger (Passenger): The passenger calling the elevator.
+
+        Returns:
+            Elevator: The elevator that will serve the passenger.
+        """
+        raise NotImplementedError
+
+class CostDispatcher(Dispatcher):
+    """
+    Assigns each call to the elevator with the lowest estimated time to reach the caller, going their way.
+
+    The estimate follows the sweep an elevator makes: the time left on its door timer, the floors it
+    travels through, and the door time of the stops it makes on the way for its riders and the
+    passengers already assigned to it, taken as spread evenly over the shaft. Cars with LOOK motion
+    are taken to turn around at the ends of the shaft too, as new calls keep extending their runs,
+    but an idle one heads straight for the caller. A stop the elevator would not make otherwise also
+    counts its door time for each passenger already committed to it, which spreads the load over the
+    elevators, and each full load already waiting for it on the floor adds a round trip. Each call
+    costs O(elevators).
+
+    When an elevator is too full to take the passengers assigned to it, they are assigned again.
+
+    With a Fleet, only cars stopping at both floors of the trip are considered, and each is costed with
+    its own travel-time table, door times and capacity.
+    """
+    def assign(self, elevator_system, passenger):
+        direction = 1 if passenger.destination_floor > passenger.start_floor else -1
+        elevators = elevator_system.elevators
+        if elevator_system.restricted:
+            elevators = [elevator for elevator in elevators
+                         if elevator.serves(passenger.start_floor) and elevator.serves(passenger.destination_floor)]
+        return min(elevators, key=lambda elevator: self.estimate(elevator, passenger.start_floor, direction))
+
+    def estimate(self, elevator, floor, direction):
+        """
+        Estimate the time an elevator needs to reach a floor while moving in a direction.
+
+        Args:
+            elevator (Elevator): The elevator.
+            floor (int): The floor to reach.
+            direction (int): The direction the elevator should be moving in, 1 for up or -1 for down.
+
+        Returns:
+            int: The estimated number of time steps.
+        """
+        top, bottom = elevator.top, elevator.bottom
+        if elevator.look and elevator.moving_direction == 0:
+            # An idle car with LOOK motion heads straight for the floor
+            distance = abs(floor - elevator.current_floor)
+        else:
+            moving = elevator.moving_direction or direction
+            distance = sweep_distance(top, elevator.current_floor, moving, floor, direction, bottom)
+        cycle = 2 * (top - bottom)
+        load = len(elevator.passengers) + elevator.hall_calls.waiting
+        if distance == 0 and len(elevator.passengers) >= elevator.capacity:
+            # Full at the floor: it can only come back for the passenger
+            distance = cycle
+
+        # Stops made before getting there, for riders getting off and passengers already assigned
+        # getting on, taken as spread evenly over a round trip of the shaft
+        stops = len(elevator.destination_floors) + elevator.hall_calls.stops
+        stop_time = elevator.door_time * stops * min(distance, cycle) / cycle
+
+        # A stop the elevator would not make otherwise delays everyone already committed to it
+        if not (elevator.hall_calls.has_call(floor, direction) or floor in elevator.destination_floors):
+            stop_time += (elevator.lobby_time if floor == 1 else elevator.door_time) * load
+
+        # A round trip for every full load already waiting there for the elevator
+        queued = len(elevator.hall_calls.queue(floor, direction) or ())
+        full_penalty = elevator.travel_time(cycle) * (queued // elevator.capacity)
+        return elevator.door_timer + elevator.travel_time(distance) + stop_time + full_penalty
+
+def sweep_distance(num_floors, current_floor, moving_direction, floor, direction, lowest_floor=1):
+    """
+    Count the floors an elevator sweeping from end to end of the shaft travels to pass a floor in a direction.
+
+    Args:
+        num_floors (int): The number of floors in the building, or the top floor of the elevator's run.
+        current_floor (int): The floor the elevator is on.
+        moving_direction (int): The direction the elevator is moving in, 1 for up or -1 for down.
+        floor (int): The floor to pass.
+        direction (int): The direction to pass it in.
+        lowest_floor (int): The bottom floor of the elevator's run.
+
+    Returns:
+        int: The number of floors travelled.
+    """
+    ahead = (floor - current_floor) * moving_direction >= 0
+    if moving_direction == direction and ahead:
+        # On its way
+        return abs(floor - current_floor)
+    if moving_direction == direction:
+        # Just passed it: to the end, to the other end and back
+        return 2 * (num_floors - lowest_floor) - abs(floor - current_floor)
+    if moving_direction > 0:
+        # To the top and back down
+        return (num_floors - current_floor) + (num_floors - floor)
+    # To the lobby and back up
+    return (current_floor - lowest_floor) + (floor - lowest_floor)
@@ -1,12 +1,188 @@
-from collections import deque
+import heapq
+import math
+from bisect import bisect_right
+from collections import deque, namedtuple
+from functools import lru_cache
+
+import numpy as np
 
 DOOR_TIME = 5  # time to open doors at each floor
 LOBBY_TIME = 30  # time to open doors at lobby
 ELEVATOR_CAPACITY = 10  # max number of passengers in an elevator
+IDLE_STEPS = 1 << 62  # quiet steps of an elevator that has nothing to do until the next call
+ENGINE_VERSION = 1  # bump when a change to the elevators or engines changes the results of a run
+
+CarSpec = namedtuple('CarSpec', ['capacity', 'door_time', 'lobby_time', 'speed', 'acceleration', 'served_floors',
+                                 'motion', 'home_floor'],
+                     defaults=[ELEVATOR_CAPACITY, DOOR_TIME, LOBBY_TIME, 1, None, None, 'sweep', None])
+CarSpec.__doc__ = """
+The make of an elevator car.
+
+Attributes:
+    capacity (int): The maximum number of passengers in the car.
+    door_time (int): The time the doors stay open at each floor.
+    lobby_time (int): The time the doors stay open at the lobby.
+    speed (float): The top speed of the car, in floors per time step.
+    acceleration (float): The acceleration and deceleration of the car, in floors per time step
+        squared, or None to reach top speed at once.
+    served_floors (iterable): The floors the car stops at, or None for every floor. A car serving
+        the lobby and a block of upper floors runs express through the floors in between.
+    motion (str): 'sweep' to travel from end to end of the car's run, or 'look' to turn around at
+        the last stop or hall call ahead and stand still when there is nothing to do.
+    home_floor (int): The floor where a 'look' car parks when idle, or None to stay where it is.
+"""
+
+@lru_cache(maxsize=None)
+def travel_times(num_floors, speed=1, acceleration=None):
+    """
+    Tabulate the time steps a car needs to travel any number of floors between two stops, speeding
+    up to its top speed and slowing down again.
+
+    Args:
+        num_floors (int): The number of floors in the building.
+        speed (float): The top speed of the car, in floors per time step.
+        acceleration (float): The acceleration of the car, or None to reach top speed at once.
+
+    Returns:
+        tuple: The time steps to travel 0 to num_floors - 1 floors, shared by every car of the same make.
+    """
+    times = [0]
+    for distance in range(1, num_floors):
+        if acceleration is None:
+            seconds = distance / speed
+        elif distance >= speed * speed / acceleration:
+            # Speeds up, cruises and slows down
+            seconds = distance / speed + speed / acceleration
+        else:
+            # Never reaches top speed
+            seconds = 2 * math.sqrt(distance / acceleration)
+        times.append(max(1, math.ceil(seconds - 1e-9)))
+    return tuple(times)
+
+class Fleet:
+    """
+    The cars of an elevator system, one CarSpec per elevator.
+
+    Attributes:
+        cars (list): The CarSpec of each elevator, by elevator ID.
+    """
+    def __init__(self, cars):
+        self.cars = list(cars)
+
+    @classmethod
+    def uniform(cls, num_elevators, **spec):
+        """
+        Make a fleet of identical cars.
+
+        Args:
+            num_elevators (int): The number of cars.
+            **spec: The CarSpec fields of every car.
+
+        Returns:
+            Fleet: The fleet.
+        """
+        return cls([CarSpec(**spec)] * num_elevators)
+
+    def __len__(self):
+        return len(self.cars)
+
+class _TableColumn:
+    """
+    A Passenger attribute that lives in the PassengerTable of its elevator system once the
+    passenger has called the elevator, and on the passenger itself before that.
+    """
+    def __init__(self, column):
+        self.column = column
+        self.local = '_' + column
+
+    def __get__(self, passenger, owner=None):
+        if passenger is None:
+            return self
+        if passenger.index is None:
+            return getattr(passenger, self.local)
+        value = getattr(passenger.elevator_system.passenger_table, self.column)[passenger.index]
+        return None if value < 0 else int(value)
+
+    def __set__(self, passenger, value):
+        if passenger.index is None:
+            setattr(passenger, self.local, value)
+        else:
+            getattr(passenger.elevator_system.passenger_table, self.column)[passenger.index] = (
+                -1 if value is None else value)
+
+class PassengerTable:
+    """
+    A columnar store of the passengers that have called the elevator, one row per passenger.
+
+    Attributes:
+        size (int): The number of rows in use.
+        start_floor, destination_floor (numpy.ndarray): The floors each passenger travels between.
+        elevator_id (numpy.ndarray): The elevator each passenger boarded, -1 if none yet.
+        call_time, board_time, alight_time (numpy.ndarray): The passengers' timestamps, -1 if not reached yet.
+    """
+    COLUMNS = ('start_floor', 'destination_floor', 'elevator_id', 'call_time', 'board_time', 'alight_time')
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        for column in self.COLUMNS:
+            setattr(self, column, np.full(capacity, -1, dtype=np.int64))
+
+    def __len__(self):
+        return self.size
+
+    def append(self, start_floor, destination_floor):
+        """
+        Add a row for a new passenger, growing the columns if needed.
+
+        Returns:
+            int: The index of the new row.
+        """
+        if self.size == len(self.start_floor):
+            for column in self.COLUMNS:
+                grown = np.full(2 * self.size, -1, dtype=np.int64)
+                grown[:self.size] = getattr(self, column)
+                setattr(self, column, grown)
+        index = self.size
+        self.start_floor[index] = start_floor
+        self.destination_floor[index] = destination_floor
+        self.size += 1
+        return index
+
+    def times(self, current_time):
+        """
+        Calculate the wait, ride and total times of every passenger, as Passenger does for one.
+
+        Args:
+            current_time (int): The current time in the system, for passengers still in flight.
+
+        Returns:
+            tuple: Arrays of wait times, ride times and total times.
+        """
+        n = self.size
+        call_time, board_time, alight_time = self.call_time[:n], self.board_time[:n], self.alight_time[:n]
+        boarded = board_time >= 0
+        wait_times = np.where(boarded, board_time - 1, current_time) - call_time
+        wait_times[self.start_floor[:n] == self.destination_floor[:n]] = 0
+        ride_times = np.where(alight_time >= 0, alight_time - 1, current_time) - board_time + 1
+        ride_times[~boarded] = 0
+        return wait_times, ride_times, wait_times + ride_times
 
 class Passenger:
-    """A class representing a passenger in the elevator system."""
-    elevator = None
+    """
+    A class representing a passenger in the elevator system.
+
+    The passenger records the times at which they called the elevator, boarded it and got off.
+    Wait and ride times are derived from those timestamps, so passengers never need stepping.
+    Once the elevator is called, the timestamps are kept in the system's PassengerTable.
+    """
+    __slots__ = ('start_floor', 'destination_floor', 'current_floor', 'elevator', 'elevator_system', 'index',
+                 '_elevator_id', '_call_time', '_board_time', '_alight_time')
+
+    elevator_id = _TableColumn('elevator_id')  # ID of the elevator the passenger boarded
+    call_time = _TableColumn('call_time')  # System time at which the elevator was called
+    board_time = _TableColumn('board_time')  # Step in which the passenger boarded
+    alight_time = _TableColumn('alight_time')  # Step in which the passenger got off
+
     def __init__(self, start_floor, destination_floor):
         """
         Initialize a new Passenger object.
@@ -18,17 +194,41 @@ class Passenger:
         self.start_floor = start_floor
         self.destination_floor = destination_floor
         self.current_floor = start_floor
-        self.wait_time = 0  # Time spent waiting for the elevator
-        self.ride_time = 0  # Time spent inside the elevator
+        self.elevator = None
+        self.elevator_system = None
+        self.index = None  # Row in the system's PassengerTable
+        self._elevator_id = None
+        self._call_time = None
+        self._board_time = None
+        self._alight_time = None
 
-    def step(self):
+    @property
+    def wait_time(self):
         """
-        Update the passenger's wait time or ride time, depending on whether they are in the elevator or not.
+        Calculate the time spent waiting for the elevator: every step after the call up to,
+        but not including, the step in which the passenger boarded.
+
+        Returns:
+            int: The time spent waiting for the elevator.
         """
-        if self.elevator:
-            self.ride_time += 1
-        elif self.elevator is None and self.current_floor != self.destination_floor:
-            self.wait_time += 1
+        if self.call_time is None or self.start_floor == self.destination_floor:
+            return 0
+        end = self.board_time - 1 if self.board_time is not None else self.elevator_system.current_time
+        return end - self.call_time
+
+    @property
+    def ride_time(self):
+        """
+        Calculate the time spent inside the elevator: every step from boarding up to, but not
+        including, the step in which the passenger got off.
+
+        Returns:
+            int: The time spent inside the elevator.
+        """
+        if self.board_time is None:
+            return 0
+        end = self.alight_time - 1 if self.alight_time is not None else self.elevator_system.current_time
+        return end - self.board_time + 1
 
     @property
     def total_time(self):
@@ -40,11 +240,102 @@ class Passenger:
         """
         return self.wait_time + self.ride_time
 
+class HallCalls:
+    """
+    The passengers waiting for an elevator, in FIFO queues per floor and direction of travel.
+
+    Attributes:
+        calls (dict): Queues (deque) of waiting passengers, keyed by direction of travel (1 for up,
+            -1 for down) and then by floor.
+        pending_floors (dict): Bitmaps of the floors with passengers waiting, keyed by direction of travel.
+        waiting (int): The number of passengers waiting.
+        stops (int): The number of floor and direction pairs with passengers waiting.
+    """
+    def __init__(self):
+        self.calls = {1: {}, -1: {}}
+        self.pending_floors = {1: 0, -1: 0}  # Bit f is set if someone is waiting on floor f
+        self.waiting = 0
+        self.stops = 0
+
+    def add(self, passenger):
+        """
+        Add a passenger to the back of the queue of the floor they are waiting on.
+
+        Args:
+            passenger (Passenger): The passenger, who must not already be on their destination floor.
+        """
+        direction = 1 if passenger.destination_floor > passenger.start_floor else -1
+        queue = self.calls[direction].get(passenger.start_floor, None)
+        if queue is None:
+            queue = self.calls[direction][passenger.start_floor] = deque()
+        if not queue:
+            self.stops += 1
+        if queue and queue[-1].index > passenger.index:
+            # A passenger handed over from another elevator keeps their place in the order of calls
+            position = len(queue) - 1
+            while position > 0 and queue[position - 1].index > passenger.index:
+                position -= 1
+            queue.insert(position, passenger)
+        else:
+            queue.append(passenger)
+        self.pending_floors[direction] |= 1 << passenger.start_floor
+        self.waiting += 1
+
+    def remove(self, passenger):
+        """
+        Remove a passenger from the queue of the floor they are waiting on.
+
+        Args:
+            passenger (Passenger): The waiting passenger.
+        """
+        direction = 1 if passenger.destination_floor > passenger.start_floor else -1
+        queue = self.calls[direction][passenger.start_floor]
+        if queue[0] is passenger:
+            queue.popleft()
+        else:
+            queue.remove(passenger)
+        self.waiting -= 1
+        if not queue:
+            self.pending_floors[direction] &= ~(1 << passenger.start_floor)
+            self.stops -= 1
+
+    def queue(self, floor, direction):
+        """
+        Get the queue of passengers waiting on a floor to go in a direction.
+
+        Returns:
+            deque: The queue, or None if nobody ever waited there.
+        """
+        return self.calls[direction].get(floor)
+
+    def has_call(self, floor, direction):
+        """
+        Check if anyone is waiting on a floor to go in a direction.
+
+        Returns:
+            bool: True if the queue of the floor for that direction is not empty.
+        """
+        return bool(self.pending_floors[direction] >> floor & 1)
+
+    def nearest_call(self, floor, direction):
+        """
+        Find the nearest floor, starting from the given one and moving in a direction, where someone
+        is waiting to go in that direction.
+
+        Returns:
+            int: The floor, or None if nobody is waiting ahead.
+        """
+        if direction > 0:
+            ahead = self.pending_floors[1] >> floor
+            return floor + (ahead & -ahead).bit_length() - 1 if ahead else None
+        ahead = self.pending_floors[-1] & ((2 << floor) - 1)
+        return ahead.bit_length() - 1 if ahead else None
+
 class Elevator:
     """
     A class representing an elevator in the elevator system.
     """
-    def __init__(self, elevator_system, elevator_id, num_floors):
+    def __init__(self, elevator_system, elevator_id, num_floors, spec=None):
         """
         Initialize a new Elevator object.
 
@@ -52,14 +343,41 @@ class Elevator:
             elevator_system (ElevatorSystem): The elevator system that the elevator belongs to.
             elevator_id (int): The ID of the elevator.
             num_floors (int): The number of floors in the building.
+            spec (CarSpec): The make of the car, or None for the default one.
         """
         self.elevator_system = elevator_system
         self.elevator_id = elevator_id
         self.num_floors = num_floors
+        # The calls this elevator serves: its own when a dispatcher assigns them, otherwise everyone's
+        self.hall_calls = elevator_system.hall_calls if elevator_system.dispatcher is None else HallCalls()
+
+        self.spec = spec = spec or CarSpec()
+        self.capacity = spec.capacity
+        self.door_time = spec.door_time
+        self.lobby_time = spec.lobby_time
+        self.served_floors = None if spec.served_floors is None else frozenset(spec.served_floors)
+        if self.served_floors is not None and (len(self.served_floors) < 2 or min(self.served_floors) < 1 or
+                                               max(self.served_floors) > num_floors):
+            raise ValueError(f"Elevator {elevator_id} must serve at least two floors between 1 and {num_floors}")
+        self.bottom = 1 if self.served_floors is None else min(self.served_floors)  # ends of the car's run
+        self.top = num_floors if self.served_floors is None else max(self.served_floors)
+        if spec.motion not in ('sweep', 'look'):
+            raise ValueError(f"Unknown motion: {spec.motion}")
+        self.look = spec.motion == 'look'
+        self.home_floor = spec.home_floor
+        if self.home_floor is not None and not (self.bottom <= self.home_floor <= self.top and self.serves(self.home_floor)):
+            raise ValueError(f"Elevator {elevator_id} does not serve its home floor {self.home_floor}")
+        self.travel_times = travel_times(num_floors, spec.speed, spec.acceleration)
+        # Cars covering one floor per time step move floor by floor, others from stop to stop
+        self.linear = self.travel_times == tuple(range(num_floors))
 
         self.is_door_open = False
         self.door_timer = 0  # time to next action (move or close door)
-        self.current_floor = 1 if self.elevator_id % 2 == 0 else self.num_floors
+        self.current_floor = self.bottom if self.elevator_id % 2 == 0 else self.top
+        if self.home_floor is not None:
+            self.current_floor = self.home_floor
+        self.run_start = None  # floor the car left for its next stop, None while at a floor
+        self.run_ticks = 0  # time steps since it left
         self.passengers = []
         self.destination_floors = set()
         self.moving_direction = 0  # -1 for down, 0 for idle, 1 for up
@@ -76,49 +394,279 @@ class Elevator:
         if self.door_timer > 0:
             self.door_timer -= 1
 
-        did_drop_off = 0
+        # Between two floors, the car can only keep moving
+        if self.run_start is None:
+            did_drop_off = 0
 
-        # Remove the floor from destinations if we've arrived
-        if self.current_floor in self.destination_floors:
-            did_drop_off = self.drop_off_passengers()
+            # Remove the floor from destinations if we've arrived
+            if self.current_floor in self.destination_floors:
+                did_drop_off = self.drop_off_passengers()
 
-        if self.current_floor == self.num_floors:
-            self.moving_direction = -1
-        elif self.current_floor == 1:
-            self.moving_direction = 1
+            if self.look:
+                self.moving_direction = self._look_direction()
+            elif self.current_floor == self.top:
+                self.moving_direction = -1
+            elif self.current_floor == self.bottom:
+                self.moving_direction = 1
 
-        # Before moving, check if we can pick up any passengers
-        did_pick_up = self.check_for_pickups()
+            # Before moving, check if we can pick up any passengers
+            did_pick_up = self.check_for_pickups()
 
-        # If the door was closed and we should it, set the timer to close it
-        if not self.is_door_open and (did_drop_off or did_pick_up):
-            self.stops_made += 1
-            self.is_door_open = True
-            self.door_timer = LOBBY_TIME if self.current_floor == 1 else DOOR_TIME
+            # If the door was closed and we should it, set the timer to close it
+            if not self.is_door_open and (did_drop_off or did_pick_up):
+                self.stops_made += 1
+                self.is_door_open = True
+                self.door_timer = self.lobby_time if self.current_floor == 1 else self.door_time
+                if self.elevator_system.recorder is not None:
+                    self.elevator_system.recorder.stop(self.elevator_system.current_time, self.elevator_id,
+                                                       self.current_floor, did_drop_off, did_pick_up,
+                                                       len(self.passengers))
 
         # Elif we can move
         if self.door_timer == 0:
             self.is_door_open = False
 
-            if not self.destination_floors:
-                if self.current_floor == self.num_floors:
-                    self.destination_floors.add(1)
+            if not self.destination_floors and not self.look:
+                if self.current_floor == self.top:
+                    self.destination_floors.add(self.bottom)
                     self.moving_direction = -1
-                elif self.current_floor == 1:
-                    self.destination_floors.add(self.num_floors)
+                elif self.current_floor == self.bottom:
+                    self.destination_floors.add(self.top)
                     self.moving_direction = 1
                 elif self.elevator_id % 2 == 0:
-                    self.destination_floors.add(1)
+                    self.destination_floors.add(self.bottom)
                     self.moving_direction = -1
                 else:
-                    self.destination_floors.add(self.num_floors)
+                    self.destination_floors.add(self.top)
                     self.moving_direction = 1
-            # # Move the elevator one floor in its current direction
-            next_floor = self.current_floor + self.moving_direction
-            if 1 <= next_floor <= self.num_floors:
+            self.move()
+            for passenger in self.passengers:
+                passenger.current_floor = self.current_floor
+
+    def move(self):
+        """
+        Move the car for one time step in its current direction: one floor, or for cars with another
+        speed, along its run to the next stop.
+        """
+        direction = self.moving_direction
+        if self.linear or (self.run_start is None and direction == 0):
+            next_floor = self.current_floor + direction
+            if self.bottom <= next_floor <= self.top:
                 self.current_floor = next_floor
             else:
                 self.moving_direction = 0
+            return
+        if self.run_start is None:
+            if not self.bottom <= self.current_floor + direction <= self.top:
+                self.moving_direction = 0
+                return
+            self.run_start, self.run_ticks = self.current_floor, 0
+        self.run_ticks += 1
+        self._place()
+
+    def _place(self):
+        """
+        Put a car that is on a run on the floor it has reached, ending the run at the next stop.
+        """
+        direction = self.moving_direction
+        distance = abs(self.next_stop() - self.run_start)
+        if self.travel_times[distance] <= self.run_ticks:
+            self.current_floor = self.run_start + direction * distance
+            self.run_start = None
+        else:
+            covered = bisect_right(self.travel_times, self.run_ticks, 0, distance) - 1
+            self.current_floor = self.run_start + direction * covered
+
+    def next_stop(self):
+        """
+        Find the next floor the car has to stop at ahead of it: the nearest destination, the nearest
+        floor it serves where someone waits to go its way, or the end of its run.
+
+        Returns:
+            int: The floor.
+        """
+        floor, direction = self.current_floor, self.moving_direction
+        if self.look:
+            stop = self._look_stop(floor + direction, direction)
+            # Nothing left ahead, as another car took the call: stop as soon as possible
+            return floor + direction if stop is None else stop
+        if direction > 0:
+            stop = min([f for f in self.destination_floors if f > floor] + [self.top])
+        else:
+            stop = max([f for f in self.destination_floors if f < floor] + [self.bottom])
+        call_floor = self.hall_calls.nearest_call(floor + direction, direction)
+        while call_floor is not None and (stop - call_floor) * direction > 0 and not self.serves(call_floor):
+            call_floor = self.hall_calls.nearest_call(call_floor + direction, direction)
+        if call_floor is not None and (stop - call_floor) * direction > 0:
+            stop = call_floor
+        return stop
+
+    def _look_stop(self, floor, direction):
+        """
+        Find the nearest floor, starting from the given one and moving in a direction, where a car with
+        LOOK motion stops: a destination, a served floor where someone waits to go that way, or the
+        farthest one where someone waits to go the other way, where it turns around. With nothing to do
+        anywhere, the car heads for its home floor.
+
+        Returns:
+            int: The floor, or None if the car has no reason to go that way.
+        """
+        hall_calls = self.hall_calls
+        if direction > 0:
+            stops = [f for f in self.destination_floors if f >= floor]
+            beyond = hall_calls.pending_floors[-1] >> floor
+            if beyond:
+                stops.append(floor + beyond.bit_length() - 1)
+        else:
+            stops = [f for f in self.destination_floors if f <= floor]
+            beyond = hall_calls.pending_floors[1] & ((2 << floor) - 1)
+            if beyond:
+                stops.append((beyond & -beyond).bit_length() - 1)
+        call_floor = hall_calls.nearest_call(floor, direction)
+        if call_floor is not None:
+            stops.append(call_floor)
+        if stops:
+            return min(stops) if direction > 0 else max(stops)
+        home = self.home_floor
+        if home is not None and (home - floor) * direction >= 0 and not self.destination_floors and not hall_calls.waiting:
+            return home
+        return None
+
+    def _look_direction(self):
+        """
+        Choose the direction of a car with LOOK motion standing at a floor: on while there is something
+        to do ahead, back when there is only something behind, and towards the nearest thing to do when idle.
+
+        Returns:
+            int: 1 for up, -1 for down, or 0 to stand still.
+        """
+        floor, direction = self.current_floor, self.moving_direction
+        if direction and (self._look_stop(floor + direction, direction) is not None or
+                          self.hall_calls.has_call(floor, direction)):
+            return direction
+        if direction and (self._look_stop(floor - direction, -direction) is not None or
+                          self.hall_calls.has_call(floor, -direction)):
+            return -direction
+        if direction:
+            return 0
+        # Idle: check_for_pickups() takes whoever waits here, otherwise head for the nearest stop
+        up = self._look_stop(floor + 1, 1) if floor < self.top else None
+        down = self._look_stop(floor - 1, -1) if floor > self.bottom else None
+        if up is None and down is None:
+            return 0
+        if down is None or (up is not None and up - floor <= floor - down):
+            return 1
+        return -1
+
+    def serves(self, floor):
+        """
+        Check if the car stops at a floor.
+        """
+        return self.served_floors is None or floor in self.served_floors
+
+    def travel_time(self, distance):
+        """
+        Look up the time steps the car needs to travel a number of floors between two stops, going on at
+        top speed past the end of the table for distances spanning several sweeps.
+
+        Args:
+            distance (int): The number of floors.
+
+        Returns:
+            int: The number of time steps.
+        """
+        last = len(self.travel_times) - 1
+        if distance <= last:
+            return self.travel_times[distance]
+        return self.travel_times[last] + math.ceil((distance - last) / self.spec.speed)
+
+    def quiet_steps(self):
+        """
+        Count the upcoming steps in which the elevator can only count down its door timer or
+        travel past floors, assuming no new calls arrive in the meantime.
+
+        Returns:
+            int: The number of steps that can be skipped with advance().
+        """
+        direction = self.moving_direction
+        floor = self.current_floor
+        if self.door_timer > 0:
+            # Doors held open: nothing happens until they close, unless someone can still board
+            if not self.is_door_open or (len(self.passengers) < self.capacity and
+                                         self._has_pickup(floor, direction)):
+                return 0
+            if self.look and (not self._look_settled() or self._has_pickup(floor, 0)):
+                return 0
+            return self.door_timer - 1
+        if self.look and not self.is_door_open and self.run_start is None:
+            # Stands still until a call comes, or passes floors up to the next stop
+            if direction == 0:
+                return 0 if self._look_direction() or self._has_pickup(floor, 0) else IDLE_STEPS
+            stop = self._look_stop(floor, direction)
+            if stop is None or not self.linear or not self._look_settled():
+                return 0
+            return abs(stop - floor)
+        if self.is_door_open or direction == 0 or not self.destination_floors:
+            return 0
+        if not self.linear:
+            # On a run, nothing happens until the step that reaches the next stop
+            if self.run_start is None:
+                return 0
+            stop = self.next_stop()
+            if self.look and self.elevator_system.dispatcher is None and self.hall_calls.waiting:
+                # Other cars can take the calls ahead, which moves the stop of a LOOK car, or leave it
+                # with nothing to do ahead, when it stops at the next floor it reaches along the run
+                calls = self.hall_calls.pending_floors[1] | self.hall_calls.pending_floors[-1]
+                ahead = calls >> (floor + 1) if direction > 0 else calls & ((1 << floor) - 1)
+                if ahead or stop not in self.destination_floors:
+                    return 0
+            return self.travel_times[abs(stop - self.run_start)] - self.run_ticks - 1
+        # The next stop is the nearest destination ahead, or the end of the shaft
+        if direction > 0:
+            stop = min([f for f in self.destination_floors if f >= floor] + [self.top])
+        else:
+            stop = max([f for f in self.destination_floors if f <= floor] + [self.bottom])
+        # Or a floor on the way with someone waiting to go in the same direction
+        call_floor = self.hall_calls.nearest_call(floor, direction)
+        if call_floor is not None and (call_floor - floor) * direction < (stop - floor) * direction:
+            stop = call_floor
+        return abs(stop - floor)
+
+    def _look_settled(self):
+        """
+        Check if a car with LOOK motion keeps its direction until its next stop, barring new calls.
+        """
+        floor, direction = self.current_floor, self.moving_direction
+        if self._look_direction() != direction:
+            return False
+        # Other elevators may take the calls it heads for, unless it has riders to drop off ahead
+        return self.elevator_system.dispatcher is not None or any(
+            (f - floor) * direction > 0 for f in self.destination_floors)
+
+    def _has_pickup(self, floor, direction):
+        """
+        Check if anyone is waiting on a floor to go in a direction, as check_for_pickups() would see it.
+        """
+        return ((direction >= 0 and self.hall_calls.has_call(floor, 1)) or
+                (direction <= 0 and self.hall_calls.has_call(floor, -1)))
+
+    def advance(self, steps):
+        """
+        Apply a number of quiet steps at once, as counted by quiet_steps().
+
+        Args:
+            steps (int): The number of steps to skip.
+        """
+        if steps <= 0:
+            return
+        self.time_in_operation += steps
+        if self.door_timer > 0:
+            self.door_timer -= steps
+        elif self.run_start is not None:
+            self.run_ticks += steps
+            self._place()
+        else:
+            self.current_floor += self.moving_direction * steps
             for passenger in self.passengers:
                 passenger.current_floor = self.current_floor
 
@@ -130,14 +678,38 @@ class Elevator:
             bool: True if the elevator should open its doors, False otherwise.
         """
         did_pick_up = 0
-        for passenger in list(self.elevator_system.calls.get(self.current_floor, [])):
-            if (    ((self.moving_direction >= 0 and passenger.destination_floor > self.current_floor) or
-                     (self.moving_direction <= 0 and passenger.destination_floor < self.current_floor))):
-                if self.pick_up(passenger):
-                    self.moving_direction = 1 if passenger.destination_floor > self.current_floor else -1
-                    did_pick_up += 1
-                else:
+        if not self.serves(self.current_floor):
+            return did_pick_up
+        direction = self.moving_direction
+        up = self.hall_calls.queue(self.current_floor, 1)
+        down = self.hall_calls.queue(self.current_floor, -1)
+        if direction == 0:
+            # An idle elevator takes whoever called first, and then others going the same way
+            if up and (not down or up[0].index < down[0].index):
+                direction = 1
+            elif down:
+                direction = -1
+        queue = up if direction > 0 else down
+        if self.served_floors is not None:
+            # Passengers going to a floor the car does not stop at wait for another car
+            queue = [passenger for passenger in queue or () if passenger.destination_floor in self.served_floors]
+            for i, passenger in enumerate(queue):
+                if not self.pick_up(passenger):
+                    if self.elevator_system.dispatcher is not None and self.door_timer == 0:
+                        self.elevator_system.reassign(self, queue[i:])
                     break
+                self.moving_direction = direction
+                did_pick_up += 1
+            return did_pick_up
+        while queue:
+            if self.pick_up(queue[0]):
+                self.moving_direction = direction
+                did_pick_up += 1
+            else:
+                if self.elevator_system.dispatcher is not None and self.door_timer == 0:
+                    # Full as it leaves: let the dispatcher find another car rather than wait for this one to come back
+                    self.elevator_system.reassign(self, list(queue))
+                break
         return did_pick_up
 
     def pick_up(self, passenger):
@@ -150,11 +722,13 @@ class Elevator:
         Returns:
             bool: True if the passenger was added, False otherwise.
         """
-        if len(self.passengers) < ELEVATOR_CAPACITY:
+        if len(self.passengers) < self.capacity:
             passenger.elevator = self
+            passenger.elevator_id = self.elevator_id
+            passenger.board_time = self.elevator_system.current_time
             self.passengers.append(passenger)
             self.destination_floors.add(passenger.destination_floor)
-            self.elevator_system.calls[self.current_floor].remove(passenger)
+            self.hall_calls.remove(passenger)
             self.passengers_served += 1
             return True
         return False
@@ -171,7 +745,13 @@ class Elevator:
             if passenger.destination_floor == self.current_floor:
                 passenger.current_floor = self.current_floor
                 passenger.elevator = None
+                passenger.alight_time = self.elevator_system.current_time
                 self.passengers.remove(passenger)
+                self.elevator_system.active_passengers.discard(passenger)
+                if self.elevator_system.online_stats is not None:
+                    self.elevator_system.online_stats.add(passenger.wait_time, passenger.ride_time)
+                if self.elevator_system.recorder is not None:
+                    self.elevator_system.recorder.trip(passenger)
                 did_drop_off += 1
         self.destination_floors.remove(self.current_floor)
         return did_drop_off
@@ -182,17 +762,53 @@ class ElevatorSystem:
 
     Attributes:
         num_floors (int): The number of floors in the building.
+        fleet (Fleet): The make of each elevator, or None if they are all the default CarSpec.
         elevators (list): A list of Elevator objects in the system.
-        calls (deque): A queue of passengers waiting for the elevator.
-        passengers (list): A list of all passengers that have used the system.
+        restricted (bool): True if some elevators only serve some of the floors.
+        dispatcher (Dispatcher): Assigns each call to an elevator, or None to let any elevator
+            passing by pick up anyone waiting.
+        hall_calls (HallCalls): The passengers waiting for any elevator, when there is no dispatcher.
+        calls (dict): The queues of hall_calls.
+        passengers (list): A list of all passengers that have used the system, or of none when
+            online_stats or a recorder keeps the statistics (see keep_passengers).
+        keep_passengers (bool): Whether passengers are kept once delivered, rather than only while
+            they are active.
+        active_passengers (set): The passengers who are waiting or riding.
+        passenger_table (PassengerTable): The timestamps of all passengers that have used the system.
+        online_stats (OnlineStats): Statistics of delivered passengers, updated as each is dropped
+            off, or None to keep none.
+        recorder (EventRecorder): Records every trip completed and stop made, or None to record none.
         current_time (int): The current time in the system.
+        warmup (int): The time before which stats() leaves passengers out by default, set by
+            steady_state.run_until_converged to the warm-up it finds; 0 to leave nobody out.
+        fast_forward_enabled (bool): Whether run() fast-forwards over quiescent stretches, turned off by
+            instrumentation that has to see every step.
     """
-    def __init__(self, num_elevators, num_floors):
+    def __init__(self, num_elevators, num_floors, dispatcher=None, online_stats=None, fleet=None, recorder=None):
+        if fleet is not None and len(fleet) != num_elevators:
+            raise ValueError(f"The fleet has {len(fleet)} cars for {num_elevators} elevators")
         self.num_floors = num_floors
-        self.elevators = [Elevator(self, i, num_floors) for i in range(num_elevators)]
-        self.calls = {}  # Queues for passengers waiting for the elevator
+        self.fleet = fleet
+        self.dispatcher = dispatcher
+        self.hall_calls = HallCalls()
+        self.calls = self.hall_calls.calls  # Queues for passengers waiting for the elevator
+        specs = fleet.cars if fleet is not None else [None] * num_elevators
+        self.elevators = [Elevator(self, i, num_floors, spec) for i, spec in enumerate(specs)]
+        self.restricted = any(elevator.served_floors is not None for elevator in self.elevators)
+        if dispatcher is None and any(elevator.look and elevator.served_floors is not None for elevator in self.elevators):
+            # They would turn around for calls they cannot take
+            raise ValueError("Elevators with LOOK motion and served floors need a dispatcher")
         self.passengers = []  # All passengers that have used the system
+        # Runs that stream their statistics only need the passengers in flight
+        self.keep_passengers = online_stats is None and recorder is None
+        self.active_passengers = set()  # Passengers still waiting or riding
+        self.passenger_table = PassengerTable()
+        self.online_stats = online_stats
+        self.recorder = recorder
         self.current_time = 0
+        self.warmup = 0
+        self.fast_forward_enabled = True
+        self._interrupt = None  # Set by the event engine while it runs, see reassign()
 
     def call_elevator(self, passenger):
         """
@@ -201,11 +817,37 @@ class ElevatorSystem:
         Args:
             passenger (Passenger): The passenger calling the elevator.
         """
-        queue = self.calls.get(passenger.start_floor, None)
-        if queue is None:
-            self.calls[passenger.start_floor] = deque()
-        self.calls.get(passenger.start_floor).append(passenger)
-        self.passengers.append(passenger)
+        if self.restricted and passenger.destination_floor != passenger.start_floor and not any(
+                elevator.serves(passenger.start_floor) and elevator.serves(passenger.destination_floor)
+                for elevator in self.elevators):
+            raise ValueError(f"No elevator serves floors {passenger.start_floor} and {passenger.destination_floor}")
+        passenger.elevator_system = self
+        passenger.index = self.passenger_table.append(passenger.start_floor, passenger.destination_floor)
+        passenger.call_time = self.current_time
+        if self.keep_passengers:
+            self.passengers.append(passenger)
+        if passenger.destination_floor == passenger.start_floor:
+            return  # Already there, so never boards
+        self.active_passengers.add(passenger)
+        if self.dispatcher is None:
+            self.hall_calls.add(passenger)
+        else:
+            self.dispatcher.assign(self, passenger).hall_calls.add(passenger)
+
+    def reassign(self, elevator, passengers):
+        """
+        Hand passengers assigned to an elevator that is too full to take them back to the dispatcher.
+
+        Args:
+            elevator (Elevator): The elevator the passengers were assigned to.
+            passengers (list): The passengers, waiting on the floor the elevator is at.
+        """
+        if self._interrupt is not None:
+            self._interrupt()
+        for passenger in passengers:
+            elevator.hall_calls.remove(passenger)
+        for passenger in passengers:
+            self.dispatcher.assign(self, passenger).hall_calls.add(passenger)
 
     def step(self):
         """
@@ -214,18 +856,151 @@ class ElevatorSystem:
         self.current_time += 1
         for elevator in self.elevators:
             elevator.step()
-        for passenger in self.passengers:
-            passenger.step()
 
-    def run(self, num_steps):
-        # Run the system for a given number of time steps
-        for _ in range(num_steps):
-            self.step()
+    def run(self, num_steps, time_series=None, engine='tick'):
+        """
+        Run the system for a given number of time steps.
 
-    def stats(self):
+        Args:
+            num_steps (int): The number of time steps to run.
+            time_series (dict): Passengers to call, keyed by the step offset from the start of the run.
+            engine (str): 'tick' to step every elevator each time step, fast-forwarding over
+                quiescent stretches until the next call, or 'event' to jump from one event (call,
+                door timer expiry, stop at a floor) to the next. Both engines produce the same stats().
+        """
+        if engine == 'event':
+            return self._run_events(num_steps, time_series or {})
+        if engine != 'tick':
+            raise ValueError(f"Unknown engine: {engine}")
+        time_series = time_series or {}
+        # The times of the calls, to fast-forward to the next one
+        arrivals = sorted(t for t in time_series if 0 <= t < num_steps) if self.fast_forward_enabled else None
+        next_arrival = 0
+        t = 0
+        while t < num_steps:
+            if t in time_series:
+                for passenger in time_series[t]:
+                    self.call_elevator(passenger)
+            if arrivals is not None and self.is_quiescent():
+                while next_arrival < len(arrivals) and arrivals[next_arrival] <= t:
+                    next_arrival += 1
+                until = arrivals[next_arrival] if next_arrival < len(arrivals) else num_steps
+                self.fast_forward(until - t)
+                t = until
+            else:
+                self.step()
+                t += 1
+
+    def is_quiescent(self):
+        """
+        Check if nobody is waiting for or riding an elevator, so the elevators can only cruise or park.
+        """
+        if any(elevator.passengers for elevator in self.elevators):
+            return False
+        if self.dispatcher is None:
+            return not self.hall_calls.waiting
+        return not any(elevator.hall_calls.waiting for elevator in self.elevators)
+
+    def fast_forward(self, num_steps):
+        """
+        Run a number of quiescent steps, as step() would but without simulating every one: each elevator
+        is advanced over its quiet steps and only stepped where it turns around or its doors close.
+
+        Args:
+            num_steps (int): The number of steps to run, during which nobody calls an elevator.
+        """
+        start = self.current_time
+        for elevator in self.elevators:
+            done = 0
+            while done < num_steps:
+                skip = min(elevator.quiet_steps(), num_steps - done)
+                elevator.advance(skip)
+                done += skip
+                if done < num_steps:
+                    done += 1
+                    self.current_time = start + done
+                    elevator.step()
+        self.current_time = start + num_steps
+
+    def _run_events(self, num_steps, time_series):
+        """
+        Run the system with a next-event time advance.
+
+        The queue holds passenger calls and the next step in which each elevator has to be
+        simulated in full: a door timer expiring or a floor where it might stop. Elevators are
+        advanced over the quiet steps in between.
+        """
+        start = self.current_time
+        end = start + num_steps
+        clock = [start] * len(self.elevators)  # Last step simulated by each elevator
+        version = [0] * len(self.elevators)  # Invalidates queued steps after a reschedule
+        # Calls are made before the step following them, ahead of any elevator in that step
+        events = [(start + t + 1, -1, t) for t in time_series if 0 <= t < num_steps]
+        heapq.heapify(events)
+
+        def schedule(elevator):
+            i = elevator.elevator_id
+            version[i] += 1
+            tick = clock[i] + elevator.quiet_steps() + 1
+            if tick <= end:
+                heapq.heappush(events, (tick, i, version[i]))
+
+        def interrupt():
+            # Calls are about to be reassigned in the step of elevator i at tick: catch the other
+            # elevators up to the steps the tick engine has made by then, to reschedule them after it
+            for elevator in self.elevators:
+                j = elevator.elevator_id
+                if j != i:
+                    caught_up = tick if j < i else tick - 1
+                    elevator.advance(caught_up - clock[j])
+                    clock[j] = caught_up
+            interrupted[0] = True
+
+        for elevator in self.elevators:
+            schedule(elevator)
+        tick, i = start, -1
+        interrupted = [False]
+        self._interrupt = interrupt
+        try:
+            while events:
+                tick, i, tag = heapq.heappop(events)
+                if i < 0:
+                    self.current_time = tick - 1
+                    # New calls can cut a quiet stretch short, so catch up every elevator and reschedule
+                    for elevator in self.elevators:
+                        elevator.advance(self.current_time - clock[elevator.elevator_id])
+                        clock[elevator.elevator_id] = self.current_time
+                    for passenger in time_series[tag]:
+                        self.call_elevator(passenger)
+                    for elevator in self.elevators:
+                        schedule(elevator)
+                elif tag == version[i]:
+                    elevator = self.elevators[i]
+                    elevator.advance(tick - 1 - clock[i])
+                    self.current_time = tick
+                    elevator.step()
+                    clock[i] = tick
+                    if interrupted[0]:
+                        interrupted[0] = False
+                        for other in self.elevators:
+                            schedule(other)
+                    else:
+                        schedule(elevator)
+        finally:
+            self._interrupt = None
+        for elevator in self.elevators:
+            elevator.advance(end - clock[elevator.elevator_id])
+        self.current_time = end
+
+    def stats(self, warmup=None):
         """
         Calculate and return system statistics.
 
+        Args:
+            warmup (int): Leave out the passengers who called before this time from the passenger
+                statistics. Defaults to the warmup attribute, the warm-up found by
+                steady_state.run_until_converged if it ran the system.
+
         Returns:
             dict: A dictionary containing the following statistics:
                 - average_wait_time: The average wait time for passengers.
@@ -234,11 +1009,18 @@ class ElevatorSystem:
                 - max_wait_time: The maximum wait time for passengers.
                 - min_wait_time: The minimum wait time for passengers.
                 - elevators: A list of dictionaries containing statistics for each elevator in the system.
+                - delivered: With online_stats, the summary of the passengers delivered so far,
+                  including percentiles of their times.
         """
         # Calculate and return system statistics
-        wait_times = [p.wait_time for p in self.passengers]
-        ride_times = [p.ride_time for p in self.passengers]
-        total_times = [p.total_time for p in self.passengers]
+        wait_times, ride_times, total_times = self.passenger_table.times(self.current_time)
+        if warmup is None:
+            warmup = self.warmup
+        if warmup > 0:
+            # Calls are numbered in time order
+            first = int(np.searchsorted(self.passenger_table.call_time[:len(wait_times)], warmup))
+            wait_times, ride_times, total_times = wait_times[first:], ride_times[first:], total_times[first:]
+        count = len(wait_times)
         elevators = [{
                 str(elevator.elevator_id): {
                     'passengers_served': elevator.passengers_served,
@@ -246,14 +1028,17 @@ class ElevatorSystem:
                     'stops_made':elevator.stops_made,
                 }
             } for elevator in self.elevators]
-        return {
-            'average_wait_time': sum(wait_times) / len(wait_times) if wait_times else 0,
-            'average_ride_time': sum(ride_times) / len(ride_times) if ride_times else 0,
-            'average_total_time': sum(total_times) / len(total_times) if total_times else 0,
-            'max_wait_time': max(wait_times) if wait_times else 0,
-            'min_wait_time': min(wait_times) if wait_times else 0,
+        stats = {
+            'average_wait_time': int(wait_times.sum()) / count if count else 0,
+            'average_ride_time': int(ride_times.sum()) / count if count else 0,
+            'average_total_time': int(total_times.sum()) / count if count else 0,
+            'max_wait_time': int(wait_times.max()) if count else 0,
+            'min_wait_time': int(wait_times.min()) if count else 0,
             'elevators': elevators,
         }
+        if self.online_stats is not None:
+            stats['delivered'] = self.online_stats.summary()
+        return stats
 
 if __name__ == '__main__':
     # Example usage:
@@ -0,0 +1,303 @@
+import numpy as np
+
+from elevator import DOOR_TIME, ELEVATOR_CAPACITY, LOBBY_TIME
+from simulator import generate_call_arrays
+
+class Ensemble:
+    """
+    Many simulations of the same building, each with its own calls, stepped together with NumPy.
+
+    Every elevator of every simulation follows the rules of Elevator.step, and every simulation
+    ends up with the same stats() as an ElevatorSystem run with the same calls. The state is held
+    in arrays with a row per elevator (of all simulations), and the passengers waiting on each
+    floor to go each way are counted by a head and a tail into their calls in call order. Only
+    default cars are simulated, with no dispatcher, fleet or online statistics.
+
+    Attributes:
+        num_simulations (int): The number of simulations.
+        current_time (int): The current time in every simulation.
+        floors (numpy.ndarray): The floor of each elevator, shaped (num_simulations, num_elevators).
+        loads (numpy.ndarray): The number of passengers in each elevator, shaped as floors.
+    """
+    def __init__(self, num_elevators, num_floors, calls):
+        """
+        Args:
+            num_elevators (int): The number of elevators in each simulation.
+            num_floors (int): The number of floors in each simulation.
+            calls (list): The call time, start floor and destination floor of each passenger, sorted
+                by time, for each simulation; times count from the start of the first run.
+        """
+        self.num_elevators = num_elevators
+        self.num_floors = num_floors
+        self.num_simulations = n = len(calls)
+        self.current_time = 0
+        self.steps = 0  # Every elevator's time in operation
+        cars = n * num_elevators
+        self.car_sim = np.arange(cars) // num_elevators
+        self.car_id = np.arange(cars) % num_elevators
+        self.floor = np.where(self.car_id % 2 == 0, 1, num_floors)
+        self.direction = np.zeros(cars, dtype=np.int64)
+        self.door_timer = np.zeros(cars, dtype=np.int64)
+        self.door_open = np.zeros(cars, dtype=bool)
+        self.load = np.zeros(cars, dtype=np.int64)
+        self.destinations = np.zeros((cars, num_floors + 2), dtype=bool)
+        self.destination_count = np.zeros(cars, dtype=np.int64)
+        self.riders = np.zeros((cars, num_floors + 2), dtype=np.int64)  # Passengers riding, by destination
+        self.rider_board_times = np.zeros((cars, num_floors + 2), dtype=np.int64)  # Sums of their board times
+        self.passengers_served = np.zeros(cars, dtype=np.int64)
+        self.stops_made = np.zeros(cars, dtype=np.int64)
+        # Where each elevator's row starts in the per-floor arrays, which are indexed flattened
+        self.row_start = np.arange(cars) * (num_floors + 2)
+        self.last_rider = np.zeros(cars * (num_floors + 2), dtype=np.int64)  # Scratch space for _board
+
+        # Every passenger of every simulation, in call order within each simulation
+        lengths = [len(times) for times, _, _ in calls]
+        self.passenger_sim = np.repeat(np.arange(n), lengths)
+        self.call_time, self.start_floor, self.destination_floor = (
+            np.concatenate([np.asarray(c[i], dtype=np.int64) for c in calls]) if calls else np.zeros(0, dtype=np.int64)
+            for i in range(3))
+        self.passenger_index = np.arange(len(self.call_time)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        self.board_time = np.full(len(self.call_time), -1, dtype=np.int64)
+        self.alight_sum = np.zeros(n, dtype=np.int64)  # Sum of alight times of the passengers delivered
+        self.alighted_board_sum = np.zeros(n, dtype=np.int64)  # Sum of their board times
+        self.alighted = np.zeros(n, dtype=np.int64)
+
+        # Hall call queues, keyed by simulation, floor and direction (up, then down)
+        self.keys_per_sim = 2 * (num_floors + 2)
+        queued = np.flatnonzero(self.start_floor != self.destination_floor)
+        self.passenger_key = (self.passenger_sim * self.keys_per_sim + 2 * self.start_floor +
+                              (self.destination_floor < self.start_floor))
+        self.queue_order = queued[np.argsort(self.passenger_key[queued], kind='stable')]
+        key_counts = np.bincount(self.passenger_key[queued], minlength=n * self.keys_per_sim)
+        self.queue_start = np.cumsum(key_counts) - key_counts
+        self.head = np.zeros(n * self.keys_per_sim, dtype=np.int64)  # Passengers who boarded
+        self.tail = np.zeros(n * self.keys_per_sim, dtype=np.int64)  # Passengers who called
+        self.call_order = queued[np.argsort(self.call_time[queued], kind='stable')]
+        self.call_times = self.call_time[self.call_order]
+
+    @property
+    def floors(self):
+        return self.floor.reshape(self.num_simulations, self.num_elevators)
+
+    @property
+    def loads(self):
+        return self.load.reshape(self.num_simulations, self.num_elevators)
+
+    def waiting(self):
+        """
+        Returns:
+            numpy.ndarray: The number of passengers waiting on each floor to go up ([..., 0]) and down ([..., 1]),
+                shaped (num_simulations, num_floors, 2).
+        """
+        waiting = (self.tail - self.head).reshape(self.num_simulations, self.num_floors + 2, 2)
+        return waiting[:, 1:self.num_floors + 1]
+
+    def run(self, num_steps):
+        """
+        Run every simulation for a given number of time steps, making the calls due.
+        """
+        for _ in range(num_steps):
+            self.step()
+
+    def step(self):
+        """
+        Make the calls of the current time, and update every simulation by one time step.
+        """
+        calls = self.call_order[np.searchsorted(self.call_times, self.current_time, 'left'):
+                                np.searchsorted(self.call_times, self.current_time, 'right')]
+        np.add.at(self.tail, self.passenger_key[calls], 1)
+        self.current_time += 1
+        self.steps += 1
+        now, num_floors = self.current_time, self.num_floors
+        self.door_timer -= self.door_timer > 0
+
+        # Drop off passengers at a destination
+        did_drop_off = np.zeros(len(self.floor), dtype=bool)
+        destinations, riders = self.destinations.reshape(-1), self.riders.reshape(-1)
+        rider_board_times = self.rider_board_times.reshape(-1)
+        cells = self.row_start + self.floor
+        cars = np.flatnonzero(destinations.take(cells))
+        if len(cars):
+            cells = cells[cars]
+            dropped = riders[cells]
+            sims = self.car_sim[cars]
+            n = self.num_simulations
+            self.alight_sum += np.bincount(sims, weights=dropped * now, minlength=n).astype(np.int64)
+            self.alighted_board_sum += np.bincount(sims, weights=rider_board_times[cells], minlength=n).astype(np.int64)
+            self.alighted += np.bincount(sims, weights=dropped, minlength=n).astype(np.int64)
+            riders[cells] = 0
+            rider_board_times[cells] = 0
+            self.load[cars] -= dropped
+            destinations[cells] = False
+            self.destination_count[cars] -= 1
+            did_drop_off[cars] = dropped > 0
+
+        self.direction[self.floor == num_floors] = -1
+        self.direction[self.floor == 1] = 1
+        did_pick_up = self._pick_up(now)
+
+        # Open the doors to drop off or pick up
+        stop = np.flatnonzero(~self.door_open & (did_drop_off | did_pick_up))
+        self.stops_made[stop] += 1
+        self.door_open[stop] = True
+        self.door_timer[stop] = np.where(self.floor[stop] == 1, LOBBY_TIME, DOOR_TIME)
+
+        # Close the doors and move on, heading for the end of the shaft when there is nowhere to go
+        move = self.door_timer == 0
+        self.door_open &= ~move
+        idle = np.flatnonzero(move & (self.destination_count == 0))
+        floors = self.floor[idle]
+        down = (floors == num_floors) | ((floors != 1) & (self.car_id[idle] % 2 == 0))
+        self.destinations[idle, np.where(down, 1, num_floors)] = True
+        self.destination_count[idle] += 1
+        self.direction[idle] = np.where(down, -1, 1)
+        next_floor = self.floor + self.direction
+        inside = (next_floor >= 1) & (next_floor <= num_floors)
+        self.floor += self.direction * (move & inside)
+        self.direction[move & ~inside] = 0
+
+    def _pick_up(self, now):
+        """
+        Board the passengers waiting on each elevator's floor, as Elevator.check_for_pickups does.
+
+        Elevators of a simulation on the same floor take turns in the order of their IDs, as they are
+        stepped one after the other in an ElevatorSystem. Those already going one way fill up from the
+        head of that way's queue in that order, all at once; where an idle elevator has to choose its
+        way first, they take their turns one after the other.
+
+        Returns:
+            numpy.ndarray: Whether each elevator picked up anyone.
+        """
+        did_pick_up = np.zeros(len(self.floor), dtype=bool)
+        up_keys = self.car_sim * self.keys_per_sim + 2 * self.floor
+        keys = up_keys + (self.direction <= 0)
+        down_keys = up_keys + 1
+        up_waiting = self.tail.take(up_keys) - self.head.take(up_keys)
+        down_waiting = self.tail.take(down_keys) - self.head.take(down_keys)
+        idle = self.direction == 0
+        cars = np.flatnonzero((self.load < ELEVATOR_CAPACITY) &
+                              np.where(idle, up_waiting + down_waiting > 0,
+                                       np.where(self.direction > 0, up_waiting, down_waiting) > 0))
+        if not len(cars):
+            return did_pick_up
+        choosing = np.isin(up_keys[cars], up_keys[cars[idle[cars]]])
+
+        # Elevators going one way fill up in turn: each takes what the ones before it left
+        going = cars[~choosing]
+        going = going[np.argsort(keys[going], kind='stable')]
+        going_keys, room = keys[going], ELEVATOR_CAPACITY - self.load[going]
+        first = np.r_[True, going_keys[1:] != going_keys[:-1]]
+        room_before = np.cumsum(room) - room
+        room_before -= np.maximum.accumulate(np.where(first, room_before, 0))
+        boarding = np.clip(self.tail[going_keys] - self.head[going_keys] - room_before, 0, room)
+        self._board(going, going_keys, self.head[going_keys] + room_before, boarding, now)
+        np.add.at(self.head, going_keys, boarding)
+        did_pick_up[going] = boarding > 0
+
+        # The turn of each other elevator among those of its simulation on its floor
+        cars = cars[choosing]
+        cars = cars[np.argsort(up_keys[cars], kind='stable')]
+        groups = up_keys[cars]
+        first = np.r_[True, groups[1:] != groups[:-1]]
+        turns = np.arange(len(cars)) - np.maximum.accumulate(np.where(first, np.arange(len(cars)), 0))
+        last = len(self.queue_order) - 1
+        for turn in range(turns.max() + 1 if len(cars) else 0):
+            turn_cars = cars[turns == turn]
+            up, down = up_keys[turn_cars], up_keys[turn_cars] + 1
+            up_waiting, down_waiting = self.tail[up] - self.head[up], self.tail[down] - self.head[down]
+            direction = self.direction[turn_cars]
+            # An idle elevator takes whoever called first, and then others going the same way
+            up_first = self.passenger_index[self.queue_order[np.minimum(self.queue_start[up] + self.head[up], last)]]
+            down_first = self.passenger_index[self.queue_order[np.minimum(self.queue_start[down] + self.head[down], last)]]
+            idle = direction == 0
+            take_up = idle & (up_waiting > 0) & ((down_waiting == 0) | (up_first < down_first))
+            take_down = idle & ~take_up & (down_waiting > 0)
+            direction = np.where(take_up, 1, np.where(take_down, -1, direction))
+            turn_keys = np.where(direction > 0, up, down)
+            boarding = np.minimum(np.where(direction > 0, up_waiting, down_waiting), ELEVATOR_CAPACITY - self.load[turn_cars])
+            self._board(turn_cars, turn_keys, self.head[turn_keys], boarding, now)
+            self.head[turn_keys] += boarding
+            self.direction[turn_cars] = np.where(boarding > 0, direction, self.direction[turn_cars])
+            did_pick_up[turn_cars] = boarding > 0
+        return did_pick_up
+
+    def _board(self, cars, keys, positions, boarding, now):
+        """
+        Board passengers into elevators, each taking the given number from a position in a queue.
+        """
+        first_rider = np.repeat(self.queue_start[keys] + positions - (np.cumsum(boarding) - boarding), boarding)
+        riders = self.queue_order[first_rider + np.arange(len(first_rider))]
+        cells = np.repeat(self.row_start[cars], boarding) + self.destination_floor[riders]
+        self.board_time[riders] = now
+        np.add.at(self.riders.reshape(-1), cells, 1)
+        np.add.at(self.rider_board_times.reshape(-1), cells, now)
+        # Count each destination a car did not have yet once: the last rider going there marks it
+        destinations = self.destinations.reshape(-1)
+        new = ~destinations.take(cells)
+        order = np.arange(len(cells))
+        self.last_rider[cells] = order
+        new &= self.last_rider.take(cells) == order
+        destinations[cells] = True
+        np.add.at(self.destination_count, cells[new] // (self.num_floors + 2), 1)
+        self.load[cars] += boarding
+        self.passengers_served[cars] += boarding
+
+    def stats(self):
+        """
+        Calculate the statistics of every simulation.
+
+        Returns:
+            list: For each simulation, the dict ElevatorSystem.stats() would return.
+        """
+        n, now = self.num_simulations, self.current_time
+        called = self.call_time < now
+        sims = self.passenger_sim[called]
+        call_time, board_time = self.call_time[called], self.board_time[called]
+        boarded = board_time >= 0
+        wait_times = np.where(boarded, board_time - 1, now) - call_time
+        wait_times[self.start_floor[called] == self.destination_floor[called]] = 0
+        counts = np.bincount(sims, minlength=n)
+        wait_sums = np.bincount(sims, weights=wait_times, minlength=n).astype(np.int64)
+        boarded_counts = np.bincount(sims, weights=boarded, minlength=n).astype(np.int64)
+        board_sums = np.bincount(sims, weights=np.where(boarded, board_time, 0), minlength=n).astype(np.int64)
+        # Delivered passengers rode until they got off, the others are still riding
+        ride_sums = (self.alight_sum - self.alighted_board_sum +
+                     (boarded_counts - self.alighted) * (now + 1) - (board_sums - self.alighted_board_sum))
+        max_wait = np.full(n, np.iinfo(np.int64).min)
+        np.maximum.at(max_wait, sims, wait_times)
+        min_wait = np.full(n, np.iinfo(np.int64).max)
+        np.minimum.at(min_wait, sims, wait_times)
+
+        stats = []
+        for sim in range(n):
+            count = int(counts[sim])
+            cars = range(sim * self.num_elevators, (sim + 1) * self.num_elevators)
+            stats.append({
+                'average_wait_time': int(wait_sums[sim]) / count if count else 0,
+                'average_ride_time': int(ride_sums[sim]) / count if count else 0,
+                'average_total_time': int(wait_sums[sim] + ride_sums[sim]) / count if count else 0,
+                'max_wait_time': int(max_wait[sim]) if count else 0,
+                'min_wait_time': int(min_wait[sim]) if count else 0,
+                'elevators': [{
+                    str(self.car_id[car]): {
+                        'passengers_served': int(self.passengers_served[car]),
+                        'time_in_operation': self.steps,
+                        'stops_made': int(self.stops_made[car]),
+                    }
+                } for car in cars],
+            })
+        return stats
+
+def run_ensemble(num_elevators, num_floors, duration, total_calls, seeds, fast=False):
+    """
+    Run a simulation as simulate_elevator_calls does for each seed, all together in an Ensemble.
+    Like Ensemble, it only simulates default cars with no dispatcher. With fast set, the calls are
+    drawn in batches (see generate_call_arrays), which otherwise takes longer than the ensemble run.
+
+    Returns:
+        list: The stats of the simulation of each seed.
+    """
+    calls = [generate_call_arrays(num_floors, duration, total_calls, seed, fast) for seed in seeds]
+    ensemble = Ensemble(num_elevators, num_floors, calls)
+    ensemble.run(duration)
+    return ensemble.stats()
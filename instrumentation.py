@@ -0,0 +1,166 @@
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+class Instrumentation:
+    """
+    Opt-in counters, timers, queue-length histograms and a sampled time series for an ElevatorSystem.
+
+    attach() installs timed wrappers on the system and its elevators and turns off the tick engine's
+    fast-forwarding, and detach() removes the wrappers and puts fast-forwarding back as it was, so an
+    uninstrumented system runs its methods untouched. Timings are inclusive: Elevator.step includes
+    the check_for_pickups and drop_off_passengers calls it makes.
+
+    Samples are taken after every sample_every-th call of ElevatorSystem.step, so only the tick
+    engine takes them; the counters and timers also cover the event engine.
+
+    Attributes:
+        calls (Counter): The number of calls of each instrumented method.
+        seconds (defaultdict): The total wall-clock seconds spent in each instrumented method.
+        queue_lengths (defaultdict): For each floor, a Counter of the number of samples in which a
+            given number of passengers (more than zero) were waiting there.
+        samples (SampleBuffer): The most recent samples of elevator positions, loads and waiting passengers.
+    """
+    ELEVATOR_METHODS = ('step', 'check_for_pickups', 'drop_off_passengers')
+
+    def __init__(self, sample_every=1, capacity=4096):
+        self.sample_every = sample_every
+        self.capacity = capacity
+        self.calls = Counter()
+        self.seconds = defaultdict(float)
+        self.queue_lengths = defaultdict(Counter)
+        self.samples = None
+        self.elevator_system = None
+        self._fast_forward_enabled = True  # The system's setting before attach()
+
+    def attach(self, elevator_system):
+        """
+        Start instrumenting an elevator system.
+
+        Args:
+            elevator_system (ElevatorSystem): The system to instrument.
+        """
+        if self.elevator_system is not None:
+            raise RuntimeError("Already attached")
+        self.elevator_system = elevator_system
+        if self.samples is None:
+            self.samples = SampleBuffer(self.capacity, len(elevator_system.elevators))
+        for elevator in elevator_system.elevators:
+            for name in self.ELEVATOR_METHODS:
+                setattr(elevator, name, self._timed('Elevator.' + name, getattr(elevator, name)))
+        step = self._timed('ElevatorSystem.step', elevator_system.step)
+
+        def sampled_step():
+            step()
+            if elevator_system.current_time % self.sample_every == 0:
+                self.sample()
+
+        elevator_system.step = sampled_step
+        # Samples are taken every step, so the tick engine must not fast-forward
+        self._fast_forward_enabled = elevator_system.fast_forward_enabled
+        elevator_system.fast_forward_enabled = False
+        return self
+
+    def detach(self):
+        """
+        Stop instrumenting, restoring the plain methods of the system and its elevators.
+        """
+        if self.elevator_system is None:
+            return
+        for elevator in self.elevator_system.elevators:
+            for name in self.ELEVATOR_METHODS:
+                del elevator.__dict__[name]
+        del self.elevator_system.__dict__['step']
+        self.elevator_system.fast_forward_enabled = self._fast_forward_enabled
+        self.elevator_system = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+
+    def _timed(self, name, method):
+        calls, seconds, clock = self.calls, self.seconds, time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds[name] += clock() - start
+                calls[name] += 1
+
+        return timed
+
+    def sample(self):
+        """
+        Record the current positions and loads of the elevators and the passengers waiting on each floor.
+        """
+        elevator_system = self.elevator_system
+        waiting = Counter()
+        hall_calls = {id(elevator.hall_calls): elevator.hall_calls for elevator in elevator_system.elevators}
+        for calls in hall_calls.values():
+            for queues in calls.calls.values():
+                for floor, queue in queues.items():
+                    if queue:
+                        waiting[floor] += len(queue)
+        for floor, length in waiting.items():
+            self.queue_lengths[floor][length] += 1
+        self.samples.append(elevator_system.current_time,
+                            [elevator.current_floor for elevator in elevator_system.elevators],
+                            [len(elevator.passengers) for elevator in elevator_system.elevators],
+                            sum(waiting.values()))
+
+    def report(self):
+        """
+        Summarize the counters and timers.
+
+        Returns:
+            dict: For each instrumented method, its number of calls, total seconds and mean microseconds per call.
+        """
+        return {name: {'calls': count, 'seconds': self.seconds[name],
+                       'mean_us': 1e6 * self.seconds[name] / count if count else 0.0}
+                for name, count in sorted(self.calls.items())}
+
+class SampleBuffer:
+    """
+    A fixed-size ring buffer of samples, overwriting the oldest once full.
+
+    Attributes:
+        time (numpy.ndarray): The time of each sample.
+        floors (numpy.ndarray): The floor of each elevator, one row per sample.
+        loads (numpy.ndarray): The number of passengers in each elevator, one row per sample.
+        waiting (numpy.ndarray): The number of passengers waiting for an elevator.
+        count (int): The number of samples ever appended.
+    """
+    def __init__(self, capacity, num_elevators):
+        self.capacity = capacity
+        self.time = np.zeros(capacity, dtype=np.int64)
+        self.floors = np.zeros((capacity, num_elevators), dtype=np.int32)
+        self.loads = np.zeros((capacity, num_elevators), dtype=np.int16)
+        self.waiting = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, time, floors, loads, waiting):
+        i = self.count % self.capacity
+        self.time[i] = time
+        self.floors[i] = floors
+        self.loads[i] = loads
+        self.waiting[i] = waiting
+        self.count += 1
+
+    def arrays(self):
+        """
+        Get the samples held, oldest first.
+
+        Returns:
+            dict: Copies of the time, floors, loads and waiting arrays.
+        """
+        order = np.arange(self.count - len(self), self.count) % self.capacity
+        return {'time': self.time[order], 'floors': self.floors[order], 'loads': self.loads[order],
+                'waiting': self.waiting[order]}
@@ -0,0 +1,162 @@
+import math
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+class RunningStats:
+    """
+    Count, mean, variance, min and max of a stream of values, updated one value at a time (Welford's algorithm).
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Add the values summarized by another RunningStats, as if they had been added to this one.
+        """
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def variance(self):
+        """
+        Returns:
+            float: The sample variance, 0 with fewer than two values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+class QuantileSketch:
+    """
+    Approximate quantiles of a stream of non-negative values, within a relative error.
+
+    Values are counted in buckets whose bounds grow geometrically (as in DDSketch), so the memory
+    used depends on the range of the values and the accuracy, not on how many there are. Sketches
+    with the same accuracy merge exactly by adding their buckets.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}  # Values in (gamma ** (i - 1), gamma ** i] are counted in bucket i
+        self.zeros = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value < 0:
+            raise ValueError("QuantileSketch only takes non-negative values")
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value == 0:
+            self.zeros += 1
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        """
+        Add the values counted by another sketch with the same accuracy.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can only merge sketches with the same accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimate, within the relative accuracy of a value at that rank; None if the sketch is empty.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # The middle of the bucket in relative terms, kept within the values seen
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return float(min(max(estimate, self.min), self.max))
+        return float(self.max)
+
+class OnlineStats:
+    """
+    Running statistics and quantile sketches of the wait, ride and total times of delivered passengers.
+    """
+    METRICS = ('wait_time', 'ride_time', 'total_time')
+
+    def __init__(self, relative_accuracy=0.01):
+        self.running = {metric: RunningStats() for metric in self.METRICS}
+        self.sketches = {metric: QuantileSketch(relative_accuracy) for metric in self.METRICS}
+
+    @property
+    def count(self):
+        return self.running['wait_time'].count
+
+    def add(self, wait_time, ride_time):
+        """
+        Record a delivered passenger.
+
+        Args:
+            wait_time (int): The time the passenger waited for an elevator.
+            ride_time (int): The time the passenger spent in the elevator.
+        """
+        for metric, value in zip(self.METRICS, (wait_time, ride_time, wait_time + ride_time)):
+            self.running[metric].add(value)
+            self.sketches[metric].add(value)
+
+    def merge(self, other):
+        """
+        Add the passengers recorded by another OnlineStats, for example from a parallel run.
+        """
+        for metric in self.METRICS:
+            self.running[metric].merge(other.running[metric])
+            self.sketches[metric].merge(other.sketches[metric])
+
+    def summary(self, quantiles=QUANTILES):
+        """
+        Summarize the statistics so far.
+
+        Returns:
+            dict: For each metric, its count, mean, standard deviation, min, max and estimated quantiles (as p50, p99.9, ...).
+        """
+        summary = {}
+        for metric in self.METRICS:
+            running, sketch = self.running[metric], self.sketches[metric]
+            summary[metric] = {'count': running.count, 'mean': running.mean, 'std': math.sqrt(running.variance),
+                               'min': running.min, 'max': running.max}
+            for q in quantiles:
+                summary[metric][f"p{100 * q:g}"] = sketch.quantile(q)
+        return summary
@@ -0,0 +1,231 @@
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from elevator import ELEVATOR_CAPACITY, ElevatorSystem, Fleet
+from simulator import generate_call_arrays, to_time_series
+
+SLA = namedtuple('SLA', ['max_wait', 'percentile'], defaults=[95])
+SLA.__doc__ = """
+A service level for waiting times: at least percentile percent of the passengers wait at most max_wait
+time steps, counting the passengers still waiting at the end of the run with their wait so far.
+"""
+
+def allowed_late(sla, num_passengers):
+    """
+    Count the passengers that may wait longer than the SLA allows without breaking it.
+
+    Returns:
+        int: The number of passengers.
+    """
+    return int(np.floor(num_passengers * (100 - sla.percentile) / 100 + 1e-9))
+
+def run_until_violation(elevator_system, calls, duration, sla, chunk=60, engine='event'):
+    """
+    Run an elevator system on a set of calls, in chunks of time steps, stopping as soon as the SLA is
+    provably broken: a passenger's wait never shrinks, so once more passengers have waited longer than
+    max_wait than the SLA allows, whatever happens next cannot meet it.
+
+    Args:
+        elevator_system (ElevatorSystem): The system to run, from time 0.
+        calls (tuple): The call time, start floor and destination floor of each passenger.
+        duration (int): The number of time steps to run.
+        sla (SLA): The service level to meet.
+        chunk (int): The time steps between two checks.
+        engine (str): The engine to run the elevator system with.
+
+    Returns:
+        dict: Whether the SLA was 'met', the 'steps' run, the number of 'passengers' and of 'late'
+            ones so far, and the 'wait_percentile' of the run if it ran to the end (None if aborted).
+    """
+    time_series = to_time_series(*calls)
+    allowed = allowed_late(sla, len(calls[0]))
+    table = elevator_system.passenger_table
+    start = 0
+    late = 0
+    while start < duration:
+        steps = min(chunk, duration - start)
+        elevator_system.run(steps, {t - start: time_series[t] for t in range(start, start + steps) if t in time_series},
+                            engine=engine)
+        start += steps
+        wait_times = table.times(elevator_system.current_time)[0]
+        late = int(np.count_nonzero(wait_times > sla.max_wait))
+        if late > allowed:
+            return {'met': False, 'steps': start, 'passengers': len(calls[0]), 'late': late, 'wait_percentile': None}
+    wait_times = table.times(elevator_system.current_time)[0]
+    return {
+        'met': True,
+        'steps': start,
+        'passengers': len(calls[0]),
+        'late': late,
+        'wait_percentile': float(np.percentile(wait_times, sla.percentile)) if len(wait_times) else 0.0,
+    }
+
+class FleetPlanner:
+    """
+    Finds the smallest number of elevators, and optionally their capacity, that meets a waiting time SLA
+    for a building and its traffic.
+
+    Waiting times are assumed to never get worse with more or bigger cars, so each verdict also settles
+    its neighbours: if n cars meet the SLA so do n + 1, and if they break it so do n - 1. A search
+    bisects the number of cars between the bounds set by the verdicts already known for the same or
+    neighbouring capacities, so later questions reuse the runs of earlier ones.
+
+    Attributes:
+        num_floors (int): The number of floors in the building.
+        calls (list): The calls of each seed simulated, as returned by generate_call_arrays.
+        duration (int): The number of time steps simulated.
+        sla (SLA): The service level to meet.
+        dispatcher (type): The Dispatcher class of the elevator systems, or None.
+        verdicts (dict): The result of run_until_violation for every seed, keyed by (number of cars,
+            capacity), or the result of the first seed breaking the SLA.
+        runs (int): The number of runs made.
+        steps (int): The number of time steps simulated over all runs.
+    """
+    def __init__(self, num_floors, calls, duration, sla, dispatcher=None, chunk=60, engine='event'):
+        self.num_floors = num_floors
+        self.calls = calls
+        self.duration = duration
+        self.sla = sla
+        self.dispatcher = dispatcher
+        self.chunk = chunk
+        self.engine = engine
+        self.verdicts = {}
+        self.runs = 0
+        self.steps = 0
+
+    def meets(self, num_elevators, capacity=None):
+        """
+        Check if a fleet meets the SLA on every seed, running the seeds until one breaks it.
+
+        Args:
+            num_elevators (int): The number of cars.
+            capacity (int): The capacity of every car, or None for the default one.
+
+        Returns:
+            bool: True if the SLA is met.
+        """
+        key = (num_elevators, capacity)
+        if key not in self.verdicts:
+            results = []
+            for calls in self.calls:
+                fleet = Fleet.uniform(num_elevators, capacity=capacity) if capacity is not None else None
+                elevator_system = ElevatorSystem(num_elevators=num_elevators, num_floors=self.num_floors, fleet=fleet,
+                                                 dispatcher=self.dispatcher() if self.dispatcher else None)
+                result = run_until_violation(elevator_system, calls, self.duration, self.sla, self.chunk, self.engine)
+                self.runs += 1
+                self.steps += result['steps']
+                results.append(result)
+                if not result['met']:
+                    break
+            self.verdicts[key] = results
+        return all(result['met'] for result in self.verdicts[key])
+
+    def min_elevators(self, low=1, high=None, capacity=None, limit=256):
+        """
+        Find the smallest number of cars meeting the SLA.
+
+        Args:
+            low (int): A number of cars known not to be too many.
+            high (int): A number of cars known to meet the SLA, or None to search for one by doubling.
+            capacity (int): The capacity of every car, or None for the default one.
+            limit (int): The largest number of cars to try.
+
+        Returns:
+            int: The number of cars, or None if even limit cars break the SLA.
+        """
+        # Reuse the verdicts of neighbouring fleets: more cars or bigger ones never do worse
+        size = ELEVATOR_CAPACITY if capacity is None else capacity
+        for (n, c), results in self.verdicts.items():
+            c = ELEVATOR_CAPACITY if c is None else c
+            if all(result['met'] for result in results):
+                if c <= size and n >= low and (high is None or n < high):
+                    high = n
+            elif c >= size and n >= low:
+                low = n + 1
+        if high is not None and low > high:
+            low = high
+        if high is None:
+            high = low
+            while not self.meets(high, capacity):
+                if high >= limit:
+                    return None
+                low = high + 1
+                high = min(2 * high, limit)
+        # The answer is in [low, high], and high meets the SLA
+        while low < high:
+            middle = (low + high) // 2
+            if self.meets(middle, capacity):
+                high = middle
+            else:
+                low = middle + 1
+        return high
+
+    def plan(self, capacities=None, low=1, limit=256):
+        """
+        Find the smallest fleet meeting the SLA for each car capacity.
+
+        Args:
+            capacities (list): The capacities to consider, or None for the default one only.
+            low (int): A number of cars known not to be too many.
+            limit (int): The largest number of cars to try.
+
+        Returns:
+            list: A dict per capacity, smallest first, with the 'capacity', the smallest number of cars
+                'num_elevators' (None if above limit) and the 'wait_percentile' it achieves on each seed.
+        """
+        plans = []
+        for capacity in sorted(capacities) if capacities else [None]:
+            num_elevators = self.min_elevators(low, None, capacity, limit)
+            wait_percentile = None
+            if num_elevators is not None:
+                # Run the answer itself if a neighbour's verdict settled it
+                self.meets(num_elevators, capacity)
+                wait_percentile = [result['wait_percentile'] for result in self.verdicts[(num_elevators, capacity)]]
+            plans.append({'capacity': capacity, 'num_elevators': num_elevators, 'wait_percentile': wait_percentile})
+        return plans
+
+def plan_fleet(num_floors, calls_per_hour, max_wait, percentile=95, duration=3600, seeds=(0,), capacities=None,
+               dispatcher=None, limit=256):
+    """
+    Answer "how many cars keep the given percentile of waits under max_wait at this many calls per hour?"
+
+    Args:
+        num_floors (int): The number of floors in the building.
+        calls_per_hour (int): The number of calls per hour of simulated time (3600 time steps).
+        max_wait (int): The longest wait allowed, in time steps.
+        percentile (float): The percentage of passengers that must wait at most max_wait.
+        duration (int): The number of time steps simulated.
+        seeds (iterable): The seeds of the calls; the SLA must be met on each.
+        capacities (list): The car capacities to consider, or None for the default one only.
+        dispatcher (type): The Dispatcher class of the elevator systems, or None.
+        limit (int): The largest number of cars to try.
+
+    Returns:
+        tuple: The plans of FleetPlanner.plan, and the FleetPlanner with its verdicts and costs.
+    """
+    total_calls = int(round(calls_per_hour * duration / 3600))
+    calls = [generate_call_arrays(num_floors, duration, total_calls, seed) for seed in seeds]
+    planner = FleetPlanner(num_floors, calls, duration, SLA(max_wait, percentile), dispatcher)
+    return planner.plan(capacities, limit=limit), planner
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the fewest elevators keeping waits under a service level.")
+    parser.add_argument('--floors', type=int, default=60)
+    parser.add_argument('--calls-per-hour', type=int, default=3600)
+    parser.add_argument('--max-wait', type=int, default=60, help="longest wait allowed, in time steps")
+    parser.add_argument('--percentile', type=float, default=95)
+    parser.add_argument('--duration', type=int, default=3600)
+    parser.add_argument('--seeds', type=int, default=1, help="number of seeds the service level must hold for")
+    parser.add_argument('--capacities', type=int, nargs='*', help="car capacities to consider")
+    parser.add_argument('--limit', type=int, default=256, help="most elevators to try")
+    args = parser.parse_args(argv)
+    plans, planner = plan_fleet(args.floors, args.calls_per_hour, args.max_wait, args.percentile, args.duration,
+                                range(args.seeds), args.capacities, limit=args.limit)
+    for plan in plans:
+        print(plan)
+    print(f"{planner.runs} runs, {planner.steps} time steps simulated")
+
+if __name__ == '__main__':
+    main()
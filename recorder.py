@@ -0,0 +1,147 @@
+import os
+
+import numpy as np
+
+# Columns of the per-trip and per-stop logs, each saved as its own .npy file
+TRIP_COLUMNS = (('call_time', '<i8'), ('board_time', '<i8'), ('alight_time', '<i8'), ('elevator_id', '<i4'),
+                ('start_floor', '<i4'), ('destination_floor', '<i4'))
+STOP_COLUMNS = (('time', '<i8'), ('elevator_id', '<i4'), ('floor', '<i4'), ('alighted', '<i4'), ('boarded', '<i4'),
+                ('load', '<i4'))
+
+# Size of the .npy header of each column file, kept fixed so it can be rewritten in place as the column grows
+HEADER_SIZE = 128
+
+def _npy_header(dtype, length):
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (length,)})
+    magic = np.lib.format.magic(1, 0)
+    padding = HEADER_SIZE - len(magic) - 2 - len(header) - 1
+    return magic + (HEADER_SIZE - len(magic) - 2).to_bytes(2, 'little') + (header + ' ' * padding + '\n').encode('latin1')
+
+class ColumnLog:
+    """
+    An append-only table of integer records, buffered in memory and flushed in bulk to one .npy file
+    per column. Each flush rewrites the length in the file headers, so the files can be loaded, or
+    memory-mapped, at any point.
+
+    Attributes:
+        directory (str): The directory of the column files.
+        columns (tuple): The name and dtype of each column.
+        length (int): The number of records flushed to disk.
+    """
+    def __init__(self, directory, columns, buffer_size=65536):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.columns = tuple((name, np.dtype(dtype)) for name, dtype in columns)
+        self.length = 0
+        self._buffer = np.zeros((len(self.columns), buffer_size), dtype=np.int64)  # One row per column
+        self._count = 0
+        self._files = []
+        for name, dtype in self.columns:
+            f = open(os.path.join(directory, name + '.npy'), 'w+b')
+            f.write(_npy_header(dtype, 0))
+            f.flush()
+            self._files.append(f)
+
+    def __len__(self):
+        return self.length + self._count
+
+    def append(self, *values):
+        """
+        Add a record, one value per column, flushing the buffer once full.
+        """
+        self._buffer[:, self._count] = values
+        self._count += 1
+        if self._count == self._buffer.shape[1]:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records to the column files.
+        """
+        if not self._count:
+            return
+        self.length += self._count
+        for (name, dtype), column, f in zip(self.columns, self._buffer, self._files):
+            f.write(column[:self._count].astype(dtype).tobytes())
+            f.seek(0)
+            f.write(_npy_header(dtype, self.length))
+            f.seek(0, os.SEEK_END)
+            f.flush()
+        self._count = 0
+
+    def close(self):
+        """
+        Flush the buffered records and close the column files.
+        """
+        if not self._files:
+            return
+        self.flush()
+        for f in self._files:
+            f.close()
+        self._files = []
+
+class EventRecorder:
+    """
+    Records a row for every trip completed and every stop made in an elevator system, which then only
+    keeps the Passenger objects in flight. Pass it to ElevatorSystem to record its run; close it when
+    the run is done.
+
+    Trips are recorded as passengers get off: their call, board and alight times, the elevator they
+    rode and their floors. Stops are recorded as an elevator opens its doors: the time, the elevator,
+    the floor, how many passengers got off and on then, and its load after. The records of each are
+    in the order the engine simulates them, which is time order for each elevator.
+
+    The logs are saved in a directory, as a trips and a stops subdirectory of .npy files, one per
+    column; read them back with read_log.
+
+    Attributes:
+        directory (str): The directory of the logs.
+        trips, stops (ColumnLog): The logs.
+    """
+    def __init__(self, directory, buffer_size=65536):
+        self.directory = directory
+        self.trips = ColumnLog(os.path.join(directory, 'trips'), TRIP_COLUMNS, buffer_size)
+        self.stops = ColumnLog(os.path.join(directory, 'stops'), STOP_COLUMNS, buffer_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def trip(self, passenger):
+        """
+        Record the trip of a passenger who just got off.
+        """
+        self.trips.append(passenger.call_time, passenger.board_time, passenger.alight_time, passenger.elevator_id,
+                          passenger.start_floor, passenger.destination_floor)
+
+    def stop(self, time, elevator_id, floor, alighted, boarded, load):
+        """
+        Record an elevator opening its doors at a floor.
+        """
+        self.stops.append(time, elevator_id, floor, alighted, boarded, load)
+
+    def flush(self):
+        self.trips.flush()
+        self.stops.flush()
+
+    def close(self):
+        self.trips.close()
+        self.stops.close()
+
+def read_log(directory, name='trips', mmap=True):
+    """
+    Read back a log written by an EventRecorder.
+
+    Args:
+        directory (str): The directory of the recorder.
+        name (str): 'trips' or 'stops'.
+        mmap (bool): Whether to memory-map the column files rather than load them.
+
+    Returns:
+        dict: An array per column.
+    """
+    columns = {'trips': TRIP_COLUMNS, 'stops': STOP_COLUMNS}[name]
+    return {column: np.load(os.path.join(directory, name, column + '.npy'), mmap_mode='r' if mmap else None)
+            for column, _ in columns}
@@ -0,0 +1,391 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from collections import deque
+
+import numpy as np
+
+from dispatch import CostDispatcher
+from elevator import ElevatorSystem, Passenger
+
+class _Client:
+    """
+    A connection to the dispatch service.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+        self.subscribed = False  # Receives the positions of the cars every tick
+
+    def send(self, messages):
+        self.writer.write(''.join(json.dumps(message) + '\n' for message in messages).encode())
+
+    def backlog(self):
+        return self.writer.transport.get_write_buffer_size()
+
+class DispatchService:
+    """
+    Runs an elevator system live, fed by hall calls from clients on a local TCP or Unix socket.
+
+    Clients send JSON Lines messages. A call, {"id": 7, "start_floor": 3, "destination_floor": 9},
+    is acknowledged at once with {"id": 7, "queued": tick}, or {"id": 7, "error": reason}. The calls
+    received during a tick are made together before the next step, as time series offsets are by
+    ElevatorSystem.run, and the client is then sent {"id": 7, "assigned": elevator_id, "tick": t} if
+    the system has a dispatcher, {"id": 7, "boarded": elevator_id, "tick": t} and {"id": 7, "arrived": t}.
+    Clients sending {"subscribe": true} also get {"tick": t, "cars": [[floor, direction, load, door_open], ...]}
+    after every step.
+
+    Backpressure: once max_pending calls wait for the next tick, the service stops reading from clients
+    until the tick takes them, so the socket buffers fill up and senders block. Position updates are
+    skipped for clients whose unsent output exceeds max_backlog bytes, as the next tick supersedes them.
+
+    Attributes:
+        elevator_system (ElevatorSystem): The system run by the service.
+        tick_seconds (float): The wall-clock length of a time step at normal speed.
+        speed (float): How many times faster than real time the system runs.
+        ticks (int): The number of steps run.
+        calls (int): The number of calls made.
+        late_ticks (int): The number of steps that started late, because the previous one overran.
+        intake_times (deque): The seconds taken to accept each of the latest calls, from reading the
+            message to queueing its acknowledgement.
+    """
+    def __init__(self, elevator_system, tick_seconds=1.0, speed=1.0, max_pending=100000, max_backlog=1 << 20):
+        self.elevator_system = elevator_system
+        self.tick_seconds = tick_seconds
+        self.speed = speed
+        self.max_pending = max_pending
+        self.max_backlog = max_backlog
+        self.ticks = 0
+        self.calls = 0
+        self.late_ticks = 0
+        self.intake_times = deque(maxlen=100000)
+        self.server = None
+        self._pending = []  # (passenger, client, request id) to call before the next step
+        self._room = asyncio.Event()  # Set while the pending batch has room
+        self._room.set()
+        self._closing = False
+        self._clients = set()
+        self._outstanding = {}  # Passenger table row -> (client, request id), until the passenger arrives
+
+    async def start(self, host='127.0.0.1', port=0, path=None, backlog=4096):
+        """
+        Start accepting clients, on a Unix socket if a path is given and on TCP otherwise.
+
+        Args:
+            host (str), port (int): The TCP address to listen on, port 0 picking a free one.
+            path (str): The Unix socket to listen on.
+            backlog (int): The connections the kernel queues before they are accepted, for bursts of clients.
+
+        Returns:
+            asyncio.Server: The server.
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path=path, backlog=backlog)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port, backlog=backlog)
+        return self.server
+
+    async def run(self, num_steps=None):
+        """
+        Step the system on the timer, one step every tick_seconds / speed seconds of wall-clock time,
+        catching up without sleeping after a late step.
+
+        Args:
+            num_steps (int): The number of steps to run, or None to run until cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        interval = self.tick_seconds / self.speed
+        deadline = loop.time()
+        steps = 0
+        while num_steps is None or steps < num_steps:
+            deadline += interval
+            delay = deadline - loop.time()
+            if delay < 0:
+                self.late_ticks += 1
+            await asyncio.sleep(max(delay, 0))  # Yields to the clients even when late
+            self.advance()
+            steps += 1
+
+    def close(self):
+        """
+        Stop accepting clients and disconnect the connected ones.
+        """
+        self._closing = True
+        self._room.set()  # Wakes up the clients held back, to disconnect them
+        if self.server is not None:
+            self.server.close()
+        for client in list(self._clients):
+            client.writer.close()
+
+    def advance(self):
+        """
+        Make the calls received since the last tick, step the system once and send the updates.
+        """
+        elevator_system = self.elevator_system
+        batch, self._pending = self._pending, []
+        self._room.set()
+        updates = {}
+        for passenger, client, request_id in batch:
+            try:
+                elevator_system.call_elevator(passenger)
+            except ValueError as error:
+                updates.setdefault(client, []).append({'id': request_id, 'error': str(error)})
+                continue
+            self.calls += 1
+            if passenger.start_floor == passenger.destination_floor:
+                updates.setdefault(client, []).append({'id': request_id, 'arrived': elevator_system.current_time})
+                continue
+            self._outstanding[passenger.index] = (client, request_id)
+            if elevator_system.dispatcher is not None:
+                elevator = self._assigned_elevator(passenger)
+                updates.setdefault(client, []).append({'id': request_id, 'assigned': elevator.elevator_id,
+                                                      'tick': elevator_system.current_time})
+        elevator_system.step()
+        self.ticks += 1
+
+        # Boardings and arrivals of this step, read from the passenger table
+        now = elevator_system.current_time
+        if self._outstanding:
+            table = elevator_system.passenger_table
+            rows = np.fromiter(self._outstanding, dtype=np.int64, count=len(self._outstanding))
+            for row in rows[table.board_time[rows] == now].tolist():
+                client, request_id = self._outstanding[row]
+                updates.setdefault(client, []).append({'id': request_id, 'boarded': int(table.elevator_id[row]), 'tick': now})
+            for row in rows[table.alight_time[rows] == now].tolist():
+                client, request_id = self._outstanding.pop(row)
+                updates.setdefault(client, []).append({'id': request_id, 'arrived': now})
+
+        positions = None
+        for client in self._clients:
+            if client.subscribed and client.backlog() < self.max_backlog:
+                if positions is None:
+                    positions = {'tick': now, 'cars': [[elevator.current_floor, elevator.moving_direction,
+                                                        len(elevator.passengers), elevator.is_door_open]
+                                                       for elevator in elevator_system.elevators]}
+                updates.setdefault(client, []).append(positions)
+        for client, messages in updates.items():
+            if client in self._clients:
+                client.send(messages)
+
+    def stats(self):
+        """
+        Summarize the service so far.
+
+        Returns:
+            dict: The steps run and how many started late, the calls made, the calls waiting for the next
+                step, the connected clients, and the median and 99th percentile intake times in milliseconds.
+        """
+        intake = np.percentile(np.array(self.intake_times) * 1000, [50, 99]).tolist() if self.intake_times else [0.0, 0.0]
+        return {
+            'ticks': self.ticks,
+            'late_ticks': self.late_ticks,
+            'calls': self.calls,
+            'pending': len(self._pending),
+            'clients': len(self._clients),
+            'intake_p50_ms': intake[0],
+            'intake_p99_ms': intake[1],
+        }
+
+    def _assigned_elevator(self, passenger):
+        """
+        Find the elevator whose hall calls a dispatcher just put a passenger in.
+        """
+        direction = 1 if passenger.destination_floor > passenger.start_floor else -1
+        for elevator in self.elevator_system.elevators:
+            queue = elevator.hall_calls.queue(passenger.start_floor, direction)
+            if queue and queue[-1] is passenger:
+                return elevator
+
+    async def _handle(self, reader, writer):
+        client = _Client(writer)
+        self._clients.add(client)
+        num_floors = self.elevator_system.num_floors
+        try:
+            while True:
+                if not self._room.is_set():
+                    await self._room.wait()
+                line = await reader.readline()
+                if not line or self._closing:
+                    break
+                received = time.perf_counter()
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    client.send([{'id': None, 'error': "Messages must be JSON objects"}])
+                    continue
+                if message.get('subscribe'):
+                    client.subscribed = True
+                    continue
+                request_id = message.get('id')
+                start_floor, destination_floor = message.get('start_floor'), message.get('destination_floor')
+                if not all(type(floor) is int and 1 <= floor <= num_floors for floor in (start_floor, destination_floor)):
+                    client.send([{'id': request_id, 'error': f"Floors must be integers between 1 and {num_floors}"}])
+                    continue
+                self._pending.append((Passenger(start_floor, destination_floor), client, request_id))
+                if len(self._pending) >= self.max_pending:
+                    self._room.clear()
+                client.send([{'id': request_id, 'queued': self.elevator_system.current_time}])
+                self.intake_times.append(time.perf_counter() - received)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(client)
+            writer.close()
+
+async def load_test(num_clients, calls_per_client, num_floors, path=None, host='127.0.0.1', port=8765,
+                    rate=1000.0, seed=42, timeout=60.0):
+    """
+    Stand in for the hall buttons of a building: open many concurrent client connections to a dispatch
+    service, make calls between random floors from each at random (Poisson) times, and wait for the
+    passengers to arrive.
+
+    Args:
+        num_clients (int): The number of concurrent clients.
+        calls_per_client (int): The number of calls each client makes.
+        num_floors (int): The number of floors in the building.
+        path (str): The Unix socket of the service, or None to connect over TCP.
+        host (str), port (int): The TCP address of the service.
+        rate (float): The calls per second of all clients together.
+        seed (int): The seed of the random floors and call times.
+        timeout (float): The seconds to wait for every passenger to arrive.
+
+    Returns:
+        dict: The number of calls made, acknowledged, failed and of passengers arrived, and the percentiles
+            of the round trip from sending a call to receiving its acknowledgement, in milliseconds.
+    """
+    rng = np.random.default_rng(seed)
+    floors = rng.integers(1, num_floors + 1, size=(num_clients, calls_per_client, 2)).tolist()
+    gaps = rng.exponential(num_clients / rate, size=(num_clients, calls_per_client)).tolist()
+    latencies = []
+    counts = {'queued': 0, 'arrived': 0, 'errors': 0}
+
+    async def receive(reader, sent, num_calls):
+        done = 0
+        while done < num_calls:
+            line = await reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if 'queued' in message:
+                latencies.append(time.perf_counter() - sent[message['id']])
+                counts['queued'] += 1
+            elif 'arrived' in message or 'error' in message:
+                counts['arrived' if 'arrived' in message else 'errors'] += 1
+                done += 1
+
+    async def client(trips, waits):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        sent = {}
+        receiving = asyncio.ensure_future(receive(reader, sent, len(trips)))
+        try:
+            for request_id, ((start_floor, destination_floor), wait) in enumerate(zip(trips, waits)):
+                await asyncio.sleep(wait)
+                sent[request_id] = time.perf_counter()
+                writer.write((json.dumps({'id': request_id, 'start_floor': start_floor,
+                                          'destination_floor': destination_floor}) + '\n').encode())
+                await writer.drain()
+            await receiving
+        finally:
+            receiving.cancel()
+            writer.close()
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*(client(trips, waits) for trips, waits in zip(floors, gaps))), timeout)
+    except asyncio.TimeoutError:
+        pass
+    percentiles = np.percentile(np.array(latencies) * 1000, [50, 99, 100]).tolist() if latencies else [0.0] * 3
+    return {
+        'calls': num_clients * calls_per_client,
+        **counts,
+        'round_trip_p50_ms': percentiles[0],
+        'round_trip_p99_ms': percentiles[1],
+        'round_trip_max_ms': percentiles[2],
+    }
+
+async def serve(elevator_system, host='127.0.0.1', port=8765, path=None, tick_seconds=1.0, speed=1.0, num_steps=None):
+    """
+    Run a dispatch service for an elevator system.
+
+    Args:
+        elevator_system (ElevatorSystem): The system to run.
+        host (str), port (int): The TCP address to listen on.
+        path (str): The Unix socket to listen on instead.
+        tick_seconds (float): The wall-clock length of a time step at normal speed.
+        speed (float): How many times faster than real time to run.
+        num_steps (int): The number of steps to run, or None to run until cancelled.
+
+    Returns:
+        dict: The stats() of the service.
+    """
+    service = DispatchService(elevator_system, tick_seconds=tick_seconds, speed=speed)
+    await service.start(host, port, path)
+    try:
+        await service.run(num_steps)
+    finally:
+        service.close()
+    return service.stats()
+
+def _elevator_system(args):
+    dispatcher = CostDispatcher() if args.dispatcher else None
+    return ElevatorSystem(num_elevators=args.elevators, num_floors=args.floors, dispatcher=dispatcher)
+
+def _service_process(args, ready, stop, results):
+    """
+    Run the service of the command line until told to stop, in its own process so that the load-test
+    client does not share its event loop.
+    """
+    async def run():
+        service = DispatchService(_elevator_system(args), tick_seconds=args.tick, speed=args.speed)
+        await service.start(args.host, args.port, args.unix)
+        ready.set()
+        running = asyncio.ensure_future(service.run())
+        await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+        running.cancel()
+        service.close()
+        results.put(service.stats())
+    asyncio.run(run())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an elevator system live to hall-call clients.")
+    parser.add_argument('--floors', type=int, default=60)
+    parser.add_argument('--elevators', type=int, default=12)
+    parser.add_argument('--dispatcher', action='store_true', help="assign calls with the CostDispatcher")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="serve on this Unix socket instead of TCP")
+    parser.add_argument('--tick', type=float, default=1.0, help="seconds per time step")
+    parser.add_argument('--speed', type=float, default=1.0, help="run this many times faster than real time")
+    parser.add_argument('--load-test', action='store_true', help="start the service and run the load-test client against it")
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--calls', type=int, default=5, help="calls per load-test client")
+    parser.add_argument('--rate', type=float, default=1000.0, help="load-test calls per second")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds to wait for the load-test passengers")
+    args = parser.parse_args(argv)
+    if not args.load_test:
+        print(f"Serving on {args.unix or f'{args.host}:{args.port}'}")
+        asyncio.run(serve(_elevator_system(args), args.host, args.port, args.unix, args.tick, args.speed))
+        return
+
+    ready, stop, results = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Queue()
+    process = multiprocessing.Process(target=_service_process, args=(args, ready, stop, results))
+    process.start()
+    try:
+        ready.wait()
+        stats = asyncio.run(load_test(args.clients, args.calls, args.floors, args.unix, args.host, args.port,
+                                      rate=args.rate, timeout=args.timeout))
+    finally:
+        stop.set()
+    stats.update({f'service_{name}': value for name, value in results.get().items()})
+    process.join()
+    for name, value in stats.items():
+        print(f"{name}: {value}")
+
+if __name__ == '__main__':
+    main()
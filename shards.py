@@ -0,0 +1,370 @@
+import argparse
+import heapq
+import multiprocessing
+import traceback
+from collections import deque, namedtuple
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from elevator import ElevatorSystem, Passenger
+from simulator import generate_call_arrays
+
+# A bank of elevators serving the floors from lowest_floor to highest_floor, or only its stops if given
+Zone = namedtuple('Zone', ['name', 'lowest_floor', 'highest_floor', 'num_elevators', 'stops'], defaults=(None,))
+Legs = namedtuple('Legs', ['trip', 'zone', 'start_floor', 'destination_floor', 'next_leg'])
+
+class Building:
+    """
+    A building whose elevators are partitioned into zones, for example low-rise and high-rise banks,
+    that passengers change between at transfer floors such as the lobby and sky lobbies.
+    """
+    def __init__(self, zones, transfer_floors):
+        """
+        Args:
+            zones (list): The Zone of each bank of elevators. Trips within a zone are served by the
+                first zone that serves both floors.
+            transfer_floors (list): The floors at which passengers can change between zones serving them.
+        """
+        self.zones = [Zone(*zone) for zone in zones]
+        self.transfer_floors = sorted(set(transfer_floors))
+        self.num_floors = max(zone.highest_floor for zone in self.zones)
+        # The zones serving each floor, by index
+        self.floor_zones = [()] + [tuple(i for i, zone in enumerate(self.zones) if self.serves(zone, floor))
+                                   for floor in range(1, self.num_floors + 1)]
+        self.routes = {}
+
+    @staticmethod
+    def serves(zone, floor):
+        return zone.lowest_floor <= floor <= zone.highest_floor and (zone.stops is None or floor in zone.stops)
+
+    def links(self):
+        """
+        Returns:
+            list: The ordered pairs of zones that passengers can change between.
+        """
+        return [(a, b) for a in range(len(self.zones)) for b in range(len(self.zones))
+                if a != b and any(self.serves(self.zones[a], floor) and self.serves(self.zones[b], floor)
+                                  for floor in self.transfer_floors)]
+
+    def route(self, start_floor, destination_floor):
+        """
+        Plan a trip with as few legs as possible.
+
+        Returns:
+            list: The zone, start floor and destination floor of each leg.
+        """
+        start_zones, end_zones = self.floor_zones[start_floor], self.floor_zones[destination_floor]
+        if not start_zones or not end_zones:
+            raise ValueError(f"No zone serves a trip from floor {start_floor} to floor {destination_floor}")
+        key = (start_zones, end_zones)
+        if key not in self.routes:
+            self.routes[key] = self._search(start_zones, end_zones)
+        zones, transfers = self.routes[key]
+        floors = [start_floor] + transfers + [destination_floor]
+        return [(zone, floors[i], floors[i + 1]) for i, zone in enumerate(zones)]
+
+    def _search(self, start_zones, end_zones):
+        # Breadth-first search over zones, from all those serving the start floor
+        common = [zone for zone in start_zones if zone in end_zones]
+        if common:
+            return [common[0]], []
+        previous = {zone: None for zone in start_zones}
+        frontier = deque(start_zones)
+        while frontier:
+            zone = frontier.popleft()
+            for floor in self.transfer_floors:
+                if not self.serves(self.zones[zone], floor):
+                    continue
+                for other in self.floor_zones[floor]:
+                    if other in previous:
+                        continue
+                    previous[other] = (zone, floor)
+                    if other in end_zones:
+                        zones, transfers = [other], []
+                        while previous[zones[0]] is not None:
+                            zone, floor = previous[zones[0]]
+                            zones.insert(0, zone)
+                            transfers.insert(0, floor)
+                        return zones, transfers
+                    frontier.append(other)
+        raise ValueError(f"No route between zones {start_zones} and {end_zones}")
+
+def sky_lobby_building(num_floors, num_elevators, num_zones):
+    """
+    A tower split into num_zones zones of local elevators stacked one above the other. Every zone but the
+    lowest has a sky lobby as its lowest floor, served by a bank of express shuttles from the lobby.
+
+    The elevators are shared out evenly between the zones, and a quarter of each upper zone's elevators
+    (at least one) are its shuttles. Raises ValueError if a bank would get no elevator.
+
+    Returns:
+        Building: The building, with a shard per bank of elevators.
+    """
+    height = num_floors // num_zones
+    zones, sky_lobbies = [], []
+    shares = np.diff(np.linspace(0, num_elevators, num_zones + 1).round().astype(int)).tolist()
+    # Every upper zone needs a shuttle and a local elevator
+    if shares[0] < 1 or min(shares[1:], default=2) < 2:
+        raise ValueError(f"Need at least one elevator per bank, but the zones get {shares} elevators")
+    for k, share in enumerate(shares):
+        lowest, highest = (1, height) if k == 0 else (k * height + 1, num_floors if k == num_zones - 1 else (k + 1) * height)
+        shuttles = 0 if k == 0 else max(1, share // 4)
+        zones.append(Zone(f'zone {k}', lowest, highest, share - shuttles))
+        if k:
+            zones.append(Zone(f'shuttle {k}', 1, lowest, shuttles, (1, lowest)))
+            sky_lobbies.append(lowest)
+    return Building(zones, [1] + sky_lobbies)
+
+def route_calls(building, start_floors, destination_floors):
+    """
+    Split each trip into its legs, one per zone it goes through.
+
+    Returns:
+        Legs: Arrays of the trip, zone, start floor, destination floor and following leg (-1 for the last) of each leg.
+    """
+    legs = []
+    for trip, (start_floor, destination_floor) in enumerate(zip(start_floors.tolist(), destination_floors.tolist())):
+        route = building.route(start_floor, destination_floor)
+        for i, (zone, start, destination) in enumerate(route):
+            legs.append((trip, zone, start, destination, len(legs) + 1 if i < len(route) - 1 else -1))
+    return Legs(*(np.array(column, dtype=np.int64).reshape(len(legs)) for column in zip(*legs))) if legs else \
+        Legs(*(np.zeros(0, dtype=np.int64) for _ in Legs._fields))
+
+class TransferQueue:
+    """
+    A ring buffer of transfers (arrival time and leg) in shared memory, from one shard to another.
+
+    There must be a single producer and a single consumer. The producer publishes a transfer by
+    advancing the write position after storing it, so the consumer can read while it writes.
+    """
+    def __init__(self, capacity=65536, name=None):
+        self.capacity = capacity
+        self.owner = name is None
+        size = 8 * (2 + 2 * capacity)
+        self.memory = SharedMemory(create=True, size=size) if self.owner else SharedMemory(name=name)
+        self.array = np.ndarray((2 + 2 * capacity,), dtype=np.int64, buffer=self.memory.buf)
+        if self.owner:
+            self.array[:2] = 0  # Write and read positions
+        self.records = self.array[2:].reshape(capacity, 2)
+
+    def __reduce__(self):
+        # Other processes attach to the same memory
+        return TransferQueue, (self.capacity, self.memory.name)
+
+    def put(self, time, leg):
+        write = int(self.array[0])
+        if write - int(self.array[1]) >= self.capacity:
+            raise RuntimeError("Transfer queue is full")
+        self.records[write % self.capacity] = time, leg
+        self.array[0] = write + 1
+
+    def get(self):
+        """
+        Returns:
+            list: The (time, leg) transfers put since the last call.
+        """
+        write, read = int(self.array[0]), int(self.array[1])
+        transfers = self.records[np.arange(read, write) % self.capacity].tolist()
+        self.array[1] = write
+        return transfers
+
+    def close(self):
+        del self.array, self.records
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Free the shared memory, once every process has closed the queue.
+        """
+        self.memory.unlink()
+
+class Shard:
+    """
+    The elevator system of one zone, run in windows of time and exchanging transfers with the other shards.
+    """
+    def __init__(self, zone_index, building, legs, call_times, queues, transfer_time, engine='event'):
+        self.zone_index = zone_index
+        self.zone = building.zones[zone_index]
+        self.legs = legs
+        # Plain lists for looking up one leg at a time
+        self.start_floors, self.destination_floors = legs.start_floor.tolist(), legs.destination_floor.tolist()
+        self.next_legs, self.leg_zones = legs.next_leg.tolist(), legs.zone.tolist()
+        self.transfer_time = transfer_time
+        self.engine = engine
+        self.system = ElevatorSystem(self.zone.num_elevators, self.zone.highest_floor - self.zone.lowest_floor + 1)
+        self.inbound = [queue for (a, b), queue in queues.items() if b == zone_index]
+        self.outbound = {b: queue for (a, b), queue in queues.items() if a == zone_index}
+        # Calls still to make, as (time, leg): the first legs of trips starting in this zone, then transfers
+        first_legs = np.flatnonzero((legs.zone == zone_index) &
+                                    (np.r_[-1, legs.trip[:-1]] != legs.trip))
+        self.pending = list(zip(call_times[legs.trip[first_legs]].tolist(), first_legs.tolist()))
+        heapq.heapify(self.pending)
+        self.leg_rows = []  # The leg of each row of the passenger table
+        self.onward = []  # Passengers with a leg after this one, and that leg
+
+    def run_window(self, start, steps):
+        """
+        Make the calls due and run the zone's elevator system from time start for the given number of steps.
+        """
+        for queue in self.inbound:
+            for transfer in queue.get():
+                heapq.heappush(self.pending, tuple(transfer))
+        end = start + steps
+        time_series = {}
+        offset = self.zone.lowest_floor - 1
+        while self.pending and self.pending[0][0] < end:
+            time, leg = heapq.heappop(self.pending)
+            passenger = Passenger(self.start_floors[leg] - offset, self.destination_floors[leg] - offset)
+            time_series.setdefault(time - start, []).append(passenger)
+            self.leg_rows.append(leg)
+            if self.next_legs[leg] >= 0:
+                self.onward.append((passenger, self.next_legs[leg]))
+        self.system.run(steps, time_series, engine=self.engine)
+
+        onward = []
+        for passenger, leg in self.onward:
+            if passenger.alight_time is None:
+                onward.append((passenger, leg))
+            else:
+                self.outbound[self.leg_zones[leg]].put(passenger.alight_time + self.transfer_time, leg)
+        self.onward = onward
+
+    def result(self):
+        """
+        Returns:
+            dict: The legs run by the shard, the call, board and alight times of each (-1 if not yet), and the zone's stats.
+        """
+        table = self.system.passenger_table
+        return {'legs': np.array(self.leg_rows, dtype=np.int64), 'call_time': table.call_time[:table.size].copy(),
+                'board_time': table.board_time[:table.size].copy(), 'alight_time': table.alight_time[:table.size].copy(),
+                'stats': self.system.stats()}
+
+def _run_shard(zone_index, building, legs, call_times, queues, transfer_time, engine, duration, barrier, results):
+    try:
+        shard = Shard(zone_index, building, legs, call_times, queues, transfer_time, engine)
+        for start in range(0, duration, transfer_time):
+            shard.run_window(start, min(transfer_time, duration - start))
+            # Transfers made in a window are due after it, once every shard has made them
+            barrier.wait()
+        results.put((zone_index, shard.result(), None))
+    except BaseException:
+        barrier.abort()
+        results.put((zone_index, None, traceback.format_exc()))
+    finally:
+        for queue in queues.values():
+            queue.close()
+
+def run_sharded(building, calls, duration, transfer_time=20, engine='event', processes=True, capacity=65536):
+    """
+    Simulate a building zone by zone, each zone's elevator system in its own process.
+
+    The shards run in lockstep windows of transfer_time steps. A passenger getting off at a transfer floor
+    calls the next zone's elevators transfer_time steps later, so the transfers of one window are
+    always due in a later one, and are handed over through shared memory between windows.
+
+    Args:
+        building (Building): The building.
+        calls (tuple): The call time, start floor and destination floor of each passenger, sorted by time.
+        duration (int): The number of time steps to simulate.
+        transfer_time (int): The time it takes to walk between elevators at a transfer floor, at least 1.
+        engine (str): The engine to run each zone's elevator system with.
+        processes (bool): Whether to run each shard in its own process, or all in this process.
+        capacity (int): The number of transfers each queue between two zones can hold.
+
+    Returns:
+        dict: The trip statistics, see trip_stats.
+    """
+    if transfer_time < 1:
+        raise ValueError("transfer_time must be at least 1")
+    call_times, start_floors, destination_floors = (np.asarray(column, dtype=np.int64) for column in calls)
+    legs = route_calls(building, start_floors, destination_floors)
+    queues = {link: TransferQueue(capacity) for link in building.links()}
+    try:
+        if processes:
+            context = multiprocessing.get_context()
+            barrier, results = context.Barrier(len(building.zones)), context.Queue()
+            workers = [context.Process(target=_run_shard, args=(zone_index, building, legs, call_times, queues,
+                                                                transfer_time, engine, duration, barrier, results))
+                       for zone_index in range(len(building.zones))]
+            for worker in workers:
+                worker.start()
+            shard_results = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            errors = [error for _, _, error in shard_results if error is not None]
+            if errors:
+                raise RuntimeError("A shard failed:\n" + errors[0])
+            shard_results = [result for _, result, _ in sorted(shard_results, key=lambda item: item[0])]
+        else:
+            shards = [Shard(zone_index, building, legs, call_times, queues, transfer_time, engine)
+                      for zone_index in range(len(building.zones))]
+            for start in range(0, duration, transfer_time):
+                for shard in shards:
+                    shard.run_window(start, min(transfer_time, duration - start))
+            shard_results = [shard.result() for shard in shards]
+    finally:
+        for queue in queues.values():
+            queue.close()
+            queue.unlink()
+    return trip_stats(building, legs, call_times, shard_results)
+
+def trip_stats(building, legs, call_times, shard_results):
+    """
+    Combine the legs run by the shards into the statistics of whole trips.
+
+    The wait and ride times of a trip are summed over its legs, and its total time runs from its first
+    call until it got off at its destination, including the time spent changing elevators.
+
+    Returns:
+        dict: The number of trips and legs, the average wait, ride and total times of the trips completed
+            and their max and min wait times, and the stats of each zone's elevator system keyed by name.
+    """
+    times = {name: np.full(len(legs.trip), -1, dtype=np.int64) for name in ('call_time', 'board_time', 'alight_time')}
+    for result in shard_results:
+        for name, column in times.items():
+            column[result['legs']] = result[name]
+    num_trips = len(call_times)
+    completed = np.ones(num_trips, dtype=bool)
+    completed[legs.trip[times['alight_time'] < 0]] = False
+    board_time, alight_time = times['board_time'], times['alight_time']
+    wait_times = np.bincount(legs.trip, weights=board_time - 1 - times['call_time'], minlength=num_trips)[completed]
+    ride_times = np.bincount(legs.trip, weights=alight_time - board_time, minlength=num_trips)[completed]
+    last_legs = np.flatnonzero(legs.next_leg < 0)
+    total_times = np.zeros(num_trips, dtype=np.int64)
+    total_times[legs.trip[last_legs]] = alight_time[last_legs] - 1
+    total_times = (total_times - call_times)[completed]
+    count = len(wait_times)
+    return {
+        'trips': num_trips,
+        'legs': len(legs.trip),
+        'completed': count,
+        'average_wait_time': float(wait_times.sum()) / count if count else 0,
+        'average_ride_time': float(ride_times.sum()) / count if count else 0,
+        'average_total_time': int(total_times.sum()) / count if count else 0,
+        'max_wait_time': int(wait_times.max()) if count else 0,
+        'min_wait_time': int(wait_times.min()) if count else 0,
+        'zones': {zone.name: result['stats'] for zone, result in zip(building.zones, shard_results)},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a zoned tower with sky lobbies, a process per bank of elevators.")
+    parser.add_argument('--floors', type=int, default=500)
+    parser.add_argument('--elevators', type=int, default=64)
+    parser.add_argument('--zones', type=int, default=8)
+    parser.add_argument('--duration', type=int, default=3600)
+    parser.add_argument('--calls', type=int, default=3600)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--transfer-time', type=int, default=20)
+    parser.add_argument('--engine', choices=('tick', 'event'), default='event')
+    parser.add_argument('--serial', action='store_true', help="run every shard in this process")
+    args = parser.parse_args(argv)
+    building = sky_lobby_building(args.floors, args.elevators, args.zones)
+    calls = generate_call_arrays(args.floors, args.duration, args.calls, args.seed, fast=True)
+    stats = run_sharded(building, calls, args.duration, args.transfer_time, args.engine, processes=not args.serial)
+    for name, value in stats.items():
+        if name != 'zones':
+            print(f"{name}: {value}")
+
+if __name__ == '__main__':
+    main()
@@ -1,92 +1,235 @@
 from elevator import ElevatorSystem, Passenger
+from steady_state import run_until_converged
 import numpy as np
 
-def generate_lognormal_passenger_counts(calls):
+GENERATOR_VERSION = 1  # bump when a change to the call generators changes the calls drawn for a seed
+
+def generate_lognormal_passenger_counts(calls, rng=None):
     """
     The number of passengers per call is random according to a lognormal distribution,
     rounded to the nearest integer in the range (0, 5].
+
+    Args:
+        calls (int): The number of calls.
+        rng (numpy.random.Generator or numpy.random.RandomState): The random stream to draw from,
+            defaults to the global NumPy random state.
     """
     # Define mean and standard deviation for the lognormal distribution
     mean = 0.7
     sigma = 0.6
     # Generate lognormal distribution
-    raw_distribution = np.random.lognormal(mean, sigma, calls)
+    raw_distribution = (rng or np.random).lognormal(mean, sigma, calls)
     # Round to nearest integer
     rounded_data = np.round(raw_distribution)
     # Clip the values to be within the range (1, 5]
     return np.clip(rounded_data, 1, 5)
 
-def generate_random_calls(num_floors, duration, total_calls):
+def sort_calls(times, start_floors, destination_floors):
     """
-    Generate calls to the elevator from the lobby at random times with random number of passengers.
+    Sort columnar calls by time, keeping calls made at the same time in their original order.
+
+    Returns:
+        tuple: The times, start floors and destination floors, as int64 arrays.
+    """
+    order = np.argsort(times, kind='stable')
+    return tuple(np.asarray(column, dtype=np.int64)[order] for column in (times, start_floors, destination_floors))
+
+def to_time_series(times, start_floors, destination_floors):
+    """
+    Convert columnar calls into the time series of passengers that ElevatorSystem.run takes.
+
+    Returns:
+        dict: Lists of passengers keyed by the time at which they call the elevator.
     """
     time_series = {}
-    for _ in range(total_calls):
-        call_time = np.random.randint(0, duration)  # Time at which the passengers call the elevator
-        num_passengers = np.random.randint(1, 6)
-        for _ in range(num_passengers):  # Number of passengers calling the elevator at this time
-            passenger = Passenger(1, np.random.randint(2, num_floors+1))  # Destination floor is chosen randomly
-            time_series.setdefault(call_time, []).append(passenger)  # Add the passenger to the time series
+    for call_time, start_floor, destination_floor in zip(times.tolist(), start_floors.tolist(),
+                                                         destination_floors.tolist()):
+        time_series.setdefault(call_time, []).append(Passenger(start_floor, destination_floor))
     return time_series
 
-def generate_uniform_calls_with_lognormal_passengers(num_floors, duration, total_calls, passenger_counts):
+def generate_random_call_arrays(num_floors, duration, total_calls, rng=None):
+    """
+    Generate calls to the elevator from the lobby at random times with random number of passengers.
+
+    If rng is a numpy.random.Generator, all calls are drawn from it in a few batches. If it is a
+    numpy.random.RandomState, or None for the global NumPy random state, the calls are drawn from
+    it in the same order as they always have been, so the same seed gives the same calls.
+
+    Returns:
+        tuple: The call time, start floor and destination floor of each passenger, sorted by time.
+    """
+    if isinstance(rng, np.random.Generator):
+        call_times = rng.integers(0, duration, total_calls)  # Time at which the passengers call the elevator
+        num_passengers = rng.integers(1, 6, total_calls)
+        times = np.repeat(call_times, num_passengers)
+        destination_floors = rng.integers(2, num_floors+1, len(times))  # Destination floor is chosen randomly
+        return sort_calls(times, np.ones(len(times)), destination_floors)
+
+    rng = rng or np.random
+    call_times, num_passengers, destination_floors = [], [], []
+    for _ in range(total_calls):
+        call_times.append(rng.randint(0, duration))  # Time at which the passengers call the elevator
+        num_passengers.append(rng.randint(1, 6))
+        destination_floors.append(rng.randint(2, num_floors+1, num_passengers[-1]))
+    if not call_times:
+        return sort_calls([], [], [])
+    times = np.repeat(call_times, num_passengers)
+    return sort_calls(times, np.ones(len(times)), np.concatenate(destination_floors))
+
+def generate_random_calls(num_floors, duration, total_calls, rng=None):
+    """
+    Generate calls to the elevator from the lobby at random times with random number of passengers.
+    See generate_random_call_arrays.
+
+    Returns:
+        dict: Lists of passengers keyed by the time at which they call the elevator.
+    """
+    return to_time_series(*generate_random_call_arrays(num_floors, duration, total_calls, rng))
+
+def generate_uniform_call_arrays(num_floors, duration, total_calls, passenger_counts, rng=None):
     """
     Generates uniform distribution of number and frequency of calls to the elevator
     from non-lobby floors.
+
+    Calls take their number of passengers from passenger_counts in order, floor by floor; calls
+    left over once it runs out have no passengers. As in generate_random_call_arrays, rng selects
+    between batched draws from a numpy.random.Generator and the reproducible draws from a
+    numpy.random.RandomState.
+
+    Returns:
+        tuple: The call time, start floor and destination floor of each passenger, sorted by time.
     """
     if num_floors < 2 or total_calls < 1:
-        return {}
+        return sort_calls([], [], [])
     calls_per_floor = 1 + (total_calls / (num_floors - 1))  # Uniform number of calls per floor
     call_interval = 1 + int(duration // calls_per_floor)  # Uniform time interval between calls
+    floors = np.arange(2, num_floors+1)  # Start from floor 2 since floor 1 is the lobby
 
-    time_series = {}
-    start_time = 0
-    for floor in range(2, num_floors+1):  # Start from floor 2 since floor 1 is the lobby
-        start_time = np.random.randint(0, call_interval)  # Random start time
-        # Generate calls at uniform intervals
-        for call_time in range(start_time, duration, call_interval):
-            # Number of passengers calling the elevator at this time
-            num_passengers = int(passenger_counts.pop(0)) if len(passenger_counts)>0 else 0
-            for _ in range(num_passengers):
-                # Destination floor is chosen randomly
-                passenger = Passenger(floor, np.random.randint(1, num_floors+1))
-                # Add the passenger to the time series
-                time_series.setdefault(call_time, []).append(passenger)
-    return time_series
+    def calls_from(start_times):
+        # Number of calls made from each floor at uniform intervals
+        return np.maximum(0, -((start_times - duration) // call_interval))
 
+    def counts_for(first_call, num_calls):
+        # Number of passengers calling the elevator at each of num_calls calls, zero once the counts run out
+        counts = np.zeros(num_calls, dtype=np.int64)
+        taken = np.asarray(passenger_counts[first_call:first_call + num_calls], dtype=np.int64)
+        counts[:len(taken)] = taken
+        return counts
 
+    if isinstance(rng, np.random.Generator):
+        start_times = rng.integers(0, call_interval, len(floors))  # Random start time
+        num_calls = calls_from(start_times)
+        first_call = np.repeat(np.cumsum(num_calls) - num_calls, num_calls)
+        call_times = np.repeat(start_times, num_calls) + (np.arange(num_calls.sum()) - first_call) * call_interval
+        num_passengers = counts_for(0, len(call_times))
+        times = np.repeat(call_times, num_passengers)
+        start_floors = np.repeat(np.repeat(floors, num_calls), num_passengers)
+        destination_floors = rng.integers(1, num_floors+1, len(times))  # Destination floor is chosen randomly
+        return sort_calls(times, start_floors, destination_floors)
 
-def simulate_elevator_calls(elevator_system, duration, total_calls, seed):
+    rng = rng or np.random
+    times, start_floors, destination_floors = [], [], []
+    first_call = 0
+    for floor in floors.tolist():
+        start_time = rng.randint(0, call_interval)  # Random start time
+        call_times = np.arange(start_time, duration, call_interval)
+        num_passengers = counts_for(first_call, len(call_times))
+        first_call += len(call_times)
+        times.append(np.repeat(call_times, num_passengers))
+        start_floors.append(np.full(len(times[-1]), floor))
+        # Destination floor is chosen randomly
+        destination_floors.append(rng.randint(1, num_floors+1, len(times[-1])))
+    return sort_calls(np.concatenate(times), np.concatenate(start_floors), np.concatenate(destination_floors))
+
+def generate_uniform_calls_with_lognormal_passengers(num_floors, duration, total_calls, passenger_counts, rng=None):
+    """
+    Generates uniform distribution of number and frequency of calls to the elevator
+    from non-lobby floors. See generate_uniform_call_arrays.
+
+    Returns:
+        dict: Lists of passengers keyed by the time at which they call the elevator.
+    """
+    return to_time_series(*generate_uniform_call_arrays(num_floors, duration, total_calls, passenger_counts, rng))
+
+def spawn_streams(seed):
+    """
+    Spawn independent random streams for the parts of the traffic, so that changing how one part is
+    drawn does not perturb the others.
+
+    Args:
+        seed (int or numpy.random.SeedSequence): The seed of the simulation.
+
+    Returns:
+        dict: A numpy.random.Generator for each of 'lobby' traffic, 'floors' traffic and passenger 'counts'.
+    """
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return dict(zip(('lobby', 'floors', 'counts'), map(np.random.default_rng, seed_sequence.spawn(3))))
+
+def generate_call_arrays(num_floors, duration, total_calls, seed, fast=False):
+    """
+    Generate the calls made from the lobby and the other floors during a simulation.
+
+    No global random state is used, so simulations can run concurrently. With fast set, the calls are
+    drawn in batches from the independent streams of spawn_streams(seed), and lobby and floor calls
+    made at the same time are all kept. Otherwise they are drawn from a numpy.random.RandomState
+    seeded with seed, as earlier versions drew them from the seeded global random state, so the
+    same seed gives the same calls; as before, lobby calls made at the same time as a floor call
+    are dropped.
+
+    Returns:
+        tuple: The call time, start floor and destination floor of each passenger, sorted by time.
+    """
+    if fast:
+        streams = spawn_streams(seed)
+        lobby_rng, floors_rng, counts_rng = streams['lobby'], streams['floors'], streams['counts']
+        # Number of calls to the elevator from the lobby
+        lobby_calls = int(lobby_rng.integers(0, max(total_calls // 2, 1)))
+    else:
+        lobby_rng = floors_rng = counts_rng = np.random.RandomState(seed)
+        lobby_calls = lobby_rng.randint(0, total_calls/2)
+    # Number of calls to the elevator from non-lobby floors
+    nonlobby_calls = total_calls - lobby_calls
+
+    # Generate the calls to the elevator from the lobby
+    lobby = generate_random_call_arrays(num_floors, duration, lobby_calls, lobby_rng)
+
+    # Generate the calls to the elevator from non-lobby floors
+    passenger_counts = generate_lognormal_passenger_counts(nonlobby_calls, counts_rng)
+    floors = generate_uniform_call_arrays(num_floors, duration, nonlobby_calls, passenger_counts, floors_rng)
+
+    if not fast:
+        kept = ~np.isin(lobby[0], floors[0])
+        lobby = tuple(column[kept] for column in lobby)
+    return sort_calls(*(np.concatenate(columns) for columns in zip(lobby, floors)))
+
+def simulate_elevator_calls(elevator_system, duration, total_calls, seed, engine='tick', fast=False, epsilon=None,
+                            relative=False):
     """
     A simulator that generates the time series of elevator calls and runs the elevator system for the given duration.
     It uses the following assumptions when generating the inputs:
     1. Except for the lobby, all other floors have a uniform distribution of number and frequency of calls.
     2. The number of passengers per call is random according to a lognormal distribution, rounded to the nearest integer in the range (0, 5].
     3. The random functions should be seeded in such a way that the results of any run can be reproduced if the same seed is used.
-    """
-    np.random.seed(seed)
-    num_floors = elevator_system.num_floors
-
-    # Number of calls to the elevator from the lobby
-    lobby_calls = np.random.randint(0, total_calls/2)
-    # Number of calls to the elevator from non-lobby floors
-    nonlobby_calls = total_calls - lobby_calls
 
-    # Generate the time series of calls to the elevator from the lobby
-    time_series = generate_random_calls(num_floors, duration, lobby_calls)
+    The engine argument is passed on to ElevatorSystem.run: 'tick' or 'event'. With fast set, the calls
+    are drawn in batches from numpy.random.Generator streams; see generate_call_arrays. The global
+    random state is left untouched.
 
-    # Generate and append the time series of calls to the elevator from non-lobby floors
-    passenger_counts = generate_lognormal_passenger_counts(nonlobby_calls)
-    passenger_counts = passenger_counts.tolist()
-    time_series.update(generate_uniform_calls_with_lognormal_passengers(num_floors, duration, nonlobby_calls, passenger_counts))
+    With epsilon set, the run stops as soon as the mean wait time is estimated to within epsilon
+    (a fraction of the mean if relative), leaving out the warm-up; the result of
+    steady_state.run_until_converged is returned, and the system's stats() leave out the warm-up
+    it found (pass warmup=0 to include it).
+    """
+    time_series = to_time_series(*generate_call_arrays(elevator_system.num_floors, duration, total_calls, seed, fast))
 
     # Run the simulation
-    for t in range(duration):
-        if t in time_series:
-            for passenger in time_series[t]:
-                elevator_system.call_elevator(passenger)
-        elevator_system.step()
+    result = None
+    if epsilon is None:
+        elevator_system.run(duration, time_series, engine=engine)
+    else:
+        result = run_until_converged(elevator_system, time_series, duration, epsilon, relative, engine=engine)
     print("Total:", sum(len(time_series[t]) for t in time_series))
+    return result
 
 if __name__ == '__main__':
     # Run the elevator call simulation
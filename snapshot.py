@@ -0,0 +1,229 @@
+import io
+import json
+import math
+import struct
+
+import numpy as np
+
+from elevator import CarSpec, ElevatorSystem, Fleet, Passenger, PassengerTable
+from online_stats import OnlineStats
+
+SNAPSHOT_MAGIC = b'ELEVSNAP'
+SNAPSHOT_VERSION = 3
+ELEVATOR_FIELDS = ('current_floor', 'door_timer', 'is_door_open', 'moving_direction', 'time_in_operation',
+                   'passengers_served', 'stops_made', 'run_start', 'run_ticks')
+# CarSpec fields saved as integers (-1 for a home_floor of None) and as floats (NaN for an acceleration of None)
+CAR_INT_FIELDS = ('capacity', 'door_time', 'lobby_time', 'home_floor')
+CAR_FLOAT_FIELDS = ('speed', 'acceleration')
+
+def take_snapshot(elevator_system, rng=None):
+    """
+    Capture the full state of an elevator system between two time steps in a compact binary snapshot:
+    the elevators, their destinations and riders, the queues of waiting passengers, the timestamps of
+    every passenger, the online statistics, the fleet and, optionally, the state of the random stream driving the run.
+
+    Args:
+        elevator_system (ElevatorSystem): The system to capture.
+        rng (numpy.random.Generator or numpy.random.RandomState): A random stream to capture with it.
+
+    Returns:
+        bytes: The snapshot: a header with the format version, then an uncompressed NumPy .npz archive.
+    """
+    table = elevator_system.passenger_table
+    arrays = {column: getattr(table, column)[:table.size] for column in PassengerTable.COLUMNS}
+    elevators = elevator_system.elevators
+    # A car standing at a floor has no run_start, stored as -1
+    arrays['elevators'] = np.array([[-1 if getattr(elevator, field) is None else int(getattr(elevator, field))
+                                     for field in ELEVATOR_FIELDS] for elevator in elevators],
+                                   dtype=np.int64).reshape(len(elevators), len(ELEVATOR_FIELDS))
+    arrays['destination_counts'] = np.array([len(elevator.destination_floors) for elevator in elevators], dtype=np.int64)
+    arrays['destination_floors'] = np.array([floor for elevator in elevators for floor in sorted(elevator.destination_floors)],
+                                            dtype=np.int64)
+    arrays['rider_counts'] = np.array([len(elevator.passengers) for elevator in elevators], dtype=np.int64)
+    arrays['riders'] = np.array([passenger.index for elevator in elevators for passenger in elevator.passengers], dtype=np.int64)
+    # Queued passengers in FIFO order: the owner of the queue (-1 when shared, else an elevator ID), and the passenger
+    owners = [(-1, elevator_system.hall_calls)] if elevator_system.dispatcher is None else \
+        [(elevator.elevator_id, elevator.hall_calls) for elevator in elevators]
+    arrays['hall_calls'] = np.array([(owner, passenger.index) for owner, hall_calls in owners
+                                     for queues in hall_calls.calls.values() for queue in queues.values()
+                                     for passenger in queue], dtype=np.int64).reshape(-1, 2)
+
+    metadata = {
+        'num_floors': elevator_system.num_floors,
+        'num_elevators': len(elevators),
+        'current_time': elevator_system.current_time,
+        'warmup': elevator_system.warmup,
+        'dispatcher': type(elevator_system.dispatcher).__name__ if elevator_system.dispatcher is not None else None,
+        'rng': None,
+    }
+    if isinstance(rng, np.random.Generator):
+        metadata['rng'] = {'type': 'Generator', 'state': rng.bit_generator.state}
+    elif isinstance(rng, np.random.RandomState):
+        state = rng.get_state(legacy=False)
+        arrays['rng_key'] = state['state']['key']
+        state['state'] = {'pos': state['state']['pos']}
+        metadata['rng'] = {'type': 'RandomState', 'state': state}
+    if elevator_system.online_stats is not None:
+        arrays.update(_online_stats_arrays(elevator_system.online_stats))
+    if elevator_system.fleet is not None:
+        arrays.update(_fleet_arrays(elevator_system.fleet))
+        metadata['motion'] = [spec.motion for spec in elevator_system.fleet.cars]
+    arrays['metadata'] = np.frombuffer(json.dumps(metadata).encode(), dtype=np.uint8)
+
+    buffer = io.BytesIO()
+    buffer.write(SNAPSHOT_MAGIC + struct.pack('<H', SNAPSHOT_VERSION))
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+def restore_snapshot(data, dispatcher=None):
+    """
+    Rebuild an elevator system from a snapshot taken by take_snapshot. Its passenger table takes over
+    the loaded columns, and only the passengers still waiting or riding get a Passenger object, which
+    are all its passengers list starts with.
+
+    Args:
+        data (bytes): The snapshot.
+        dispatcher (Dispatcher): The dispatcher to use, required if the captured system had one.
+
+    Returns:
+        tuple: The elevator system, and the captured random stream (None if there was none).
+    """
+    header = len(SNAPSHOT_MAGIC) + 2
+    if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError("Not an elevator system snapshot")
+    version, = struct.unpack('<H', data[len(SNAPSHOT_MAGIC):header])
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {version}")
+    with np.load(io.BytesIO(data[header:]), allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    metadata = json.loads(arrays['metadata'].tobytes())
+    if (metadata['dispatcher'] is None) != (dispatcher is None):
+        raise ValueError(f"The snapshot was taken with dispatcher {metadata['dispatcher']}")
+
+    online_stats = _restore_online_stats(arrays) if 'online_running' in arrays else None
+    fleet = _restore_fleet(arrays, metadata['motion']) if 'car_ints' in arrays else None
+    elevator_system = ElevatorSystem(metadata['num_elevators'], metadata['num_floors'], dispatcher=dispatcher,
+                                     online_stats=online_stats, fleet=fleet)
+    elevator_system.current_time = metadata['current_time']
+    elevator_system.warmup = metadata['warmup']
+
+    # The table takes over the loaded columns, and only the passengers in flight get a Passenger
+    size = len(arrays['call_time'])
+    table = elevator_system.passenger_table
+    if size:
+        for column in PassengerTable.COLUMNS:
+            setattr(table, column, arrays[column])
+        table.size = size
+    in_flight = np.flatnonzero((arrays['alight_time'] < 0) & (arrays['start_floor'] != arrays['destination_floor']))
+    passengers = {}
+    for index, start_floor, destination_floor in zip(in_flight.tolist(), arrays['start_floor'][in_flight].tolist(),
+                                                     arrays['destination_floor'][in_flight].tolist()):
+        passenger = Passenger(start_floor, destination_floor)
+        passenger.elevator_system = elevator_system
+        passenger.index = index
+        passengers[index] = passenger
+    if elevator_system.keep_passengers:
+        elevator_system.passengers = list(passengers.values())
+    elevator_system.active_passengers = set(passengers.values())
+
+    destination_counts, rider_counts = arrays['destination_counts'].tolist(), arrays['rider_counts'].tolist()
+    destination_ends, rider_ends = np.cumsum(destination_counts).tolist(), np.cumsum(rider_counts).tolist()
+    destination_floors, riders = arrays['destination_floors'].tolist(), arrays['riders'].tolist()
+    for elevator, values, destination_end, rider_end in zip(elevator_system.elevators, arrays['elevators'].tolist(),
+                                                            destination_ends, rider_ends):
+        for field, value in zip(ELEVATOR_FIELDS, values):
+            setattr(elevator, field, value)
+        elevator.is_door_open = bool(elevator.is_door_open)
+        elevator.run_start = None if elevator.run_start < 0 else elevator.run_start
+        elevator.destination_floors = set(destination_floors[destination_end - destination_counts[elevator.elevator_id]:destination_end])
+        elevator.passengers = [passengers[index] for index in riders[rider_end - rider_counts[elevator.elevator_id]:rider_end]]
+        for passenger in elevator.passengers:
+            passenger.elevator = elevator
+            passenger.current_floor = elevator.current_floor
+    for owner, index in arrays['hall_calls'].tolist():
+        hall_calls = elevator_system.hall_calls if owner < 0 else elevator_system.elevators[owner].hall_calls
+        hall_calls.add(passengers[index])
+
+    rng = None
+    if metadata['rng'] is not None and metadata['rng']['type'] == 'Generator':
+        state = metadata['rng']['state']
+        rng = np.random.Generator(getattr(np.random, state['bit_generator'])())
+        rng.bit_generator.state = state
+    elif metadata['rng'] is not None:
+        state = metadata['rng']['state']
+        state['state']['key'] = arrays['rng_key']
+        rng = np.random.RandomState()
+        rng.set_state(state)
+    return elevator_system, rng
+
+def _fleet_arrays(fleet):
+    cars = fleet.cars
+    served = [sorted(spec.served_floors) if spec.served_floors is not None else [] for spec in cars]
+    return {
+        'car_ints': np.array([[-1 if getattr(spec, field) is None else getattr(spec, field) for field in CAR_INT_FIELDS]
+                              for spec in cars], dtype=np.int64).reshape(len(cars), len(CAR_INT_FIELDS)),
+        'car_floats': np.array([[math.nan if getattr(spec, field) is None else getattr(spec, field)
+                                 for field in CAR_FLOAT_FIELDS] for spec in cars],
+                               dtype=np.float64).reshape(len(cars), len(CAR_FLOAT_FIELDS)),
+        # -1 for a car serving every floor
+        'served_counts': np.array([len(floors) if spec.served_floors is not None else -1
+                                   for spec, floors in zip(cars, served)], dtype=np.int64),
+        'served_floors': np.array([floor for floors in served for floor in floors], dtype=np.int64),
+    }
+
+def _restore_fleet(arrays, motions):
+    served_counts, served_floors = arrays['served_counts'].tolist(), arrays['served_floors'].tolist()
+    served_ends = np.cumsum(np.maximum(served_counts, 0)).tolist()
+    cars = []
+    for ints, floats, motion, count, end in zip(arrays['car_ints'].tolist(), arrays['car_floats'].tolist(), motions,
+                                                served_counts, served_ends):
+        fields = dict(zip(CAR_INT_FIELDS, ints))
+        fields.update(zip(CAR_FLOAT_FIELDS, floats))
+        fields['home_floor'] = None if fields['home_floor'] < 0 else fields['home_floor']
+        fields['acceleration'] = None if math.isnan(fields['acceleration']) else fields['acceleration']
+        fields['served_floors'] = None if count < 0 else served_floors[end - count:end]
+        cars.append(CarSpec(motion=motion, **fields))
+    return Fleet(cars)
+
+def _online_stats_arrays(online_stats):
+    # One row per metric: count, mean, sum of squared differences, min and max of the running statistics,
+    # then count, zeros, min and max of the sketch, with NaN for a min or max of None
+    def number(value):
+        return math.nan if value is None else value
+    running = [online_stats.running[metric] for metric in OnlineStats.METRICS]
+    sketches = [online_stats.sketches[metric] for metric in OnlineStats.METRICS]
+    return {
+        'online_running': np.array([[r.count, r.mean, r.m2, number(r.min), number(r.max)] for r in running],
+                                   dtype=np.float64),
+        'online_sketches': np.array([[s.count, s.zeros, number(s.min), number(s.max)] for s in sketches],
+                                    dtype=np.float64),
+        'online_accuracy': np.array([sketches[0].relative_accuracy], dtype=np.float64),
+        'online_bucket_counts': np.array([len(s.buckets) for s in sketches], dtype=np.int64),
+        'online_buckets': np.array([(index, count) for s in sketches for index, count in s.buckets.items()],
+                                   dtype=np.int64).reshape(-1, 2),
+    }
+
+def _restore_online_stats(arrays):
+    # Passenger times are whole time steps, restored as ints
+    def number(value):
+        return None if math.isnan(value) else int(value) if value.is_integer() else value
+    online_stats = OnlineStats(relative_accuracy=float(arrays['online_accuracy'][0]))
+    bucket_ends = np.cumsum(arrays['online_bucket_counts']).tolist()
+    buckets = arrays['online_buckets'].tolist()
+    for metric, (count, mean, m2, low, high), (sketch_count, zeros, sketch_low, sketch_high), num_buckets, end in zip(
+            OnlineStats.METRICS, arrays['online_running'].tolist(), arrays['online_sketches'].tolist(),
+            arrays['online_bucket_counts'].tolist(), bucket_ends):
+        running, sketch = online_stats.running[metric], online_stats.sketches[metric]
+        running.count, running.mean, running.m2, running.min, running.max = int(count), mean, m2, number(low), number(high)
+        sketch.count, sketch.zeros, sketch.min, sketch.max = int(sketch_count), int(zeros), number(sketch_low), number(sketch_high)
+        sketch.buckets = {index: bucket_count for index, bucket_count in buckets[end - num_buckets:end]}
+    return online_stats
+
+def fork(elevator_system, rng=None):
+    """
+    Make an independent copy of an elevator system, and of a random stream driving it, to run a variant from here.
+
+    Returns:
+        tuple: The copied elevator system and random stream.
+    """
+    return restore_snapshot(take_snapshot(elevator_system, rng), dispatcher=elevator_system.dispatcher)
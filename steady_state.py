@@ -0,0 +1,144 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+def mser(values, batch_size=5):
+    """
+    Find where the warm-up transient of a series ends, with the MSER-m rule: average the series in
+    batches of batch_size, and truncate the number of batches d that minimizes the squared error of
+    the rest around its mean, divided by the square of its length. Only truncations of up to half the
+    batches are considered.
+
+    Args:
+        values (array-like): The series, in time order.
+        batch_size (int): The number of values averaged per batch.
+
+    Returns:
+        int: The number of values to truncate from the start.
+    """
+    values = np.asarray(values, dtype=float)
+    num_batches = len(values) // batch_size
+    if num_batches < 2:
+        return 0
+    batches = values[:num_batches * batch_size].reshape(num_batches, batch_size).mean(axis=1)
+    # Sums over the batches from d to the end, for every d
+    counts = np.arange(num_batches, 0, -1)
+    sums = np.cumsum(batches[::-1])[::-1]
+    squares = np.cumsum(batches[::-1] ** 2)[::-1]
+    errors = np.maximum(squares - sums ** 2 / counts, 0) / counts ** 2
+    return int(np.argmin(errors[:(num_batches + 1) // 2])) * batch_size
+
+def batch_means(values, num_batches=20, confidence=0.95):
+    """
+    Estimate the mean of a correlated series, with a confidence interval from the means of
+    num_batches consecutive batches, which are nearly independent once the batches are long enough.
+    The values left over from equal batches are dropped from the start of the series.
+
+    Args:
+        values (array-like): The series, in time order.
+        num_batches (int): The number of batches.
+        confidence (float): The confidence level of the interval.
+
+    Returns:
+        tuple: The mean and the half-width of its normal-approximation confidence interval, which is
+            infinite with fewer values than batches.
+    """
+    values = np.asarray(values, dtype=float)
+    batch_size = len(values) // num_batches
+    if batch_size == 0 or num_batches < 2:
+        return (float(values.mean()) if len(values) else 0.0), math.inf
+    batches = values[len(values) - num_batches * batch_size:].reshape(num_batches, batch_size).mean(axis=1)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return float(batches.mean()), z * float(batches.std(ddof=1)) / math.sqrt(num_batches)
+
+def batch_correlation(values, num_batches=40):
+    """
+    Estimate the lag-1 autocorrelation of the means of num_batches consecutive batches of a series:
+    batches much shorter than the correlations in the series give clearly positive values. The
+    values left over from equal batches are dropped from the start of the series.
+
+    Returns:
+        float: The autocorrelation, 1 with fewer values than batches.
+    """
+    values = np.asarray(values, dtype=float)
+    batch_size = len(values) // num_batches
+    if batch_size == 0 or num_batches < 3:
+        return 1.0
+    batches = values[len(values) - num_batches * batch_size:].reshape(num_batches, batch_size).mean(axis=1)
+    deviations = batches - batches.mean()
+    variance = float((deviations ** 2).sum())
+    return float((deviations[:-1] * deviations[1:]).sum()) / variance if variance > 0 else 0.0
+
+def settled_wait_times(elevator_system):
+    """
+    Get the wait times of the passengers who called before the first one still waiting, in the order
+    they called. Their waits are final, and leaving out everyone after the first one still waiting
+    keeps the long waits still in progress from being missed.
+
+    Returns:
+        tuple: The wait times and call times of those passengers.
+    """
+    table = elevator_system.passenger_table
+    n = table.size
+    waiting = (table.board_time[:n] < 0) & (table.start_floor[:n] != table.destination_floor[:n])
+    settled = int(np.argmax(waiting)) if waiting.any() else n
+    return table.times(elevator_system.current_time)[0][:settled], table.call_time[:settled]
+
+def run_until_converged(elevator_system, time_series, max_steps, epsilon, relative=False, confidence=0.95,
+                        chunk=600, num_batches=20, batch_size=5, max_correlation=0.1, min_passengers=1000,
+                        engine='event'):
+    """
+    Run an elevator system until its mean wait time is estimated to within epsilon, or for max_steps.
+
+    Every chunk of time steps, the warm-up transient (the empty building at the start) is found in the
+    settled wait times with MSER, and the confidence interval of the mean wait of the passengers
+    after it is computed by batch means. Wait times stay correlated over hundreds of passengers, and
+    batches shorter than that make the interval too narrow, so the interval is only trusted once
+    the means of twice as many half-length batches have a lag-1 autocorrelation of at most
+    max_correlation. The run stops once the interval is within epsilon of the mean, from at least
+    min_passengers passengers. The warm-up found last is stored as the system's warmup, which
+    stats() then leaves out.
+
+    Args:
+        elevator_system (ElevatorSystem): The system to run, from time 0.
+        time_series (dict): Passengers to call, keyed by the step offset from the start of the run.
+        max_steps (int): The most time steps to run.
+        epsilon (float): The half-width of the confidence interval to reach, in time steps.
+        relative (bool): Whether epsilon is a fraction of the mean wait rather than time steps.
+        confidence (float): The confidence level of the interval.
+        chunk (int): The time steps between two checks.
+        num_batches (int): The number of batches of the batch means.
+        batch_size (int): The batch size of MSER.
+        max_correlation (float): The largest lag-1 autocorrelation of the half-length batch means.
+        min_passengers (int): The fewest passengers after the warm-up to estimate from.
+        engine (str): The engine to run the elevator system with.
+
+    Returns:
+        dict: Whether the estimate 'converged', the 'steps' run, the 'warmup' time before which
+            passengers are left out, the number of 'passengers' estimated from
+            and of 'truncated' ones, and the 'mean_wait_time' and the 'half_width' of its interval.
+    """
+    start = 0
+    while True:
+        steps = min(chunk, max_steps - start)
+        elevator_system.run(steps, {t - start: time_series[t] for t in range(start, start + steps) if t in time_series},
+                            engine=engine)
+        start += steps
+        wait_times, call_times = settled_wait_times(elevator_system)
+        truncated = mser(wait_times, batch_size)
+        mean, half_width = batch_means(wait_times[truncated:], num_batches, confidence)
+        converged = (len(wait_times) - truncated >= min_passengers
+                     and half_width <= (epsilon * mean if relative else epsilon)
+                     and batch_correlation(wait_times[truncated:], 2 * num_batches) <= max_correlation)
+        if converged or start >= max_steps:
+            elevator_system.warmup = int(call_times[truncated]) if truncated < len(call_times) else 0
+            return {
+                'converged': bool(converged),
+                'steps': start,
+                'warmup': elevator_system.warmup,
+                'passengers': len(wait_times) - truncated,
+                'truncated': truncated,
+                'mean_wait_time': mean,
+                'half_width': half_width,
+            }
@@ -0,0 +1,187 @@
+import argparse
+import csv
+import itertools
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from cache import ResultCache, cache_key
+from elevator import ElevatorSystem
+from simulator import generate_call_arrays, to_time_series
+
+Config = namedtuple('Config', ['num_elevators', 'num_floors', 'duration', 'total_calls', 'seed'])
+STATS = ('passengers', 'average_wait_time', 'average_ride_time', 'average_total_time', 'max_wait_time', 'min_wait_time')
+
+def run_config(config, engine='event', fast=False, calls=None):
+    """
+    Run one simulation, as simulate_elevator_calls does, and keep only its compact statistics.
+
+    Args:
+        config (Config): The building, traffic and seed to simulate.
+        engine (str): The engine to run the elevator system with.
+        fast (bool): Whether to draw the calls in batches from a numpy.random.Generator.
+        calls (tuple): The calls of the configuration, if already generated.
+
+    Returns:
+        dict: The configuration followed by the scalar statistics of the run.
+    """
+    elevator_system = ElevatorSystem(num_elevators=config.num_elevators, num_floors=config.num_floors)
+    if calls is None:
+        calls = generate_call_arrays(config.num_floors, config.duration, config.total_calls, config.seed, fast)
+    elevator_system.run(config.duration, to_time_series(*calls), engine=engine)
+    stats = elevator_system.stats()
+    stats['passengers'] = len(calls[0])
+    return dict(config._asdict(), **{name: stats[name] for name in STATS})
+
+def cached_run_config(cache, config, engine='event', fast=False, keep_trace=False):
+    """
+    Run one configuration through a result cache: return the stored result if the same run was made
+    before, otherwise run it and store its result.
+
+    Args:
+        cache (ResultCache): The cache.
+        config (Config): The building, traffic and seed to simulate.
+        engine (str): The engine to run the elevator system with, if the result is not cached.
+        fast (bool): Whether to draw the calls in batches from a numpy.random.Generator.
+        keep_trace (bool): Whether to store the calls of the run with its result, for cache.get_trace.
+
+    Returns:
+        dict: The result of run_config.
+    """
+    config = Config(*config)
+    key = cache_key(config, fast)
+    result = cache.get(key)
+    if result is None:
+        calls = generate_call_arrays(config.num_floors, config.duration, config.total_calls, config.seed, fast)
+        result = run_config(config, engine, fast, calls)
+        cache.put(key, result, calls if keep_trace else None)
+    return result
+
+def make_configs(num_elevators, num_floors, durations, total_calls, seeds):
+    """
+    Build the grid of configurations to sweep, seeds varying fastest.
+
+    Returns:
+        list: A Config for each combination of the given values.
+    """
+    return [Config(*values) for values in itertools.product(num_elevators, num_floors, durations, total_calls, seeds)]
+
+def sweep(configs, max_workers=None, engine='event', fast=False, cache=None):
+    """
+    Run every configuration, spread over a pool of processes.
+
+    Each run depends only on its configuration, so the results are the same whatever the number of workers.
+
+    Args:
+        configs (list): The configurations to run.
+        max_workers (int): The number of processes, defaults to the number of CPUs. With 1, runs in this process.
+        engine (str): The engine to run the elevator systems with.
+        fast (bool): Whether to draw the calls in batches from a numpy.random.Generator.
+        cache (ResultCache): A cache of results to reuse, and to store the new ones in.
+
+    Returns:
+        list: The results of run_config, in the order of configs.
+    """
+    configs = [Config(*config) for config in configs]
+    if cache is not None:
+        # Only run what is not cached, so overlapping sweeps share their runs
+        keys = [cache_key(config, fast) for config in configs]
+        results = [cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            for i, result in zip(missing, sweep([configs[i] for i in missing], max_workers, engine, fast)):
+                cache.put(keys[i], result)
+                results[i] = result
+        return results
+    engines = itertools.repeat(engine, len(configs))
+    fasts = itertools.repeat(fast, len(configs))
+    if max_workers == 1:
+        return list(map(run_config, configs, engines, fasts))
+    max_workers = max_workers or os.cpu_count()
+    # Hand out runs in chunks so short runs don't pay for a round trip each
+    chunksize = max(1, len(configs) // (4 * max_workers))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run_config, configs, engines, fasts, chunksize=chunksize))
+
+def summarize(results, confidence=0.95):
+    """
+    Aggregate results over seeds, with a normal-approximation confidence interval for each statistic's mean.
+
+    Args:
+        results (list): Results of run_config.
+        confidence (float): The confidence level of the intervals.
+
+    Returns:
+        list: One dict per configuration without its seed, with the number of runs and, for each statistic,
+            its mean and the half-width of its confidence interval.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    groups = {}
+    for result in results:
+        key = tuple(result[field] for field in Config._fields if field != 'seed')
+        groups.setdefault(key, []).append(result)
+    summaries = []
+    for key, group in groups.items():
+        summary = dict(zip([field for field in Config._fields if field != 'seed'], key), runs=len(group))
+        for name in STATS:
+            values = np.array([result[name] for result in group], dtype=float)
+            summary[name] = float(values.mean())
+            summary[name + '_ci'] = z * float(values.std(ddof=1)) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+        summaries.append(summary)
+    return summaries
+
+def write_results(path, rows):
+    """
+    Write results or summaries to a CSV file, or to a NumPy .npz file with one array per column.
+
+    Args:
+        path (str): The file to write; its extension selects the format.
+        rows (list): Dicts that all have the same keys.
+    """
+    if not rows:
+        raise ValueError("No results to write")
+    columns = list(rows[0])
+    if path.endswith('.npz'):
+        np.savez(path, **{column: np.array([row[column] for row in rows]) for column in columns})
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a sweep of elevator simulations over seeds and building sizes.")
+    parser.add_argument('--elevators', type=int, nargs='+', default=[12], help="numbers of elevators")
+    parser.add_argument('--floors', type=int, nargs='+', default=[60], help="numbers of floors")
+    parser.add_argument('--duration', type=int, nargs='+', default=[3600], help="simulated durations")
+    parser.add_argument('--calls', type=int, nargs='+', default=[3600], help="total numbers of calls")
+    parser.add_argument('--seeds', type=int, default=10, help="number of seeds per configuration")
+    parser.add_argument('--first-seed', type=int, default=0, help="first seed")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (default: number of CPUs)")
+    parser.add_argument('--engine', choices=['tick', 'event'], default='event')
+    parser.add_argument('--fast', action='store_true', help="draw calls from a numpy.random.Generator")
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--output', help="write every run to this .csv or .npz file")
+    parser.add_argument('--summary', help="write the summary to this .csv or .npz file")
+    parser.add_argument('--cache', help="reuse and store results in this directory")
+    parser.add_argument('--cache-size', type=int, default=256, help="size bound of the cache directory, in MiB")
+    args = parser.parse_args(argv)
+
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    configs = make_configs(args.elevators, args.floors, args.duration, args.calls, seeds)
+    cache = ResultCache(args.cache, max_bytes=args.cache_size << 20) if args.cache else None
+    results = sweep(configs, max_workers=args.workers, engine=args.engine, fast=args.fast, cache=cache)
+    summaries = summarize(results, args.confidence)
+    if args.output:
+        write_results(args.output, results)
+    if args.summary:
+        write_results(args.summary, summaries)
+    for summary in summaries:
+        print(summary)
+
+if __name__ == '__main__':
+    main()
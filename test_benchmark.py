@@ -0,0 +1,39 @@
+import unittest
+
+from benchmark import DEFAULT_CASE, Case, case_name, compare, measure, run_suite, scaling_cases
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_scaling_cases(self):
+        cases = scaling_cases(engines=('event',))
+        self.assertEqual(cases[0], DEFAULT_CASE._replace(engine='event'))
+        self.assertIn(DEFAULT_CASE._replace(engine='event', num_floors=500), cases)
+        self.assertIn(DEFAULT_CASE._replace(engine='event', num_elevators=64), cases)
+        self.assertEqual(len(set(cases)), len(cases))
+
+    def test_measure(self):
+        case = Case(num_elevators=2, num_floors=10, duration=300, total_calls=30, engine='event')
+        result = measure(case, repeat=2)
+        self.assertEqual(result['name'], case_name(case))
+        self.assertEqual(result['num_floors'], 10)
+        for phase in ('generate_seconds', 'run_seconds', 'stats_seconds'):
+            self.assertGreater(result[phase], 0)
+        self.assertAlmostEqual(result['simulated_per_second'], 300 / result['run_seconds'])
+        self.assertGreater(result['peak_rss_mb'], 0)
+
+    def test_run_suite_isolated(self):
+        case = Case(num_elevators=1, num_floors=5, duration=100, total_calls=10, engine='tick')
+        result, = run_suite([case], isolate=True)
+        self.assertEqual(result['name'], case_name(case))
+
+    def test_compare(self):
+        baseline = [{'name': 'a', 'simulated_per_second': 1000.0}, {'name': 'b', 'simulated_per_second': 1000.0}]
+        results = [{'name': 'a', 'simulated_per_second': 950.0}, {'name': 'b', 'simulated_per_second': 800.0},
+                   {'name': 'c', 'simulated_per_second': 10.0}]
+        comparisons = compare(results, baseline, tolerance=0.1)
+        self.assertEqual([c['name'] for c in comparisons], ['a', 'b'])
+        self.assertEqual([c['regressed'] for c in comparisons], [False, True])
+        self.assertAlmostEqual(comparisons[1]['ratio'], 0.8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from cache import ResultCache, cache_key
+from simulator import generate_call_arrays
+from sweep import Config, cached_run_config, make_configs, run_config, sweep
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_cache_key(self):
+        config = Config(2, 10, 500, 50, 4)
+        self.assertEqual(cache_key(config), cache_key(Config(2, 10, 500, 50, 4)))
+        self.assertNotEqual(cache_key(config), cache_key(config._replace(seed=5)))
+        self.assertNotEqual(cache_key(config), cache_key(config, fast=True))
+        self.assertNotEqual(cache_key(config), cache_key(config, dispatcher='CostDispatcher'))
+        self.assertEqual(len(cache_key(config)), 64)
+
+class TestResultCache(unittest.TestCase):
+
+    def test_memory_tier_is_lru(self):
+        cache = ResultCache(max_entries=2)
+        cache.put('a', {'x': 1})
+        cache.put('b', {'x': 2})
+        self.assertEqual(cache.get('a'), {'x': 1})
+        cache.put('c', {'x': 3})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'x': 1})
+        cache.get('a')['x'] = 5
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+
+    def test_disk_tier(self):
+        calls = generate_call_arrays(10, 500, 50, seed=4)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            cache.put('a', {'x': 1.5}, calls)
+            cache.put('b', {'x': 2})
+            # A new process finds the results on disk
+            cache = ResultCache(directory)
+            self.assertIn('a', cache)
+            self.assertEqual(cache.get('a'), {'x': 1.5})
+            self.assertEqual([column.tolist() for column in cache.get_trace('a')], [column.tolist() for column in calls])
+            self.assertIsNone(cache.get_trace('b'))
+            self.assertEqual(cache.disk_usage(), sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)))
+
+    def test_disk_tier_is_size_bounded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory, max_entries=1, max_bytes=200)
+            for i in range(10):
+                cache.put(str(i), {'value': 'x' * 30})
+                cache.get('0')  # Keeps the first result in use
+            self.assertLessEqual(cache.disk_usage(), 200)
+            self.assertEqual(sorted(os.listdir(directory)), ['0.json', '7.json', '8.json', '9.json'])
+            self.assertIsNone(cache.get('5'))
+
+    def test_shared_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = ResultCache(directory), ResultCache(directory, max_bytes=100)
+            self.assertIsNone(second.get('a'))
+            first.put('a', {'value': 'x' * 30})
+            # Written after the second cache scanned the directory
+            self.assertIn('a', second)
+            self.assertEqual(second.get('a'), {'value': 'x' * 30})
+            first.put('b', {'value': 'x' * 30})
+            os.utime(os.path.join(directory, 'a.json'), (1, 1))  # Used long ago
+            # The bound covers the files the other cache wrote
+            second.put('c', {'value': 'x' * 30})
+            self.assertEqual(sorted(os.listdir(directory)), ['b.json', 'c.json'])
+            self.assertIsNone(ResultCache(directory).get('a'))
+            self.assertEqual(second.disk_usage(), sum(os.path.getsize(os.path.join(directory, name))
+                                                      for name in os.listdir(directory)))
+
+class TestCachedSweep(unittest.TestCase):
+
+    def test_overlapping_sweeps(self):
+        cache = ResultCache()
+        first = sweep(make_configs([1, 2], [8], [300], [30], range(3)), max_workers=1, cache=cache)
+        self.assertEqual(cache.misses, 6)
+        configs = make_configs([2, 3], [8], [300], [30], range(3))
+        self.assertEqual(sweep(configs, max_workers=1, cache=cache), sweep(configs, max_workers=1))
+        self.assertEqual((cache.hits, cache.misses), (3, 9))
+        self.assertEqual(first[3:], sweep(configs[:3], max_workers=1, cache=cache))
+
+    def test_cached_run_config(self):
+        config = Config(2, 10, 500, 50, 4)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            result = cached_run_config(cache, config, keep_trace=True)
+            self.assertEqual(result, run_config(config))
+            cache = ResultCache(directory)
+            self.assertEqual(cached_run_config(cache, config), result)
+            self.assertEqual(cache.hits, 1)
+            self.assertEqual(len(cache.get_trace(cache_key(config))[0]), result['passengers'])
+
+if __name__ == '__main__':
+    unittest.main()
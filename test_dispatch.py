@@ -0,0 +1,132 @@
+import unittest
+
+from dispatch import CostDispatcher, Dispatcher, sweep_distance
+from elevator import CarSpec, ElevatorSystem, Fleet, Passenger
+from simulator import generate_call_arrays, to_time_series
+
+class RecordingDispatcher(CostDispatcher):
+    """A CostDispatcher that remembers its assignments."""
+    def __init__(self):
+        self.assignments = {}
+
+    def assign(self, elevator_system, passenger):
+        elevator = super().assign(elevator_system, passenger)
+        self.assignments[passenger] = elevator.elevator_id
+        return elevator
+
+class TestDispatch(unittest.TestCase):
+
+    def test_sweep_distance(self):
+        # Going up from floor 3 of 10
+        self.assertEqual(sweep_distance(10, 3, 1, 7, 1), 4)
+        self.assertEqual(sweep_distance(10, 3, 1, 3, 1), 0)
+        self.assertEqual(sweep_distance(10, 3, 1, 2, 1), 17)
+        self.assertEqual(sweep_distance(10, 3, 1, 5, -1), 12)
+        # Going down from floor 8 of 10
+        self.assertEqual(sweep_distance(10, 8, -1, 2, -1), 6)
+        self.assertEqual(sweep_distance(10, 8, -1, 9, -1), 17)
+        self.assertEqual(sweep_distance(10, 8, -1, 4, 1), 10)
+        # A run between floors 4 and 10
+        self.assertEqual(sweep_distance(10, 8, -1, 9, -1, 4), 11)
+        self.assertEqual(sweep_distance(10, 8, -1, 5, 1, 4), 5)
+
+    def test_base_dispatcher(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=5, dispatcher=Dispatcher())
+        with self.assertRaises(NotImplementedError):
+            elevator_system.call_elevator(Passenger(1, 3))
+
+    def test_cost_dispatcher_picks_nearest(self):
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=10, dispatcher=CostDispatcher())
+        elevator_system.step()
+        # Elevator 0 goes up from the lobby, elevator 1 down from the top floor
+        self.assertEqual(elevator_system.elevators[0].current_floor, 2)
+        self.assertEqual(elevator_system.elevators[1].current_floor, 9)
+        up, down = Passenger(4, 8), Passenger(7, 1)
+        elevator_system.call_elevator(up)
+        elevator_system.call_elevator(down)
+        self.assertEqual(list(elevator_system.elevators[0].hall_calls.queue(4, 1)), [up])
+        self.assertEqual(list(elevator_system.elevators[1].hall_calls.queue(7, -1)), [down])
+        self.assertFalse(elevator_system.hall_calls.waiting)
+
+    def test_cost_dispatcher_idle_look_car(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=20, fleet=Fleet([CarSpec(motion='look', home_floor=10)]),
+                                         dispatcher=CostDispatcher())
+        elevator = elevator_system.elevators[0]
+        # Straight down to the caller, rather than on a sweep to the top and back
+        self.assertEqual(CostDispatcher().estimate(elevator, 8, 1), 2)
+        self.assertEqual(CostDispatcher().estimate(elevator, 13, -1), 3)
+
+    def test_cost_dispatcher_uses_fleet(self):
+        fleet = Fleet([CarSpec(), CarSpec(served_floors=[1] + list(range(20, 31)), speed=4), CarSpec(served_floors=range(1, 20))])
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=30, dispatcher=CostDispatcher(), fleet=fleet)
+        slow, express, local = elevator_system.elevators
+        # The express car covers the 29 floors from the top to the lobby much faster
+        self.assertEqual(express.current_floor, 30)
+        self.assertEqual(CostDispatcher().estimate(express, 1, 1), 8)
+        self.assertIs(elevator_system.dispatcher.assign(elevator_system, Passenger(25, 1)), express)
+        self.assertIs(elevator_system.dispatcher.assign(elevator_system, Passenger(3, 10)), slow)
+        self.assertIs(elevator_system.dispatcher.assign(elevator_system, Passenger(15, 10)), local)
+        passengers = [Passenger(1, 25), Passenger(25, 1), Passenger(3, 10), Passenger(22, 4)]
+        elevator_system.run(400, {5 * i: [p] for i, p in enumerate(passengers)})
+        self.assertEqual([p.elevator_id for p in passengers], [0, 1, 0, 0])
+        self.assertTrue(all(p.alight_time is not None for p in passengers))
+
+    def test_only_assigned_elevator_picks_up(self):
+        dispatcher = RecordingDispatcher()
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=10, dispatcher=dispatcher)
+        passengers = [Passenger(start, destination) for start, destination in
+                      [(1, 5), (1, 9), (6, 2), (3, 4), (10, 1), (2, 8), (1, 7), (7, 6)]]
+        elevator_system.run(200, {3 * i: [p] for i, p in enumerate(passengers)})
+        for passenger in passengers:
+            self.assertEqual(passenger.alight_time is not None, True)
+            self.assertEqual(passenger.elevator_id, dispatcher.assignments[passenger])
+
+    def test_full_elevator_hands_calls_back(self):
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=10, dispatcher=RecordingDispatcher())
+        elevator = elevator_system.elevators[0]
+        passengers = [Passenger(1, 5) for _ in range(elevator.capacity + 3)]
+        elevator_system.run(100, {0: passengers})
+        self.assertEqual(elevator.hall_calls.stops, 0)
+        self.assertEqual(sum(p.elevator_id == 0 for p in passengers), elevator.capacity)
+        self.assertTrue(all(p.alight_time is not None for p in passengers))
+        for passenger in passengers:
+            self.assertEqual(passenger.elevator_id, elevator_system.dispatcher.assignments[passenger])
+
+    def test_cost_dispatcher_spreads_full_loads(self):
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=10, dispatcher=CostDispatcher())
+        passengers = [Passenger(1, 5) for _ in range(25)]
+        for passenger in passengers:
+            elevator_system.call_elevator(passenger)
+        # Elevator 1 starts at the top floor
+        self.assertEqual([e.hall_calls.waiting for e in elevator_system.elevators], [10, 5, 10])
+
+    def test_shorter_waits_than_no_dispatcher(self):
+        calls = generate_call_arrays(60, 3600, 1200, seed=42)
+        stats = []
+        for dispatcher in (None, CostDispatcher()):
+            elevator_system = ElevatorSystem(num_elevators=12, num_floors=60, dispatcher=dispatcher)
+            elevator_system.run(3600, to_time_series(*calls), engine='event')
+            stats.append(elevator_system.stats())
+        self.assertLess(stats[1]['average_wait_time'], stats[0]['average_wait_time'])
+
+    def test_event_engine_matches_tick_engine(self):
+        calls = {t: [Passenger(1 + t % 7, 1 + (3 * t) % 10)] for t in range(0, 300, 4)}
+        tick_system = ElevatorSystem(num_elevators=3, num_floors=10, dispatcher=CostDispatcher())
+        tick_system.run(400, calls)
+        calls = {t: [Passenger(p.start_floor, p.destination_floor) for p in c] for t, c in calls.items()}
+        event_system = ElevatorSystem(num_elevators=3, num_floors=10, dispatcher=CostDispatcher())
+        event_system.run(400, calls, engine='event')
+        self.assertEqual(tick_system.stats(), event_system.stats())
+
+        # Loaded enough for full elevators to hand calls back
+        calls = generate_call_arrays(30, 1500, 1000, seed=6)
+        for fleet in (None, Fleet.uniform(3, speed=2.5, acceleration=0.5)):
+            stats = []
+            for engine in ('tick', 'event'):
+                elevator_system = ElevatorSystem(num_elevators=3, num_floors=30, fleet=fleet, dispatcher=CostDispatcher())
+                elevator_system.run(1800, to_time_series(*calls), engine=engine)
+                stats.append(elevator_system.stats())
+            self.assertEqual(stats[0], stats[1])
+
+if __name__ == '__main__':
+    unittest.main()
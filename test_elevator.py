@@ -1,6 +1,7 @@
 import unittest
-from elevator import Elevator, ElevatorSystem, Passenger
-from simulator import Passenger
+from dispatch import CostDispatcher
+from elevator import IDLE_STEPS, CarSpec, Elevator, ElevatorSystem, Fleet, Passenger, PassengerTable, travel_times
+from simulator import Passenger, generate_call_arrays, to_time_series
 
 class TestElevator(unittest.TestCase):
 
@@ -123,6 +124,288 @@ class TestElevator(unittest.TestCase):
         self.elevator.step()
         self.assertFalse(self.elevator.is_door_open)
 
+class TestElevatorSystem(unittest.TestCase):
+
+    def make_time_series(self):
+        # A few calls from the lobby and between floors, with a long quiet stretch in the middle
+        calls = {0: [(1, 4), (1, 5)], 3: [(3, 1)], 4: [(1, 2)], 40: [(5, 2), (2, 2)], 400: [(4, 1), (1, 3)]}
+        return {t: [Passenger(start, destination) for start, destination in c] for t, c in calls.items()}
+
+    def test_event_engine_matches_tick_engine(self):
+        tick_system = ElevatorSystem(num_floors=5, num_elevators=2)
+        tick_system.run(500, self.make_time_series())
+        event_system = ElevatorSystem(num_floors=5, num_elevators=2)
+        event_system.run(500, self.make_time_series(), engine='event')
+        self.assertEqual(tick_system.stats(), event_system.stats())
+        self.assertEqual(tick_system.current_time, event_system.current_time)
+        for tick_elevator, event_elevator in zip(tick_system.elevators, event_system.elevators):
+            self.assertEqual(tick_elevator.current_floor, event_elevator.current_floor)
+            self.assertEqual(tick_elevator.door_timer, event_elevator.door_timer)
+            self.assertEqual(tick_elevator.destination_floors, event_elevator.destination_floors)
+
+    def test_event_engine_resumes_tick_run(self):
+        tick_system = ElevatorSystem(num_floors=5, num_elevators=2)
+        tick_system.run(500, self.make_time_series())
+        event_system = ElevatorSystem(num_floors=5, num_elevators=2)
+        time_series = self.make_time_series()
+        event_system.run(10, time_series)
+        event_system.run(490, {t - 10: p for t, p in time_series.items() if t >= 10}, engine='event')
+        self.assertEqual(tick_system.stats(), event_system.stats())
+
+    def test_tick_engine_fast_forwards_quiescent_stretches(self):
+        stepped_system = ElevatorSystem(num_floors=5, num_elevators=2)
+        time_series = self.make_time_series()
+        for t in range(500):
+            for passenger in time_series.get(t, []):
+                stepped_system.call_elevator(passenger)
+            stepped_system.step()
+        elevator_system = ElevatorSystem(num_floors=5, num_elevators=2)
+        steps = []
+        elevator_system.elevators[0].step = lambda: (steps.append(1), Elevator.step(elevator_system.elevators[0]))
+        elevator_system.run(500, self.make_time_series())
+        self.assertEqual(stepped_system.stats(), elevator_system.stats())
+        for stepped_elevator, elevator in zip(stepped_system.elevators, elevator_system.elevators):
+            self.assertEqual(stepped_elevator.current_floor, elevator.current_floor)
+            self.assertEqual(stepped_elevator.moving_direction, elevator.moving_direction)
+            self.assertEqual(stepped_elevator.destination_floors, elevator.destination_floors)
+        self.assertLess(len(steps), 250)
+
+        # Turned off, every elevator is stepped every step
+        elevator_system = ElevatorSystem(num_floors=5, num_elevators=2)
+        elevator_system.fast_forward_enabled = False
+        steps = []
+        elevator_system.elevators[0].step = lambda: (steps.append(1), Elevator.step(elevator_system.elevators[0]))
+        elevator_system.run(500, self.make_time_series())
+        self.assertEqual(stepped_system.stats(), elevator_system.stats())
+        self.assertEqual(len(steps), 500)
+
+    def test_is_quiescent(self):
+        elevator_system = ElevatorSystem(num_floors=5, num_elevators=1)
+        self.assertTrue(elevator_system.is_quiescent())
+        elevator_system.call_elevator(Passenger(3, 3))
+        self.assertTrue(elevator_system.is_quiescent())
+        elevator_system.call_elevator(Passenger(3, 5))
+        self.assertFalse(elevator_system.is_quiescent())
+
+    def test_hall_calls(self):
+        elevator_system = ElevatorSystem(num_floors=10, num_elevators=1)
+        up = [Passenger(3, 5), Passenger(3, 9)]
+        down = Passenger(3, 1)
+        for passenger in (up[0], down, up[1], Passenger(7, 8), Passenger(6, 6)):
+            elevator_system.call_elevator(passenger)
+        hall_calls = elevator_system.hall_calls
+        self.assertEqual(list(elevator_system.calls[1][3]), up)
+        self.assertEqual(list(elevator_system.calls[-1][3]), [down])
+        self.assertNotIn(6, elevator_system.calls[1])
+        self.assertTrue(hall_calls.has_call(3, 1))
+        self.assertFalse(hall_calls.has_call(7, -1))
+        self.assertEqual(hall_calls.nearest_call(1, 1), 3)
+        self.assertEqual(hall_calls.nearest_call(4, 1), 7)
+        self.assertIsNone(hall_calls.nearest_call(8, 1))
+        self.assertEqual(hall_calls.nearest_call(10, -1), 3)
+        self.assertEqual(hall_calls.nearest_call(3, -1), 3)
+        self.assertIsNone(hall_calls.nearest_call(2, -1))
+
+        hall_calls.remove(up[1])
+        hall_calls.remove(up[0])
+        self.assertFalse(hall_calls.has_call(3, 1))
+        self.assertEqual(hall_calls.nearest_call(1, 1), 7)
+
+    def test_same_floor_call_is_not_active(self):
+        elevator_system = ElevatorSystem(num_floors=5, num_elevators=1)
+        stay, ride = Passenger(3, 3), Passenger(2, 4)
+        elevator_system.call_elevator(stay)
+        elevator_system.call_elevator(ride)
+        self.assertEqual(elevator_system.active_passengers, {ride})
+        elevator_system.run(30)
+        self.assertEqual(elevator_system.active_passengers, set())
+        self.assertEqual(stay.wait_time, 0)
+
+    def test_idle_elevator_takes_first_caller(self):
+        elevator_system = ElevatorSystem(num_floors=5, num_elevators=1)
+        elevator = elevator_system.elevators[0]
+        elevator.current_floor = 3
+        elevator.moving_direction = 0
+        for passenger in (Passenger(3, 1), Passenger(3, 5), Passenger(3, 2)):
+            elevator_system.call_elevator(passenger)
+        self.assertEqual(elevator.check_for_pickups(), 2)
+        self.assertEqual(elevator.moving_direction, -1)
+        self.assertEqual(elevator.destination_floors, {1, 2})
+        self.assertEqual(len(elevator_system.calls[1][3]), 1)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            ElevatorSystem(num_floors=5, num_elevators=1).run(10, engine='warp')
+
+    def test_quiet_steps(self):
+        elevator_system = ElevatorSystem(num_floors=10, num_elevators=1)
+        elevator = elevator_system.elevators[0]
+        elevator.step()
+        # Parked at the lobby and heading to the top floor with nobody waiting
+        self.assertEqual(elevator.current_floor, 2)
+        self.assertEqual(elevator.quiet_steps(), 8)
+        elevator_system.call_elevator(Passenger(start_floor=6, destination_floor=8))
+        self.assertEqual(elevator.quiet_steps(), 4)
+        elevator.advance(4)
+        self.assertEqual(elevator.current_floor, 6)
+        self.assertEqual(elevator.time_in_operation, 5)
+        self.assertEqual(elevator.quiet_steps(), 0)
+
+class TestFleet(unittest.TestCase):
+
+    def make_time_series(self, num_floors, seed):
+        return to_time_series(*generate_call_arrays(num_floors, 1500, 500, seed=seed))
+
+    def test_travel_times(self):
+        self.assertEqual(travel_times(6), (0, 1, 2, 3, 4, 5))
+        self.assertEqual(travel_times(6, speed=2), (0, 1, 1, 2, 2, 3))
+        # Top speed after 4 steps and 4 floors: 2 * sqrt(d / a) below 8 floors, d / v + v / a above
+        times = travel_times(30, speed=2, acceleration=0.5)
+        self.assertEqual(times[:4], (0, 3, 4, 5))
+        self.assertEqual(times[8], 8)
+        self.assertEqual(times[20], 14)
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=30, fleet=Fleet.uniform(2, speed=2, acceleration=0.5))
+        self.assertIs(elevator_system.elevators[0].travel_times, elevator_system.elevators[1].travel_times)
+        self.assertEqual(elevator_system.elevators[0].travel_time(58), 19 + 15)
+
+    def test_default_fleet_matches_default_cars(self):
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=12)
+        elevator_system.run(2000, self.make_time_series(12, seed=1))
+        fleet_system = ElevatorSystem(num_elevators=3, num_floors=12, fleet=Fleet.uniform(3))
+        fleet_system.run(2000, self.make_time_series(12, seed=1), engine='event')
+        self.assertEqual(elevator_system.stats(), fleet_system.stats())
+
+    def test_fast_car_moves_several_floors_per_step(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=10, fleet=Fleet([CarSpec(speed=3)]))
+        elevator = elevator_system.elevators[0]
+        passenger = Passenger(1, 10)
+        elevator_system.call_elevator(passenger)
+        elevator_system.run(31)
+        self.assertEqual((elevator.current_floor, elevator.run_start), (4, 1))
+        elevator_system.run(2)
+        self.assertEqual((elevator.current_floor, elevator.run_start), (10, None))
+        elevator_system.run(1)
+        self.assertEqual(passenger.ride_time, 33)
+
+    def test_car_makes(self):
+        fleet = Fleet([CarSpec(capacity=2, door_time=3, lobby_time=4), CarSpec(served_floors=[1, 2, 3])])
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=6, fleet=fleet)
+        small, local = elevator_system.elevators
+        self.assertEqual((local.bottom, local.top, local.current_floor), (1, 3, 3))
+        passengers = [Passenger(1, 5), Passenger(1, 6), Passenger(1, 4)]
+        for passenger in passengers:
+            elevator_system.call_elevator(passenger)
+        elevator_system.step()
+        self.assertEqual(small.passengers, passengers[:2])
+        self.assertEqual(small.door_timer, 4)
+        elevator_system.run(40)
+        # The local car does not stop at the fourth floor, so the third passenger waits for the small one
+        self.assertEqual(passengers[2].elevator_id, 0)
+        self.assertGreater(passengers[2].board_time, passengers[1].alight_time)
+        self.assertEqual(local.passengers_served, 0)
+
+    def test_served_floors(self):
+        fleet = Fleet([CarSpec(served_floors=[1] + list(range(6, 11))), CarSpec(served_floors=range(1, 6))])
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=10, fleet=fleet)
+        express, local = Passenger(1, 8), Passenger(3, 4)
+        elevator_system.run(200, {0: [express, local]})
+        self.assertEqual((express.elevator_id, local.elevator_id), (0, 1))
+        self.assertIsNotNone(express.alight_time)
+        self.assertIsNotNone(local.alight_time)
+        with self.assertRaises(ValueError):
+            elevator_system.call_elevator(Passenger(3, 8))
+        with self.assertRaises(ValueError):
+            ElevatorSystem(num_elevators=1, num_floors=10, fleet=Fleet([CarSpec(served_floors=[1, 11])]))
+        with self.assertRaises(ValueError):
+            ElevatorSystem(num_elevators=2, num_floors=10, fleet=Fleet(fleet.cars[:1]))
+
+    def test_event_engine_matches_tick_engine(self):
+        fleet = Fleet([CarSpec(speed=3, acceleration=0.5), CarSpec(capacity=16, door_time=3, speed=2),
+                       CarSpec(served_floors=[1] + list(range(20, 41)), speed=4, acceleration=1), CarSpec(speed=0.5)])
+        tick_system = ElevatorSystem(num_elevators=4, num_floors=40, fleet=fleet)
+        tick_system.run(1800, self.make_time_series(40, seed=3))
+        event_system = ElevatorSystem(num_elevators=4, num_floors=40, fleet=fleet)
+        event_system.run(1800, self.make_time_series(40, seed=3), engine='event')
+        self.assertEqual(tick_system.stats(), event_system.stats())
+        for tick_elevator, event_elevator in zip(tick_system.elevators, event_system.elevators):
+            self.assertEqual(tick_elevator.current_floor, event_elevator.current_floor)
+            self.assertEqual(tick_elevator.run_ticks, event_elevator.run_ticks)
+
+class TestLookMotion(unittest.TestCase):
+
+    def test_turns_around_at_last_stop(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=20, fleet=Fleet.uniform(1, motion='look'))
+        elevator = elevator_system.elevators[0]
+        up, down = Passenger(4, 6), Passenger(8, 2)
+        elevator_system.run(200, {0: [down, up]})
+        # Up to the farthest call, taking the caller going up on the way, then back down
+        self.assertLess(up.board_time, down.board_time)
+        self.assertLess(up.alight_time, down.board_time)
+        self.assertEqual(down.board_time, up.alight_time + 2 + 5)
+        self.assertEqual((elevator.current_floor, elevator.moving_direction), (2, 0))
+        self.assertEqual(elevator.quiet_steps(), IDLE_STEPS)
+
+    def test_home_floor(self):
+        fleet = Fleet([CarSpec(motion='look', home_floor=10), CarSpec(motion='look', home_floor=1)])
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=20, dispatcher=CostDispatcher(), fleet=fleet)
+        self.assertEqual([e.current_floor for e in elevator_system.elevators], [10, 1])
+        passenger = Passenger(12, 18)
+        elevator_system.run(100, {0: [passenger]})
+        self.assertEqual(passenger.elevator_id, 0)
+        self.assertEqual(passenger.wait_time, 2)
+        self.assertEqual([e.current_floor for e in elevator_system.elevators], [10, 1])
+        with self.assertRaises(ValueError):
+            ElevatorSystem(num_elevators=1, num_floors=20, fleet=Fleet([CarSpec(motion='look', home_floor=5, served_floors=[1, 9, 10])]),
+                           dispatcher=CostDispatcher())
+        with self.assertRaises(ValueError):
+            ElevatorSystem(num_elevators=1, num_floors=20, fleet=Fleet([CarSpec(motion='look', served_floors=[1, 9, 10])]))
+        with self.assertRaises(ValueError):
+            ElevatorSystem(num_elevators=1, num_floors=20, fleet=Fleet([CarSpec(motion='scan')]))
+
+    def test_event_engine_matches_tick_engine(self):
+        calls = generate_call_arrays(30, 2000, 300, seed=6)
+        for fleet, dispatcher in ((Fleet.uniform(3, motion='look'), None),
+                                  (Fleet.uniform(3, motion='look', speed=2.5, acceleration=0.5), None),
+                                  (Fleet.uniform(4, motion='look', speed=4, acceleration=0.25), None),
+                                  (Fleet.uniform(3, motion='look', home_floor=1), CostDispatcher),
+                                  (Fleet.uniform(3, motion='look', speed=2.5, acceleration=0.5), CostDispatcher)):
+            stats = []
+            for engine in ('tick', 'event'):
+                elevator_system = ElevatorSystem(num_elevators=len(fleet), num_floors=30, fleet=fleet,
+                                                 dispatcher=dispatcher and dispatcher())
+                elevator_system.run(2400, to_time_series(*calls), engine=engine)
+                stats.append(elevator_system.stats())
+            self.assertEqual(stats[0], stats[1])
+
+    def test_shorter_waits_than_sweep(self):
+        calls = generate_call_arrays(20, 3600, 300, seed=3)
+        sweep = ElevatorSystem(num_elevators=3, num_floors=20)
+        sweep.run(4000, to_time_series(*calls))
+        look = ElevatorSystem(num_elevators=3, num_floors=20, fleet=Fleet.uniform(3, motion='look'))
+        look.run(4000, to_time_series(*calls))
+        self.assertLess(look.stats()['average_wait_time'], 0.8 * sweep.stats()['average_wait_time'])
+
+class TestPassengerTable(unittest.TestCase):
+
+    def test_append_grows(self):
+        table = PassengerTable(capacity=2)
+        for i in range(5):
+            self.assertEqual(table.append(1, i + 2), i)
+        self.assertEqual(len(table), 5)
+        self.assertEqual(table.destination_floor[:5].tolist(), [2, 3, 4, 5, 6])
+        self.assertEqual(table.board_time[:5].tolist(), [-1] * 5)
+
+    def test_times_match_passengers(self):
+        elevator_system = ElevatorSystem(num_floors=5, num_elevators=1)
+        passengers = [Passenger(1, 4), Passenger(3, 3), Passenger(5, 1), Passenger(2, 5)]
+        elevator_system.run(50, {0: passengers[:2], 20: passengers[2:]})
+        wait_times, ride_times, total_times = elevator_system.passenger_table.times(elevator_system.current_time)
+        self.assertEqual(wait_times.tolist(), [p.wait_time for p in passengers])
+        self.assertEqual(ride_times.tolist(), [p.ride_time for p in passengers])
+        self.assertEqual(total_times.tolist(), [p.total_time for p in passengers])
+        self.assertEqual(passengers[0].elevator_id, 0)
+        self.assertIsNone(passengers[1].board_time)
+
 class TestPassenger(unittest.TestCase):
 
     def test_init(self):
@@ -134,30 +417,39 @@ class TestPassenger(unittest.TestCase):
         self.assertEqual(p.ride_time, 0)
         self.assertIsNone(p.elevator)
 
-    def test_step(self):
-        p = Passenger(start_floor=1, destination_floor=5)
-        p.step()
+    def test_times(self):
+        elevator_system = ElevatorSystem(num_floors=5, num_elevators=1)
+        elevator_system.elevators[0].current_floor = 3
+        p = Passenger(start_floor=1, destination_floor=2)
+        elevator_system.call_elevator(p)
+        self.assertEqual(p.call_time, 0)
+        elevator_system.step()
         self.assertEqual(p.wait_time, 1)
         self.assertEqual(p.ride_time, 0)
         self.assertIsNone(p.elevator)
+        self.assertIn(p, elevator_system.active_passengers)
 
-        p.elevator = True
-        p.step()
-        self.assertEqual(p.wait_time, 1)
-        self.assertEqual(p.ride_time, 1)
+        elevator_system.step()
+        elevator_system.step()
         self.assertIsNotNone(p.elevator)
-
-        p.elevator = None
-        p.current_floor = p.destination_floor
-        p.step()
-        self.assertEqual(p.wait_time, 1)
+        self.assertEqual(p.board_time, 3)
+        self.assertEqual(p.wait_time, 2)
         self.assertEqual(p.ride_time, 1)
+
+        elevator_system.run(40)
         self.assertIsNone(p.elevator)
+        self.assertEqual(p.current_floor, p.destination_floor)
+        self.assertNotIn(p, elevator_system.active_passengers)
+        self.assertEqual(p.wait_time, 2)
+        self.assertEqual(p.ride_time, p.alight_time - p.board_time)
 
     def test_total_time(self):
         p = Passenger(start_floor=1, destination_floor=5)
-        p.wait_time = 5
-        p.ride_time = 10
+        p.call_time = 0
+        p.board_time = 6
+        p.alight_time = 16
+        self.assertEqual(p.wait_time, 5)
+        self.assertEqual(p.ride_time, 10)
         self.assertEqual(p.total_time, 15)
 
 if __name__ == '__main__':
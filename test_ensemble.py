@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from ensemble import Ensemble, run_ensemble
+from simulator import generate_call_arrays, to_time_series
+
+class TestEnsemble(unittest.TestCase):
+
+    def run_systems(self, num_elevators, num_floors, duration, calls):
+        stats = []
+        for simulation_calls in calls:
+            elevator_system = ElevatorSystem(num_elevators=num_elevators, num_floors=num_floors)
+            elevator_system.run(duration, to_time_series(*simulation_calls))
+            stats.append(elevator_system.stats())
+        return stats
+
+    def test_matches_elevator_system(self):
+        for num_elevators, num_floors, duration, total_calls in ((1, 5, 300, 40), (3, 12, 1500, 900), (6, 20, 1200, 1200)):
+            calls = [generate_call_arrays(num_floors, duration, total_calls, seed) for seed in range(4)]
+            ensemble = Ensemble(num_elevators, num_floors, calls)
+            ensemble.run(duration)
+            self.assertEqual(ensemble.stats(), self.run_systems(num_elevators, num_floors, duration, calls))
+
+    def test_resume_and_state(self):
+        calls = [generate_call_arrays(10, 800, 300, seed, fast=True) for seed in range(3)]
+        ensemble = Ensemble(4, 10, calls)
+        ensemble.run(250)
+        systems = []
+        for simulation_calls in calls:
+            elevator_system = ElevatorSystem(num_elevators=4, num_floors=10)
+            elevator_system.run(250, to_time_series(*simulation_calls))
+            systems.append(elevator_system)
+        self.assertEqual(ensemble.floors.tolist(), [[e.current_floor for e in s.elevators] for s in systems])
+        self.assertEqual(ensemble.loads.tolist(), [[len(e.passengers) for e in s.elevators] for s in systems])
+        waiting = ensemble.waiting()
+        for i, elevator_system in enumerate(systems):
+            for floor, queue in elevator_system.calls[-1].items():
+                self.assertEqual(waiting[i, floor - 1, 1], len(queue))
+        self.assertEqual(ensemble.stats(), [s.stats() for s in systems])
+        ensemble.run(550)
+        self.assertEqual(ensemble.stats(), self.run_systems(4, 10, 800, calls))
+
+    def test_same_floor_calls_and_empty(self):
+        calls = [(np.array([0, 0, 5]), np.array([3, 2, 4]), np.array([3, 5, 1])), (np.zeros(0), np.zeros(0), np.zeros(0))]
+        ensemble = Ensemble(2, 5, calls)
+        ensemble.run(100)
+        self.assertEqual(ensemble.stats(), self.run_systems(2, 5, 100, calls))
+
+    def test_run_ensemble(self):
+        stats = run_ensemble(num_elevators=2, num_floors=8, duration=400, total_calls=100, seeds=[7, 8])
+        self.assertEqual(stats, self.run_systems(2, 8, 400, [generate_call_arrays(8, 400, 100, seed) for seed in (7, 8)]))
+
+if __name__ == '__main__':
+    unittest.main()
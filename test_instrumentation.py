@@ -0,0 +1,71 @@
+import unittest
+
+from elevator import Elevator, ElevatorSystem, Passenger
+from instrumentation import Instrumentation, SampleBuffer
+
+class TestInstrumentation(unittest.TestCase):
+
+    def make_time_series(self):
+        return {t: [Passenger(1 + t % 5, 1 + (2 * t + 1) % 5)] for t in range(0, 60, 3)}
+
+    def test_counts_and_samples(self):
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=5)
+        with Instrumentation(sample_every=10).attach(elevator_system) as instrumentation:
+            elevator_system.run(100, self.make_time_series())
+        report = instrumentation.report()
+        self.assertEqual(report['ElevatorSystem.step']['calls'], 100)
+        self.assertEqual(report['Elevator.step']['calls'], 200)
+        self.assertEqual(report['Elevator.check_for_pickups']['calls'], 200)
+        self.assertGreater(report['Elevator.drop_off_passengers']['calls'], 0)
+        self.assertGreater(report['Elevator.step']['seconds'], 0)
+
+        samples = instrumentation.samples.arrays()
+        self.assertEqual(samples['time'].tolist(), list(range(10, 101, 10)))
+        self.assertEqual(samples['floors'].shape, (10, 2))
+        self.assertTrue(((samples['floors'] >= 1) & (samples['floors'] <= 5)).all())
+        waiting = sum(length * count for lengths in instrumentation.queue_lengths.values() for length, count in lengths.items())
+        self.assertEqual(waiting, samples['waiting'].sum())
+
+    def test_same_results_and_detach(self):
+        plain = ElevatorSystem(num_elevators=2, num_floors=5)
+        plain.run(100, self.make_time_series())
+        instrumented = ElevatorSystem(num_elevators=2, num_floors=5)
+        instrumentation = Instrumentation().attach(instrumented)
+        self.assertFalse(instrumented.fast_forward_enabled)
+        instrumented.run(100, self.make_time_series())
+        instrumentation.detach()
+        self.assertTrue(instrumented.fast_forward_enabled)
+        instrumented.fast_forward_enabled = False
+        Instrumentation().attach(instrumented).detach()
+        self.assertFalse(instrumented.fast_forward_enabled)
+        self.assertEqual(plain.stats(), instrumented.stats())
+        self.assertNotIn('step', instrumented.__dict__)
+        self.assertNotIn('step', instrumented.elevators[0].__dict__)
+        self.assertEqual(instrumented.elevators[0].step.__func__, Elevator.step)
+
+    def test_event_engine_counts(self):
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=5)
+        with Instrumentation().attach(elevator_system) as instrumentation:
+            elevator_system.run(1000, self.make_time_series(), engine='event')
+        report = instrumentation.report()
+        self.assertNotIn('ElevatorSystem.step', report)
+        self.assertLess(report['Elevator.step']['calls'], 2000)
+
+    def test_attach_twice(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=5)
+        instrumentation = Instrumentation().attach(elevator_system)
+        with self.assertRaises(RuntimeError):
+            instrumentation.attach(elevator_system)
+
+    def test_sample_buffer_wraps(self):
+        buffer = SampleBuffer(capacity=3, num_elevators=1)
+        for t in range(5):
+            buffer.append(t, [t], [0], t * 10)
+        self.assertEqual(len(buffer), 3)
+        samples = buffer.arrays()
+        self.assertEqual(samples['time'].tolist(), [2, 3, 4])
+        self.assertEqual(samples['floors'][:, 0].tolist(), [2, 3, 4])
+        self.assertEqual(samples['waiting'].tolist(), [20, 30, 40])
+
+if __name__ == '__main__':
+    unittest.main()
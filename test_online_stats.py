@@ -0,0 +1,111 @@
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from online_stats import OnlineStats, QuantileSketch, RunningStats
+from simulator import generate_call_arrays, to_time_series
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_add_and_merge(self):
+        values = np.random.RandomState(0).lognormal(3, 1, 1000)
+        running = RunningStats()
+        for value in values:
+            running.add(value)
+        self.assertAlmostEqual(running.mean, values.mean())
+        self.assertAlmostEqual(running.variance, values.var(ddof=1), places=6)
+        self.assertEqual(running.min, values.min())
+        self.assertEqual(running.max, values.max())
+
+        first, second = RunningStats(), RunningStats()
+        for value in values[:300]:
+            first.add(value)
+        for value in values[300:]:
+            second.add(value)
+        first.merge(second)
+        first.merge(RunningStats())
+        self.assertEqual(first.count, 1000)
+        self.assertAlmostEqual(first.mean, running.mean)
+        self.assertAlmostEqual(first.variance, running.variance, places=6)
+        self.assertEqual(first.max, running.max)
+
+    def test_empty(self):
+        running = RunningStats()
+        self.assertEqual(running.variance, 0)
+        self.assertIsNone(running.min)
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def test_quantiles_within_accuracy(self):
+        values = np.random.RandomState(1).lognormal(4, 1.2, 20000).round()
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+        for q in (0.0, 0.5, 0.9, 0.99, 0.999, 1.0):
+            exact = np.quantile(values, q, method='lower')
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.01 * exact + 1e-9, q)
+        self.assertLess(len(sketch.buckets), 1000)
+
+    def test_zeros_and_empty(self):
+        sketch = QuantileSketch()
+        self.assertIsNone(sketch.quantile(0.5))
+        for value in (0, 0, 0, 10):
+            sketch.add(value)
+        self.assertEqual(sketch.quantile(0.5), 0)
+        self.assertEqual(sketch.quantile(1), 10)
+        with self.assertRaises(ValueError):
+            sketch.add(-1)
+
+    def test_merge(self):
+        values = np.random.RandomState(2).exponential(50, 5000).round()
+        whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i, value in enumerate(values):
+            whole.add(value)
+            (first if i % 3 else second).add(value)
+        first.merge(second)
+        self.assertEqual(first.buckets, whole.buckets)
+        self.assertEqual(first.quantile(0.99), whole.quantile(0.99))
+        with self.assertRaises(ValueError):
+            first.merge(QuantileSketch(relative_accuracy=0.05))
+
+class TestOnlineStats(unittest.TestCase):
+
+    def test_elevator_system(self):
+        online_stats = OnlineStats()
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=20, online_stats=online_stats)
+        elevator_system.run(2000, to_time_series(*generate_call_arrays(20, 1500, 300, seed=1)), engine='event')
+        # Only the passengers still waiting or riding are kept
+        self.assertEqual(elevator_system.passengers, [])
+        table = elevator_system.passenger_table
+        delivered = table.alight_time[:table.size] >= 0
+        self.assertEqual(len(elevator_system.active_passengers),
+                         np.count_nonzero(~delivered & (table.start_floor[:table.size] != table.destination_floor[:table.size])))
+        wait_times, ride_times, total_times = (times[delivered] for times in table.times(elevator_system.current_time))
+        summary = elevator_system.stats()['delivered']
+        self.assertEqual(summary['wait_time']['count'], len(wait_times))
+        self.assertAlmostEqual(summary['wait_time']['mean'], np.mean(wait_times))
+        self.assertAlmostEqual(summary['total_time']['mean'], np.mean(total_times))
+        self.assertEqual(summary['ride_time']['max'], max(ride_times))
+        p99 = np.quantile(wait_times, 0.99, method='lower')
+        self.assertLessEqual(abs(summary['wait_time']['p99'] - p99), 0.01 * p99 + 1e-9)
+        self.assertEqual(set(summary['wait_time']), {'count', 'mean', 'std', 'min', 'max', 'p50', 'p90', 'p99', 'p99.9'})
+
+    def test_merge_runs(self):
+        merged = OnlineStats()
+        counts = 0
+        for seed in range(3):
+            online_stats = OnlineStats()
+            elevator_system = ElevatorSystem(num_elevators=2, num_floors=10, online_stats=online_stats)
+            elevator_system.run(600, to_time_series(*generate_call_arrays(10, 500, 50, seed=seed)))
+            counts += online_stats.count
+            merged.merge(online_stats)
+        self.assertEqual(merged.count, counts)
+
+    def test_disabled(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=5)
+        elevator_system.run(10)
+        self.assertNotIn('delivered', elevator_system.stats())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem, Fleet
+from planner import SLA, FleetPlanner, allowed_late, plan_fleet, run_until_violation
+from simulator import generate_call_arrays, to_time_series
+
+class TestPlanner(unittest.TestCase):
+
+    def wait_times(self, num_elevators, num_floors, duration, calls, capacity=None):
+        fleet = Fleet.uniform(num_elevators, capacity=capacity) if capacity is not None else None
+        elevator_system = ElevatorSystem(num_elevators=num_elevators, num_floors=num_floors, fleet=fleet)
+        elevator_system.run(duration, to_time_series(*calls))
+        return elevator_system.passenger_table.times(elevator_system.current_time)[0]
+
+    def meets(self, sla, wait_times):
+        return np.count_nonzero(wait_times > sla.max_wait) <= allowed_late(sla, len(wait_times))
+
+    def test_allowed_late(self):
+        self.assertEqual(allowed_late(SLA(30), 100), 5)
+        self.assertEqual(allowed_late(SLA(30), 99), 4)
+        self.assertEqual(allowed_late(SLA(30, 99.5), 1000), 5)
+        self.assertEqual(allowed_late(SLA(30, 100), 1000), 0)
+
+    def test_run_until_violation(self):
+        calls = generate_call_arrays(15, 1200, 200, 3)
+        sla = SLA(40)
+        wait_times = self.wait_times(5, 15, 1200, calls)
+        result = run_until_violation(ElevatorSystem(num_elevators=5, num_floors=15), calls, 1200, sla, chunk=50)
+        self.assertTrue(result['met'])
+        self.assertEqual(result['steps'], 1200)
+        self.assertEqual(result['late'], np.count_nonzero(wait_times > 40))
+        self.assertEqual(result['wait_percentile'], np.percentile(wait_times, 95))
+
+        # Too few cars: the backlog of waiting passengers breaks the SLA well before the end
+        self.assertFalse(self.meets(sla, self.wait_times(1, 15, 1200, calls)))
+        result = run_until_violation(ElevatorSystem(num_elevators=1, num_floors=15), calls, 1200, sla, chunk=50)
+        self.assertFalse(result['met'])
+        self.assertLess(result['steps'], 600)
+        self.assertGreater(result['late'], allowed_late(sla, 200))
+        self.assertIsNone(result['wait_percentile'])
+
+    def test_min_elevators(self):
+        calls = [generate_call_arrays(12, 900, 150, seed) for seed in range(2)]
+        sla = SLA(30, 90)
+        planner = FleetPlanner(12, calls, 900, sla)
+        num_elevators = planner.min_elevators()
+        for n in range(1, 9):
+            expected = all(self.meets(sla, self.wait_times(n, 12, 900, c)) for c in calls)
+            self.assertEqual(expected, n >= num_elevators, n)
+        runs = planner.runs
+        self.assertLess(runs, 8 * len(calls))
+        self.assertEqual(planner.min_elevators(), num_elevators)
+        self.assertEqual(planner.runs, runs)
+
+    def test_plan_capacities(self):
+        plans, planner = plan_fleet(num_floors=10, calls_per_hour=600, max_wait=40, duration=1800,
+                                    capacities=[4, 2, 8], limit=12)
+        self.assertEqual([plan['capacity'] for plan in plans], [2, 4, 8])
+        counts = [plan['num_elevators'] for plan in plans]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        calls = generate_call_arrays(10, 1800, 300, 0)
+        sla = SLA(40)
+        for plan in plans:
+            n, capacity = plan['num_elevators'], plan['capacity']
+            wait_times = self.wait_times(n, 10, 1800, calls, capacity)
+            self.assertTrue(self.meets(sla, wait_times))
+            self.assertEqual(plan['wait_percentile'], [np.percentile(wait_times, 95)])
+            if n > 1:
+                self.assertFalse(self.meets(sla, self.wait_times(n - 1, 10, 1800, calls, capacity)))
+        self.assertLess(planner.steps, 3 * 12 * 1800 / 2)
+
+        # Capacity 6 lies between verdicts already known for capacities 4 and 8
+        runs = planner.runs
+        self.assertIn(planner.min_elevators(capacity=6), (4, 5))
+        self.assertLessEqual(planner.runs, runs + 1)
+        self.assertEqual(plan_fleet(10, 2400, 1, duration=600, limit=2)[0][0]['num_elevators'], None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from recorder import EventRecorder, read_log
+from simulator import generate_call_arrays, to_time_series
+
+class TestEventRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def record(self, name, engine='tick', buffer_size=64):
+        directory = os.path.join(self.directory.name, name)
+        with EventRecorder(directory, buffer_size=buffer_size) as recorder:
+            elevator_system = ElevatorSystem(num_elevators=3, num_floors=12, recorder=recorder)
+            elevator_system.run(1500, to_time_series(*generate_call_arrays(12, 1200, 400, 5)), engine=engine)
+        return elevator_system, directory
+
+    def test_trips_and_stops(self):
+        elevator_system, directory = self.record('tick')
+        self.assertEqual(elevator_system.passengers, [])
+        trips = read_log(directory)
+        self.assertIsInstance(trips['call_time'], np.memmap)
+        table = elevator_system.passenger_table
+        delivered = np.flatnonzero(table.alight_time[:table.size] >= 0)
+        self.assertGreater(len(delivered), 300)
+        self.assertEqual(len(trips['alight_time']), len(delivered))
+        order = np.lexsort((trips['call_time'], trips['start_floor'], trips['destination_floor'], trips['alight_time']))
+        expected = np.lexsort((table.call_time[delivered], table.start_floor[delivered],
+                               table.destination_floor[delivered], table.alight_time[delivered]))
+        for column in ('call_time', 'board_time', 'alight_time', 'elevator_id', 'start_floor', 'destination_floor'):
+            self.assertEqual(trips[column][order].tolist(), getattr(table, column)[delivered][expected].tolist(), column)
+
+        stops = read_log(directory, 'stops', mmap=False)
+        self.assertEqual(np.bincount(stops['elevator_id'], minlength=3).tolist(),
+                         [elevator.stops_made for elevator in elevator_system.elevators])
+        self.assertEqual(int(stops['alighted'].sum()), len(delivered))
+        self.assertTrue(np.all(stops['alighted'] + stops['boarded'] > 0))
+        self.assertTrue(np.all(stops['load'] <= 10))
+        for elevator_id in range(3):
+            self.assertTrue(np.all(np.diff(stops['time'][stops['elevator_id'] == elevator_id]) > 0))
+
+    def test_engines_match(self):
+        _, tick = self.record('tick')
+        _, event = self.record('event', engine='event', buffer_size=1000)
+        for name in ('trips', 'stops'):
+            tick_log, event_log = read_log(tick, name), read_log(event, name)
+            tick_rows = sorted(zip(*(column.tolist() for column in tick_log.values())))
+            event_rows = sorted(zip(*(column.tolist() for column in event_log.values())))
+            self.assertEqual(tick_rows, event_rows, name)
+
+    def test_readable_while_recording(self):
+        directory = os.path.join(self.directory.name, 'live')
+        recorder = EventRecorder(directory, buffer_size=4)
+        self.addCleanup(recorder.close)
+        for i in range(10):
+            recorder.stop(i, 0, i + 1, 1, 0, 0)
+        self.assertEqual(len(recorder.stops), 10)
+        self.assertEqual(read_log(directory, 'stops')['time'].tolist(), list(range(8)))
+        self.assertEqual(len(read_log(directory)['call_time']), 0)
+        recorder.close()
+        self.assertEqual(read_log(directory, 'stops')['floor'].tolist(), list(range(1, 11)))
+
+if __name__ == '__main__':
+    unittest.main()
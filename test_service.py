@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from dispatch import CostDispatcher
+from elevator import CarSpec, ElevatorSystem, Fleet, Passenger
+from service import DispatchService, load_test
+
+class TestDispatchService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'service.sock')
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    async def connect(self, service):
+        await service.start(path=self.path)
+        self.addCleanup(service.close)
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        self.addCleanup(writer.close)
+        return reader, writer
+
+    async def send(self, writer, *messages):
+        writer.write(''.join(json.dumps(message) + '\n' for message in messages).encode())
+        await writer.drain()
+
+    async def receive(self, reader, count):
+        return [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in range(count)]
+
+    async def test_batches_calls_like_time_series(self):
+        trips = [(1, 5), (3, 1), (4, 4), (2, 6)]
+        offline = ElevatorSystem(num_elevators=2, num_floors=6)
+        passengers = [Passenger(*trip) for trip in trips]
+        offline.run(60, {0: passengers})
+
+        service = DispatchService(ElevatorSystem(num_elevators=2, num_floors=6))
+        reader, writer = await self.connect(service)
+        await self.send(writer, *({'id': i, 'start_floor': s, 'destination_floor': d} for i, (s, d) in enumerate(trips)))
+        self.assertEqual(await self.receive(reader, 4), [{'id': i, 'queued': 0} for i in range(4)])
+        for _ in range(60):
+            service.advance()
+        messages = await self.receive(reader, 7)
+        boarded = {m['id']: (m['boarded'], m['tick']) for m in messages if 'boarded' in m}
+        arrived = {m['id']: m['arrived'] for m in messages if 'arrived' in m}
+        self.assertEqual(boarded, {i: (p.elevator_id, p.board_time) for i, p in enumerate(passengers) if i != 2})
+        self.assertEqual(arrived, {i: p.alight_time if i != 2 else 0 for i, p in enumerate(passengers)})
+        self.assertEqual(service.elevator_system.stats(), offline.stats())
+        self.assertEqual(service.stats()['calls'], 4)
+
+    async def test_errors(self):
+        fleet = Fleet([CarSpec(served_floors=range(1, 4)), CarSpec(served_floors=[1, 4, 5])])
+        service = DispatchService(ElevatorSystem(num_elevators=2, num_floors=5, fleet=fleet))
+        reader, writer = await self.connect(service)
+        writer.write(b'not json\n')
+        await self.send(writer, {'id': 1, 'start_floor': 0, 'destination_floor': 3},
+                        {'id': 2, 'start_floor': 2, 'destination_floor': '4'}, {'id': 3, 'start_floor': 2, 'destination_floor': 4})
+        messages = await self.receive(reader, 4)
+        self.assertIsNone(messages[0]['id'])
+        self.assertEqual([m['id'] for m in messages], [None, 1, 2, 3])
+        self.assertTrue(all('error' in m for m in messages[:3]))
+        service.advance()
+        message, = await self.receive(reader, 1)
+        self.assertEqual(message['id'], 3)
+        self.assertIn('No elevator', message['error'])
+
+    async def test_assignments_and_positions(self):
+        service = DispatchService(ElevatorSystem(num_elevators=2, num_floors=10, dispatcher=CostDispatcher()))
+        reader, writer = await self.connect(service)
+        await self.send(writer, {'subscribe': True}, {'id': 'a', 'start_floor': 9, 'destination_floor': 2})
+        await self.receive(reader, 1)
+        service.advance()
+        assigned, positions = await self.receive(reader, 2)
+        self.assertEqual(assigned, {'id': 'a', 'assigned': 1, 'tick': 0})
+        self.assertEqual(positions, {'tick': 1, 'cars': [[2, 1, 0, False], [9, -1, 0, False]]})
+
+    async def test_backpressure(self):
+        service = DispatchService(ElevatorSystem(num_elevators=1, num_floors=5), max_pending=2)
+        reader, writer = await self.connect(service)
+        await self.send(writer, *({'id': i, 'start_floor': 1, 'destination_floor': 5} for i in range(5)))
+        self.assertEqual([m['id'] for m in await self.receive(reader, 2)], [0, 1])
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(reader.readline(), 0.05)
+        self.assertEqual(service.stats()['pending'], 2)
+        service.advance()
+        messages = await self.receive(reader, 4)
+        self.assertEqual([m['id'] for m in messages if 'boarded' in m], [0, 1])
+        self.assertEqual([m['id'] for m in messages if 'queued' in m], [2, 3])
+
+    async def test_timer_and_load_test(self):
+        service = DispatchService(ElevatorSystem(num_elevators=2, num_floors=8), tick_seconds=1.0, speed=1000)
+        server = await service.start(port=0)
+        self.addCleanup(service.close)
+        running = asyncio.ensure_future(service.run())
+        try:
+            stats = await load_test(20, 3, 8, port=server.sockets[0].getsockname()[1], rate=2000, timeout=20)
+        finally:
+            running.cancel()
+        self.assertEqual((stats['calls'], stats['queued'], stats['arrived'], stats['errors']), (60, 60, 60, 0))
+        self.assertGreater(service.ticks, 0)
+        self.assertEqual(service.stats()['calls'], 60)
+
+        service = DispatchService(ElevatorSystem(num_elevators=1, num_floors=5), tick_seconds=0.001)
+        await service.run(5)
+        self.assertEqual(service.elevator_system.current_time, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from shards import Building, Shard, TransferQueue, Zone, route_calls, run_sharded, sky_lobby_building
+from simulator import generate_call_arrays, to_time_series
+
+class TestBuilding(unittest.TestCase):
+
+    def test_route(self):
+        building = sky_lobby_building(num_floors=30, num_elevators=7, num_zones=3)
+        self.assertEqual([zone.name for zone in building.zones], ['zone 0', 'zone 1', 'shuttle 1', 'zone 2', 'shuttle 2'])
+        self.assertEqual(building.transfer_floors, [1, 11, 21])
+        self.assertEqual(sum(zone.num_elevators for zone in building.zones), 7)
+        self.assertEqual(building.route(3, 8), [(0, 3, 8)])
+        self.assertEqual(building.route(1, 25), [(4, 1, 21), (3, 21, 25)])
+        self.assertEqual(building.route(25, 5), [(3, 25, 21), (4, 21, 1), (0, 1, 5)])
+        self.assertEqual(building.route(11, 1), [(2, 11, 1)])
+        self.assertIn((1, 2), building.links())
+        self.assertNotIn((1, 3), building.links())
+
+    def test_uneven_split(self):
+        building = sky_lobby_building(num_floors=30, num_elevators=8, num_zones=3)
+        self.assertEqual([zone.num_elevators for zone in building.zones], [3, 1, 1, 2, 1])
+        # An upper zone left with a single elevator would have no local one
+        for num_floors, num_elevators, num_zones in ((40, 3, 2), (30, 5, 3), (40, 7, 4)):
+            with self.assertRaises(ValueError):
+                sky_lobby_building(num_floors, num_elevators, num_zones)
+
+    def test_unreachable(self):
+        building = Building([Zone('low', 1, 10, 1), Zone('high', 11, 20, 1)], [1])
+        with self.assertRaises(ValueError):
+            building.route(2, 15)
+
+    def test_route_calls(self):
+        building = Building([Zone('low', 1, 10, 1), Zone('high', 10, 20, 1)], [10])
+        legs = route_calls(building, np.array([1, 12, 3]), np.array([15, 20, 4]))
+        self.assertEqual(legs.trip.tolist(), [0, 0, 1, 2])
+        self.assertEqual(legs.zone.tolist(), [0, 1, 1, 0])
+        self.assertEqual(legs.start_floor.tolist(), [1, 10, 12, 3])
+        self.assertEqual(legs.destination_floor.tolist(), [10, 15, 20, 4])
+        self.assertEqual(legs.next_leg.tolist(), [1, -1, -1, -1])
+
+class TestTransferQueue(unittest.TestCase):
+
+    def test_put_get(self):
+        queue = TransferQueue(capacity=3)
+        try:
+            queue.put(5, 1)
+            queue.put(6, 2)
+            self.assertEqual(queue.get(), [[5, 1], [6, 2]])
+            for i in range(3):
+                queue.put(7 + i, i)
+            with self.assertRaises(RuntimeError):
+                queue.put(10, 9)
+            self.assertEqual(queue.get(), [[7, 0], [8, 1], [9, 2]])
+            self.assertEqual(queue.get(), [])
+        finally:
+            queue.close()
+            queue.unlink()
+
+class TestRunSharded(unittest.TestCase):
+
+    def test_single_zone_matches_elevator_system(self):
+        calls = generate_call_arrays(10, 1000, 300, seed=2)
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=10)
+        elevator_system.run(1200, to_time_series(*calls))
+        building = Building([Zone('all', 1, 10, 2)], [1])
+        stats = run_sharded(building, calls, 1200, processes=False)
+        self.assertEqual(stats['zones']['all'], elevator_system.stats())
+        delivered = [p for p in elevator_system.passengers if p.alight_time is not None]
+        self.assertEqual(stats['completed'], len(delivered))
+        self.assertAlmostEqual(stats['average_wait_time'], np.mean([p.wait_time for p in delivered]))
+        self.assertAlmostEqual(stats['average_total_time'], np.mean([p.total_time for p in delivered]))
+
+    def test_transfers(self):
+        building = Building([Zone('low', 1, 10, 1), Zone('high', 10, 20, 1)], [10])
+        calls = (np.array([0]), np.array([1]), np.array([15]))
+        legs = route_calls(building, calls[1], calls[2])
+        queues = {link: TransferQueue() for link in building.links()}
+        try:
+            shards = [Shard(i, building, legs, calls[0], queues, transfer_time=7) for i in range(2)]
+            for start in range(0, 140, 7):
+                for shard in shards:
+                    shard.run_window(start, 7)
+            low, high = (shard.result() for shard in shards)
+        finally:
+            for queue in queues.values():
+                queue.close()
+                queue.unlink()
+        self.assertEqual(low['legs'].tolist(), [0])
+        self.assertEqual(high['legs'].tolist(), [1])
+        self.assertEqual(high['call_time'][0], low['alight_time'][0] + 7)
+        self.assertGreater(high['alight_time'][0], high['board_time'][0])
+
+    def test_processes_match_serial(self):
+        building = sky_lobby_building(num_floors=40, num_elevators=7, num_zones=2)
+        calls = generate_call_arrays(40, 600, 200, seed=5, fast=True)
+        serial = run_sharded(building, calls, 700, processes=False)
+        parallel = run_sharded(building, calls, 700)
+        self.assertEqual(serial, parallel)
+        self.assertGreater(serial['legs'], serial['trips'])
+        self.assertGreater(serial['completed'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
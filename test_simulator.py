@@ -1,6 +1,10 @@
 import numpy as np
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from elevator import ElevatorSystem
 from simulator import generate_lognormal_passenger_counts, generate_random_calls, generate_uniform_calls_with_lognormal_passengers, Passenger
+from simulator import generate_call_arrays, generate_random_call_arrays, generate_uniform_call_arrays, to_time_series
+from simulator import simulate_elevator_calls, spawn_streams
 
 class TestElevator(unittest.TestCase):
 
@@ -75,5 +79,75 @@ class TestElevator(unittest.TestCase):
             self.assertIn(passengers[0].start_floor, range(1, 6))
             self.assertIn(passengers[0].destination_floor, range(1, 6))
 
+    def test_generate_random_call_arrays(self):
+        for rng in (None, np.random.default_rng(1)):
+            times, start_floors, destination_floors = generate_random_call_arrays(num_floors=5, duration=100, total_calls=50, rng=rng)
+            self.assertTrue((np.diff(times) >= 0).all())
+            self.assertTrue(((times >= 0) & (times < 100)).all())
+            self.assertTrue((start_floors == 1).all())
+            self.assertTrue(((destination_floors >= 2) & (destination_floors <= 5)).all())
+            self.assertTrue(50 <= len(times) <= 250)
+
+    def test_generate_uniform_call_arrays(self):
+        passenger_counts = [2] * 10
+        for rng in (None, np.random.default_rng(1)):
+            times, start_floors, destination_floors = generate_uniform_call_arrays(num_floors=5, duration=10, total_calls=10,
+                                                                                   passenger_counts=passenger_counts, rng=rng)
+            self.assertEqual(len(times), 20)
+            self.assertTrue((np.diff(times) >= 0).all())
+            self.assertTrue(((start_floors >= 2) & (start_floors <= 5)).all())
+            self.assertTrue(((destination_floors >= 1) & (destination_floors <= 5)).all())
+        self.assertEqual(passenger_counts, [2] * 10)
+
+    def test_generate_call_arrays(self):
+        # The default draws are reproducible from the seed, as are the fast ones
+        for fast in (False, True):
+            first = generate_call_arrays(num_floors=10, duration=500, total_calls=100, seed=3, fast=fast)
+            second = generate_call_arrays(num_floors=10, duration=500, total_calls=100, seed=3, fast=fast)
+            for a, b in zip(first, second):
+                self.assertTrue((a == b).all())
+
+        # The default draws are the same as drawing from the seeded global random state
+        times, start_floors, destination_floors = generate_call_arrays(num_floors=10, duration=500, total_calls=100, seed=3)
+        np.random.seed(3)
+        lobby_calls = np.random.randint(0, 50)
+        lobby = generate_random_calls(10, 500, lobby_calls)
+        passenger_counts = generate_lognormal_passenger_counts(100 - lobby_calls).tolist()
+        lobby.update(generate_uniform_calls_with_lognormal_passengers(10, 500, 100 - lobby_calls, passenger_counts))
+        self.assertEqual(len(times), sum(len(p) for p in lobby.values()))
+        for call_time, passengers in to_time_series(times, start_floors, destination_floors).items():
+            self.assertEqual([(p.start_floor, p.destination_floor) for p in passengers],
+                             [(p.start_floor, p.destination_floor) for p in lobby[call_time]])
+
+    def test_global_random_state_untouched(self):
+        np.random.seed(0)
+        expected = np.random.randint(0, 1000, 5)
+        np.random.seed(0)
+        generate_call_arrays(num_floors=10, duration=500, total_calls=100, seed=3)
+        generate_call_arrays(num_floors=10, duration=500, total_calls=100, seed=3, fast=True)
+        self.assertTrue((np.random.randint(0, 1000, 5) == expected).all())
+
+    def test_spawn_streams(self):
+        streams = spawn_streams(7)
+        self.assertEqual(sorted(streams), ['counts', 'floors', 'lobby'])
+        again = spawn_streams(np.random.SeedSequence(7))
+        for name in streams:
+            self.assertEqual(streams[name].integers(0, 10**9), again[name].integers(0, 10**9))
+        # Drawing more from one stream leaves the others as they were
+        streams, again = spawn_streams(7), spawn_streams(7)
+        streams['counts'].random(100)
+        self.assertEqual(streams['lobby'].integers(0, 10**9), again['lobby'].integers(0, 10**9))
+
+    def test_concurrent_simulations(self):
+        def simulate(seed, fast):
+            elevator_system = ElevatorSystem(num_elevators=2, num_floors=10)
+            simulate_elevator_calls(elevator_system, duration=300, total_calls=50, seed=seed, fast=fast)
+            return elevator_system.stats()
+
+        runs = [(seed, fast) for seed in range(4) for fast in (False, True)]
+        expected = [simulate(seed, fast) for seed, fast in runs]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertEqual(list(executor.map(lambda run: simulate(*run), runs)), expected)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,124 @@
+import gc
+import unittest
+
+import numpy as np
+
+from dispatch import CostDispatcher
+from elevator import CarSpec, ElevatorSystem, Fleet, Passenger
+from online_stats import OnlineStats
+from simulator import generate_call_arrays, to_time_series
+from snapshot import fork, restore_snapshot, take_snapshot
+
+class TestSnapshot(unittest.TestCase):
+
+    def make_calls(self, seed=3):
+        return generate_call_arrays(12, 2000, 800, seed=seed)
+
+    def split(self, calls, at):
+        """
+        Split a run's calls into the time series before and after a given time.
+        """
+        time_series = to_time_series(*calls)
+        return ({t: p for t, p in time_series.items() if t < at},
+                {t - at: p for t, p in time_series.items() if t >= at})
+
+    def test_restore_continues_like_uninterrupted_run(self):
+        for engine in ('tick', 'event'):
+            continuous = ElevatorSystem(num_elevators=3, num_floors=12)
+            continuous.run(2500, to_time_series(*self.make_calls()), engine=engine)
+
+            before, after = self.split(self.make_calls(), 1000)
+            elevator_system = ElevatorSystem(num_elevators=3, num_floors=12)
+            elevator_system.run(1000, before, engine=engine)
+            self.assertTrue(elevator_system.active_passengers)
+            restored, rng = restore_snapshot(take_snapshot(elevator_system))
+            self.assertIsNone(rng)
+            self.assertEqual(restored.stats(), elevator_system.stats())
+            self.assertEqual({p.index for p in restored.active_passengers},
+                             {p.index for p in elevator_system.active_passengers})
+            restored.run(1500, after, engine=engine)
+            self.assertEqual(restored.stats(), continuous.stats())
+            self.assertEqual(restored.passenger_table.size, continuous.passenger_table.size)
+
+    def test_fork_is_independent(self):
+        before, after = self.split(self.make_calls(), 1000)
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=12)
+        elevator_system.run(1000, before)
+        elevator_system.warmup = 300
+        stats = elevator_system.stats()
+        forked, _ = fork(elevator_system)
+        self.assertEqual(forked.warmup, 300)
+        forked.run(1500, after)
+        self.assertEqual(elevator_system.stats(), stats)
+        self.assertEqual(elevator_system.current_time, 1000)
+        self.assertEqual(forked.current_time, 2500)
+
+    def test_dispatcher_and_online_stats(self):
+        calls = self.make_calls(seed=4)
+        continuous = ElevatorSystem(num_elevators=3, num_floors=12, dispatcher=CostDispatcher(),
+                                    online_stats=OnlineStats())
+        continuous.run(2500, to_time_series(*calls))
+
+        before, after = self.split(calls, 800)
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=12, dispatcher=CostDispatcher(),
+                                         online_stats=OnlineStats())
+        elevator_system.run(800, before)
+        data = take_snapshot(elevator_system)
+        with self.assertRaises(ValueError):
+            restore_snapshot(data)
+        restored, _ = restore_snapshot(data, dispatcher=CostDispatcher())
+        self.assertEqual(restored.passengers, [])
+        self.assertEqual(restored.online_stats.summary(), elevator_system.online_stats.summary())
+        restored.run(1700, after)
+        self.assertEqual(restored.stats(), continuous.stats())
+
+    def test_fleet(self):
+        fleet = Fleet([CarSpec(speed=3, acceleration=0.5), CarSpec(capacity=4, served_floors=range(1, 8)), CarSpec()])
+        continuous = ElevatorSystem(num_elevators=3, num_floors=12, fleet=fleet)
+        continuous.run(2500, to_time_series(*self.make_calls()))
+
+        before, after = self.split(self.make_calls(), 1002)
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=12, fleet=fleet)
+        elevator_system.run(1002, before)
+        restored, _ = restore_snapshot(take_snapshot(elevator_system))
+        self.assertEqual([spec._replace(served_floors=None) for spec in restored.fleet.cars],
+                         [spec._replace(served_floors=None) for spec in fleet.cars])
+        self.assertEqual(restored.elevators[1].served_floors, frozenset(range(1, 8)))
+        self.assertEqual(restored.elevators[1].capacity, 4)
+        self.assertEqual(restored.elevators[0].run_start, 11)
+        restored.run(1498, after)
+        self.assertEqual(restored.stats(), continuous.stats())
+
+    def test_rng_state(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=5)
+        for rng in (np.random.default_rng(5), np.random.RandomState(5)):
+            rng.random(7)
+            _, restored = restore_snapshot(take_snapshot(elevator_system, rng))
+            self.assertIsInstance(restored, type(rng))
+            self.assertEqual(restored.random(3).tolist(), rng.random(3).tolist())
+
+    def test_unsupported_version(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=5)
+        data = take_snapshot(elevator_system)
+        with self.assertRaises(ValueError):
+            restore_snapshot(data[:8] + b'\x09\x00' + data[10:])
+        with self.assertRaises(ValueError):
+            restore_snapshot(data[10:])
+
+    def test_restore_creates_only_passengers_in_flight(self):
+        before, _ = self.split(self.make_calls(), 2000)
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=12)
+        elevator_system.run(2000, before)
+        data = take_snapshot(elevator_system)
+        gc.collect()
+        count = sum(type(o) is Passenger for o in gc.get_objects())
+        restored, _ = restore_snapshot(data)
+        created = sum(type(o) is Passenger for o in gc.get_objects()) - count
+        self.assertEqual(created, len(elevator_system.active_passengers))
+        self.assertLess(created, elevator_system.passenger_table.size // 3)
+        self.assertEqual(sorted(p.index for p in restored.passengers),
+                         sorted(p.index for p in elevator_system.active_passengers))
+        self.assertEqual(restored.passenger_table.size, elevator_system.passenger_table.size)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import math
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from simulator import generate_call_arrays, simulate_elevator_calls, to_time_series
+from steady_state import batch_correlation, batch_means, mser, run_until_converged, settled_wait_times
+
+class TestSteadyState(unittest.TestCase):
+
+    def test_mser(self):
+        rng = np.random.default_rng(1)
+        transient = 60 * np.exp(-np.arange(300) / 60)
+        values = np.concatenate([transient, np.zeros(2700)]) + rng.normal(20, 3, 3000)
+        self.assertTrue(200 <= mser(values) <= 400, mser(values))
+        self.assertLess(mser(rng.normal(20, 3, 3000)), 300)
+        self.assertEqual(mser([5, 1, 2]), 0)
+
+    def test_batch_means(self):
+        rng = np.random.default_rng(2)
+        values = rng.normal(10, 1, 10000)
+        mean, half_width = batch_means(values)
+        self.assertAlmostEqual(mean, values.mean())
+        self.assertTrue(0.6 * 1.96 / 100 < half_width < 1.5 * 1.96 / 100, half_width)
+        self.assertEqual(batch_means(values[:10]), (values[:10].mean(), math.inf))
+        # Leftover values are dropped from the start
+        self.assertEqual(batch_means(np.arange(41), num_batches=4)[0], np.arange(1, 41).mean())
+
+    def test_batch_correlation(self):
+        rng = np.random.default_rng(3)
+        self.assertLess(abs(batch_correlation(rng.normal(0, 1, 8000))), 0.4)
+        # An AR(1) series correlated over about a hundred values, in batches of 20
+        noise = rng.normal(0, 1, 8000)
+        values = np.empty(8000)
+        values[0] = 0
+        for i in range(1, 8000):
+            values[i] = 0.99 * values[i - 1] + noise[i]
+        self.assertGreater(batch_correlation(values, 400), 0.5)
+        self.assertEqual(batch_correlation([1.0] * 10), 1.0)
+
+    def test_stats_warmup(self):
+        elevator_system = ElevatorSystem(num_elevators=3, num_floors=12)
+        elevator_system.run(1200, to_time_series(*generate_call_arrays(12, 1000, 300, 4)))
+        table = elevator_system.passenger_table
+        wait_times = table.times(elevator_system.current_time)[0]
+        kept = table.call_time[:table.size] >= 200
+        stats = elevator_system.stats(warmup=200)
+        self.assertEqual(stats['average_wait_time'], wait_times[kept].mean())
+        self.assertEqual(stats['max_wait_time'], wait_times[kept].max())
+        self.assertEqual(stats['elevators'], elevator_system.stats()['elevators'])
+        self.assertEqual(elevator_system.stats(warmup=0), elevator_system.stats())
+        elevator_system.warmup = 200
+        self.assertEqual(elevator_system.stats(), stats)
+
+    def test_settled_wait_times(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=10)
+        elevator_system.run(300, to_time_series(*generate_call_arrays(10, 300, 200, 5)))
+        wait_times, call_times = settled_wait_times(elevator_system)
+        table = elevator_system.passenger_table
+        settled = len(wait_times)
+        self.assertLess(settled, table.size)
+        self.assertLess(table.board_time[settled], 0)
+        self.assertTrue(np.all((table.board_time[:settled] >= 0)
+                               | (table.start_floor[:settled] == table.destination_floor[:settled])))
+        self.assertEqual(call_times.tolist(), table.call_time[:settled].tolist())
+
+    def test_run_until_converged(self):
+        duration = 6 * 3600
+        calls = generate_call_arrays(20, duration, duration // 6, 0)
+        full = ElevatorSystem(num_elevators=4, num_floors=20)
+        full.run(duration, to_time_series(*calls), engine='event')
+        elevator_system = ElevatorSystem(num_elevators=4, num_floors=20)
+        result = run_until_converged(elevator_system, to_time_series(*calls), duration, 0.15, relative=True)
+        self.assertTrue(result['converged'])
+        self.assertLess(result['steps'], duration)
+        self.assertEqual(elevator_system.current_time, result['steps'])
+        self.assertLessEqual(result['half_width'], 0.15 * result['mean_wait_time'])
+        self.assertLess(abs(result['mean_wait_time'] - full.stats()['average_wait_time']), result['half_width'])
+        self.assertGreaterEqual(result['passengers'], 1000)
+        self.assertGreater(result['warmup'], 0)
+        self.assertEqual(elevator_system.warmup, result['warmup'])
+        self.assertEqual(elevator_system.stats(), elevator_system.stats(warmup=result['warmup']))
+
+        # Too tight to converge: runs for the whole duration
+        elevator_system = ElevatorSystem(num_elevators=4, num_floors=20)
+        result = simulate_elevator_calls(elevator_system, duration, duration // 6, 0, engine='event', epsilon=0.5)
+        self.assertFalse(result['converged'])
+        self.assertEqual(result['steps'], duration)
+        self.assertEqual(elevator_system.warmup, result['warmup'])
+        self.assertEqual(elevator_system.stats(warmup=0), full.stats())
+        self.assertIsNone(simulate_elevator_calls(ElevatorSystem(num_elevators=1, num_floors=5), 100, 10, 0))
+
+if __name__ == '__main__':
+    unittest.main()
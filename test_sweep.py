@@ -0,0 +1,52 @@
+import csv
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from simulator import simulate_elevator_calls
+from sweep import Config, make_configs, run_config, summarize, sweep, write_results
+
+class TestSweep(unittest.TestCase):
+
+    def test_run_config(self):
+        result = run_config(Config(2, 10, 500, 50, 4))
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=10)
+        simulate_elevator_calls(elevator_system, duration=500, total_calls=50, seed=4)
+        stats = elevator_system.stats()
+        self.assertEqual(result['seed'], 4)
+        self.assertEqual(result['average_wait_time'], stats['average_wait_time'])
+        self.assertEqual(result['max_wait_time'], stats['max_wait_time'])
+        self.assertEqual(result['passengers'], len(elevator_system.passengers))
+
+    def test_sweep_is_deterministic(self):
+        configs = make_configs([1, 2], [8], [300], [30], range(3))
+        self.assertEqual(len(configs), 6)
+        self.assertEqual(sweep(configs, max_workers=2), sweep(configs, max_workers=1))
+
+    def test_summarize(self):
+        results = [dict(Config(1, 5, 10, 10, seed)._asdict(), passengers=10, average_wait_time=wait, average_ride_time=1,
+                        average_total_time=wait + 1, max_wait_time=wait, min_wait_time=0) for seed, wait in enumerate([1, 2, 3])]
+        summary, = summarize(results)
+        self.assertEqual(summary['runs'], 3)
+        self.assertNotIn('seed', summary)
+        self.assertAlmostEqual(summary['average_wait_time'], 2)
+        self.assertAlmostEqual(summary['average_wait_time_ci'], 1.959964 / np.sqrt(3), places=5)
+        self.assertEqual(summary['average_ride_time_ci'], 0)
+
+    def test_write_results(self):
+        rows = [{'seed': 0, 'average_wait_time': 1.5}, {'seed': 1, 'average_wait_time': 2.5}]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.csv')
+            write_results(path, rows)
+            with open(path) as f:
+                self.assertEqual([row['average_wait_time'] for row in csv.DictReader(f)], ['1.5', '2.5'])
+            path = os.path.join(directory, 'results.npz')
+            write_results(path, rows)
+            with np.load(path) as columns:
+                self.assertEqual(columns['seed'].tolist(), [0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from simulator import generate_call_arrays, to_time_series
+from traces import read_binary, read_jsonl, read_trace, replay, write_trace
+
+class TestTraces(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = generate_call_arrays(num_floors=10, duration=600, total_calls=80, seed=5)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        expected = list(zip(*(column.tolist() for column in self.calls)))
+        for name in ('trace.jsonl', 'trace.npy', 'run.trace'):
+            path = os.path.join(self.directory.name, name)
+            write_trace(path, *self.calls)
+            self.assertEqual(list(read_trace(path)), expected)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['run.trace', 'trace.jsonl', 'trace.npy'])
+        path = os.path.join(self.directory.name, 'trace.npy')
+        self.assertEqual(list(read_binary(path, chunk_size=7, mmap=False)), expected)
+        self.assertEqual(list(read_jsonl(os.path.join(self.directory.name, 'trace.jsonl'))), expected)
+
+    def test_replay_matches_run(self):
+        expected = ElevatorSystem(num_elevators=2, num_floors=10)
+        expected.run(700, to_time_series(*self.calls))
+        path = os.path.join(self.directory.name, 'trace.npy')
+        write_trace(path, *self.calls)
+        for engine in ('tick', 'event'):
+            elevator_system = ElevatorSystem(num_elevators=2, num_floors=10)
+            replay(elevator_system, read_trace(path), duration=700, engine=engine)
+            self.assertEqual(elevator_system.current_time, 700)
+            self.assertEqual(elevator_system.stats(), expected.stats())
+
+    def test_replay_stops_at_duration(self):
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=5)
+        replay(elevator_system, [(0, 1, 3), (5, 2, 1), (50, 1, 2)], duration=20)
+        self.assertEqual(elevator_system.current_time, 20)
+        self.assertEqual(len(elevator_system.passengers), 2)
+        elevator_system = ElevatorSystem(num_elevators=1, num_floors=5)
+        replay(elevator_system, [(0, 1, 3), (5, 2, 1)])
+        self.assertEqual(elevator_system.current_time, 6)
+
+    def test_replay_unsorted(self):
+        with self.assertRaises(ValueError):
+            replay(ElevatorSystem(num_elevators=1, num_floors=5), [(5, 1, 3), (2, 2, 1)])
+
+    def test_read_binary_rejects_other_arrays(self):
+        path = os.path.join(self.directory.name, 'other.npy')
+        np.save(path, np.arange(3))
+        with self.assertRaises(ValueError):
+            list(read_binary(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import time
+import unittest
+
+import numpy as np
+
+from elevator import ElevatorSystem
+from traffic import HOUR, TrafficComponent, TrafficProfile, office_day, od_matrix, simulate_traffic, triangle
+
+class TestTrafficComponent(unittest.TestCase):
+
+    def test_rate_and_expected_calls(self):
+        component = TrafficComponent(*triangle(100, 200, 400, 300), od_matrix(3, [1], [2, 3]))
+        self.assertEqual(component.expected_calls(), 300)
+        self.assertEqual(component.rate([50, 100, 200, 300, 500]).tolist(), [0, 0, 2, 1, 0])
+
+    def test_sample_follows_rate_and_od(self):
+        component = TrafficComponent(*triangle(0, 1000, 2000, 20000), od_matrix(5, [1], [3, 5]))
+        times, start_floors, destination_floors = component.sample(np.random.default_rng(0))
+        self.assertLess(abs(len(times) - 20000), 4 * np.sqrt(20000))
+        self.assertTrue(((times >= 0) & (times < 2000)).all())
+        # A quarter of the passengers arrive during the first quarter of a symmetric triangle
+        self.assertAlmostEqual(np.mean(times < 1000), 0.5, delta=0.02)
+        self.assertAlmostEqual(np.mean(times < 500), 0.125, delta=0.02)
+        self.assertEqual(set(start_floors.tolist()), {1})
+        self.assertEqual(set(destination_floors.tolist()), {3, 5})
+        self.assertAlmostEqual(np.mean(destination_floors == 3), 0.5, delta=0.02)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            TrafficComponent((0, 10), (1, -1), np.ones((2, 2)))
+        with self.assertRaises(ValueError):
+            TrafficComponent((10, 0), (1, 1), np.ones((2, 2)))
+        with self.assertRaises(ValueError):
+            TrafficComponent((0, 10), (1, 1), np.ones((2, 3)))
+        with self.assertRaises(ValueError):
+            TrafficProfile([TrafficComponent((0, 10), (1, 1), np.ones((2, 2))),
+                            TrafficComponent((0, 10), (1, 1), np.ones((3, 3)))])
+
+class TestTrafficProfile(unittest.TestCase):
+
+    def test_office_day(self):
+        profile = office_day(num_floors=100, population=20000)
+        start = time.perf_counter()
+        times, start_floors, destination_floors = profile.generate_call_arrays(seed=1)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertLess(abs(len(times) - profile.expected_calls()), 4 * np.sqrt(profile.expected_calls()))
+        self.assertTrue((np.diff(times) >= 0).all())
+        self.assertFalse((start_floors == destination_floors).any())
+        morning = (times >= 7 * HOUR) & (times < 8 * HOUR)
+        evening = times >= 18 * HOUR
+        self.assertGreater(np.mean(start_floors[morning] == 1), 0.95)
+        self.assertGreater(np.mean(destination_floors[evening] == 1), 0.95)
+
+    def test_reproducible(self):
+        profile = office_day(num_floors=10, population=500)
+        first, second = profile.generate_call_arrays(seed=3), profile.generate_call_arrays(seed=3)
+        for a, b in zip(first, second):
+            self.assertEqual(a.tolist(), b.tolist())
+        self.assertNotEqual(first[0].tolist(), profile.generate_call_arrays(seed=4)[0].tolist())
+
+    def test_simulate_traffic(self):
+        elevator_system = ElevatorSystem(num_elevators=2, num_floors=8)
+        profile = TrafficProfile([TrafficComponent(*triangle(0, 300, 600, 100), od_matrix(8, [1], range(2, 9)))])
+        simulate_traffic(elevator_system, profile, seed=0, engine='event')
+        self.assertEqual(elevator_system.current_time, 600)
+        self.assertGreater(len(elevator_system.passengers), 50)
+        with self.assertRaises(ValueError):
+            simulate_traffic(ElevatorSystem(num_elevators=1, num_floors=5), profile, seed=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import argparse
+import itertools
+import json
+
+import numpy as np
+
+from elevator import ElevatorSystem, Passenger
+
+# Record layout of binary traces, saved as .npy files
+TRACE_DTYPE = np.dtype([('time', '<i8'), ('start_floor', '<i4'), ('destination_floor', '<i4')])
+
+def write_trace(path, times, start_floors, destination_floors):
+    """
+    Write calls to a trace file: JSON Lines if the path ends with .jsonl, a binary .npy file otherwise.
+
+    Args:
+        path (str): The file to write.
+        times, start_floors, destination_floors (array-like): The calls, as returned by generate_call_arrays.
+    """
+    if path.endswith('.jsonl'):
+        with open(path, 'w') as f:
+            for call_time, start_floor, destination_floor in zip(np.asarray(times).tolist(), np.asarray(start_floors).tolist(),
+                                                                 np.asarray(destination_floors).tolist()):
+                f.write(json.dumps({'time': call_time, 'start_floor': start_floor,
+                                    'destination_floor': destination_floor}) + '\n')
+    else:
+        records = np.empty(len(times), dtype=TRACE_DTYPE)
+        records['time'], records['start_floor'], records['destination_floor'] = times, start_floors, destination_floors
+        # Through a file, as np.save would add .npy to a path without it
+        with open(path, 'wb') as f:
+            np.save(f, records)
+
+def read_jsonl(path):
+    """
+    Read the records of a JSON Lines trace one line at a time.
+
+    Yields:
+        tuple: The time, start floor and destination floor of each call.
+    """
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record['time'], record['start_floor'], record['destination_floor']
+
+def read_binary(path, chunk_size=65536, mmap=True):
+    """
+    Read the records of a binary trace, one chunk at a time. With mmap, the file is memory-mapped
+    so only the chunk being read is held in memory.
+
+    Yields:
+        tuple: The time, start floor and destination floor of each call.
+    """
+    records = np.load(path, mmap_mode='r' if mmap else None)
+    if records.dtype != TRACE_DTYPE:
+        raise ValueError(f"Not a trace file: {path}")
+    for first in range(0, len(records), chunk_size):
+        chunk = records[first:first + chunk_size]
+        yield from zip(chunk['time'].tolist(), chunk['start_floor'].tolist(), chunk['destination_floor'].tolist())
+
+def read_trace(path):
+    """
+    Read the records of a trace written by write_trace, lazily.
+
+    Yields:
+        tuple: The time, start floor and destination floor of each call.
+    """
+    return read_jsonl(path) if path.endswith('.jsonl') else read_binary(path)
+
+def replay(elevator_system, records, duration=None, engine='tick'):
+    """
+    Run the elevator system on a stream of calls, making each call as the simulation time reaches it.
+    Only the calls made at one time are held at once.
+
+    Args:
+        elevator_system (ElevatorSystem): The elevator system to run.
+        records (iterable): The time, start floor and destination floor of each call, sorted by time.
+            Times count from the start of the replay.
+        duration (int): The number of time steps to run; defaults to the step after the last call.
+        engine (str): The engine to run the elevator system with.
+    """
+    elapsed = 0
+    for call_time, group in itertools.groupby(records, key=lambda record: record[0]):
+        if call_time < elapsed:
+            raise ValueError("Trace records must be sorted by time")
+        if duration is not None and call_time >= duration:
+            break
+        passengers = [Passenger(start_floor, destination_floor) for _, start_floor, destination_floor in group]
+        elevator_system.run(call_time - elapsed + 1, {call_time - elapsed: passengers}, engine=engine)
+        elapsed = call_time + 1
+    if duration is not None and duration > elapsed:
+        elevator_system.run(duration - elapsed, engine=engine)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded trace of elevator calls.")
+    parser.add_argument('trace', help="a .jsonl or .npy trace file")
+    parser.add_argument('--elevators', type=int, default=12, help="number of elevators")
+    parser.add_argument('--floors', type=int, default=60, help="number of floors")
+    parser.add_argument('--duration', type=int, default=None, help="number of time steps to run")
+    parser.add_argument('--engine', choices=['tick', 'event'], default='event')
+    args = parser.parse_args(argv)
+
+    elevator_system = ElevatorSystem(num_elevators=args.elevators, num_floors=args.floors)
+    replay(elevator_system, read_trace(args.trace), args.duration, args.engine)
+    print(elevator_system.stats())
+
+if __name__ == '__main__':
+    main()
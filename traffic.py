@@ -0,0 +1,182 @@
+import numpy as np
+
+from simulator import sort_calls, to_time_series
+
+HOUR = 3600
+
+class TrafficComponent:
+    """
+    A stream of passengers arriving as a non-homogeneous Poisson process, such as the morning up-peak
+    or interfloor traffic, with a piecewise linear arrival rate and an origin/destination matrix.
+    """
+    def __init__(self, times, rates, od_matrix):
+        """
+        Args:
+            times (array-like): The breakpoints of the rate curve, in seconds, in increasing order.
+            rates (array-like): The arrival rate at each breakpoint, in passengers per second. The rate
+                is linear in between and zero before the first and after the last breakpoint.
+            od_matrix (array-like): The relative number of trips from floor i + 1 to floor j + 1 at [i, j].
+        """
+        self.times = np.asarray(times, dtype=float)
+        self.rates = np.asarray(rates, dtype=float)
+        self.od_matrix = np.asarray(od_matrix, dtype=float)
+        if self.times.ndim != 1 or self.times.shape != self.rates.shape or len(self.times) < 2:
+            raise ValueError("times and rates must be 1-D arrays of the same length, at least 2")
+        if np.any(np.diff(self.times) < 0) or np.any(self.rates < 0):
+            raise ValueError("times must be increasing and rates non-negative")
+        if self.od_matrix.ndim != 2 or self.od_matrix.shape[0] != self.od_matrix.shape[1]:
+            raise ValueError("od_matrix must be a square matrix")
+        if np.any(self.od_matrix < 0) or not self.od_matrix.sum() > 0:
+            raise ValueError("od_matrix must be non-negative with a positive sum")
+
+    @property
+    def num_floors(self):
+        return len(self.od_matrix)
+
+    def rate(self, t):
+        """
+        Returns:
+            numpy.ndarray: The arrival rate at the given times, in passengers per second.
+        """
+        return np.interp(t, self.times, self.rates, left=0, right=0)
+
+    def expected_calls(self):
+        """
+        Returns:
+            float: The expected number of passengers, the integral of the rate curve.
+        """
+        return float(np.sum(np.diff(self.times) * (self.rates[1:] + self.rates[:-1]) / 2))
+
+    def sample(self, rng):
+        """
+        Draw the arrivals by thinning: candidates arrive at the peak rate, and each is kept with
+        probability rate / peak rate. Their floors are drawn from the origin/destination matrix.
+
+        Args:
+            rng (numpy.random.Generator): The random stream to draw from.
+
+        Returns:
+            tuple: The call time (in whole seconds), start floor and destination floor of each passenger, unsorted.
+        """
+        peak, start, span = self.rates.max(), self.times[0], self.times[-1] - self.times[0]
+        candidates = rng.poisson(peak * span) if peak > 0 else 0
+        times = start + rng.random(candidates) * span
+        times = times[rng.random(candidates) * peak < self.rate(times)]
+        cdf = np.cumsum(self.od_matrix.ravel())
+        trips = np.searchsorted(cdf, rng.random(len(times)) * cdf[-1], side='right')
+        start_floors, destination_floors = np.divmod(np.minimum(trips, len(cdf) - 1), self.num_floors)
+        return np.floor(times).astype(np.int64), start_floors + 1, destination_floors + 1
+
+class TrafficProfile:
+    """
+    The traffic of a building: the superposition of independent traffic components.
+    """
+    def __init__(self, components):
+        """
+        Args:
+            components (list): The TrafficComponent objects, all for the same number of floors.
+        """
+        self.components = list(components)
+        if not self.components or len({component.num_floors for component in self.components}) != 1:
+            raise ValueError("A profile needs components for the same number of floors")
+
+    @property
+    def num_floors(self):
+        return self.components[0].num_floors
+
+    @property
+    def duration(self):
+        """
+        Returns:
+            int: The number of seconds until the last arrival can happen.
+        """
+        return int(np.ceil(max(component.times[-1] for component in self.components)))
+
+    def rate(self, t):
+        return sum(component.rate(t) for component in self.components)
+
+    def expected_calls(self):
+        return sum(component.expected_calls() for component in self.components)
+
+    def generate_call_arrays(self, seed):
+        """
+        Generate the calls of the profile, each component from its own random stream spawned from seed.
+
+        Args:
+            seed (int or numpy.random.SeedSequence): The seed of the calls.
+
+        Returns:
+            tuple: The call time, start floor and destination floor of each passenger, sorted by time.
+        """
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        rngs = map(np.random.default_rng, seed_sequence.spawn(len(self.components)))
+        calls = [component.sample(rng) for component, rng in zip(self.components, rngs)]
+        return sort_calls(*(np.concatenate(columns) for columns in zip(*calls)))
+
+def triangle(start, peak, end, total):
+    """
+    A rate curve rising from zero at start to its peak and falling back to zero at end, with total passengers.
+
+    Returns:
+        tuple: The breakpoints and rates.
+    """
+    return (start, peak, end), (0, 2 * total / (end - start), 0)
+
+def od_matrix(num_floors, origins, destinations):
+    """
+    An origin/destination matrix of trips from any of the origins to any other of the destinations,
+    with the same weight for each pair.
+
+    Args:
+        num_floors (int): The number of floors.
+        origins (list): The floors trips start from.
+        destinations (list): The floors trips go to.
+    """
+    matrix = np.zeros((num_floors, num_floors))
+    matrix[np.ix_(np.asarray(origins) - 1, np.asarray(destinations) - 1)] = 1
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+def office_day(num_floors, population, interfloor=0.5):
+    """
+    A day of office traffic with the same number of occupants on every floor above the lobby: a morning
+    up-peak around 8:30, lunch two-way traffic between 11:30 and 14:00, an evening down-peak around
+    17:30 and interfloor trips during working hours.
+
+    Args:
+        num_floors (int): The number of floors, the lobby being floor 1.
+        population (int): The number of occupants of the building.
+        interfloor (float): The number of interfloor trips per occupant and day.
+
+    Returns:
+        TrafficProfile: The profile, over 24 hours.
+    """
+    lobby, floors = [1], range(2, num_floors + 1)
+    up, down, between = od_matrix(num_floors, lobby, floors), od_matrix(num_floors, floors, lobby), \
+        od_matrix(num_floors, floors, floors)
+    components = [
+        TrafficComponent(*triangle(7 * HOUR, 8.5 * HOUR, 10 * HOUR, population), up),
+        TrafficComponent(*triangle(11.5 * HOUR, 12.5 * HOUR, 13.5 * HOUR, population / 2), down),
+        TrafficComponent(*triangle(12 * HOUR, 13 * HOUR, 14 * HOUR, population / 2), up),
+        TrafficComponent(*triangle(16 * HOUR, 17.5 * HOUR, 19 * HOUR, population), down),
+    ]
+    if num_floors > 2 and interfloor > 0:
+        rate = interfloor * population / (10 * HOUR)
+        components.append(TrafficComponent((8 * HOUR, 18 * HOUR), (rate, rate), between))
+    return TrafficProfile(components)
+
+def simulate_traffic(elevator_system, profile, seed, engine='tick'):
+    """
+    Run the elevator system through a traffic profile, until the last arrival it can generate.
+
+    Args:
+        elevator_system (ElevatorSystem): The system to run, with as many floors as the profile.
+        profile (TrafficProfile): The traffic.
+        seed (int or numpy.random.SeedSequence): The seed of the calls.
+        engine (str): 'tick' or 'event', see ElevatorSystem.run.
+    """
+    if profile.num_floors != elevator_system.num_floors:
+        raise ValueError(f"The profile is for {profile.num_floors} floors, the system has {elevator_system.num_floors}")
+    time_series = to_time_series(*profile.generate_call_arrays(seed))
+    elevator_system.run(profile.duration, time_series, engine=engine)
+    print("Total:", sum(len(time_series[t]) for t in time_series))